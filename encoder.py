@@ -1,6 +1,6 @@
 from connexion.decorators import produces
-from six import iteritems
 from swagger_server.models.base_model_ import Model
+from swagger_server.elc import serial
 
 
 class JSONEncoder(produces.JSONEncoder):
@@ -8,12 +8,5 @@ class JSONEncoder(produces.JSONEncoder):
 
     def default(self, o):
         if isinstance(o, Model):
-            dikt = {}
-            for attr, _ in iteritems(o.swagger_types):
-                value = getattr(o, attr)
-                if value is None and not self.include_nulls:
-                    continue
-                attr = o.attribute_map[attr]
-                dikt[attr] = value
-            return dikt
+            return serial.model_dict(o, self.include_nulls)
         return produces.JSONEncoder.default(self, o)
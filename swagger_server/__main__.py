@@ -1,13 +1,28 @@
 #!/usr/bin/env python3
 
 import connexion
+from swagger_server.elc import config, taxonomy, timing
+from swagger_server.handlers import mapping
 #  from .encoder import JSONEncoder
 
+# Parse and validate settings once per worker process
+config.reload()
+
+# Compile the upstream record field mappings
+mapping.load()
+
+# Load the taxonomy snapshot, if one is configured
+taxonomy.load()
+
 app = connexion.App(__name__, specification_dir='./swagger/')
 #  app.app.json_encoder = JSONEncoder
 
 app.add_api('swagger.yaml', arguments={'title': 'Composite interface to the Neotoma and PBDB databases'})
 
+# Record total request time for the metrics endpoint
+app.app.before_request(timing.request_started)
+app.app.after_request(timing.request_finished)
+
 application = app.app
 
 if __name__ == '__main__':
@@ -0,0 +1,10 @@
+"""
+Offline benchmark harness.
+
+A local stand-in server replays PBDB, Neotoma and GPlates responses with
+configurable size and latency, and the data endpoints are driven through
+the Flask app against it:
+
+    python3 -m swagger_server.bench --records 5000 --latency 50
+
+"""
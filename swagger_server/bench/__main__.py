@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark the API endpoints against local stand-in upstream servers.
+
+Run from the repository root:
+
+    python3 -m swagger_server.bench [--records N] [--latency MS] ...
+
+Reports requests per second, p50/p99 latency and the peak resident set
+size of the process after each scenario.
+"""
+
+import argparse
+
+# Scenario name -> request path and query ({limit} is the record count)
+SCENARIOS = [
+    ('occ', '/api_v1/occ?taxon=Canis&limit={limit}'),
+    ('occ_paleo', '/api_v1/occ?taxon=Canis&coordtype=paleo&limit={limit}'),
+    ('occ_poll', '/api_v1/occ?taxon=Canis&show=poll&limit={limit}'),
+    ('loc', '/api_v1/loc?agerange=Pleistocene&limit={limit}'),
+    ('ref', '/api_v1/ref?idlist={refs}'),
+    ('tax', '/api_v1/tax?taxon=Canis'),
+    ('timebound', '/api_v1/misc/timebound?agerange=Cretaceous,Paleogene'),
+    ('paleocoords', '/api_v1/misc/paleocoords?coords=45,-100&age=20'),
+    ('subtaxa', '/api_v1/misc/subtaxa?taxon=Canis')]
+
+
+def parse_args():
+    """Return the command line options."""
+    parser = argparse.ArgumentParser(
+        prog='python3 -m swagger_server.bench',
+        description='Drive the API against stand-in upstream servers.')
+    parser.add_argument('--records', type=int, default=2000,
+                        help='records in each upstream resource')
+    parser.add_argument('--latency', type=float, default=20.0,
+                        help='milliseconds added to each upstream response')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=2,
+                        help='unmeasured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='concurrent client requests')
+    parser.add_argument('--scenario', action='append',
+                        choices=[name for name, path in SCENARIOS],
+                        help='scenario to run (repeatable, default all)')
+    parser.add_argument('--fixtures',
+                        help='directory of recorded upstream responses')
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the upstream response cache enabled')
+    parser.add_argument('--json', dest='json_file',
+                        help='also write the results to a JSON file')
+
+    return parser.parse_args()
+
+
+def bench_config(upstream, cache_on):
+    """Write a config file pointing at the stand-in servers."""
+    import tempfile
+    import yaml
+    from ..elc import config
+
+    data_map = config.read_file(config.CONFIG_FILE)
+
+    data_map['resource_api'].update(pbdb=upstream.base_url('pbdb'),
+                                    neotoma=upstream.base_url('neotoma'))
+    data_map['service_api'].update(
+        gplates=upstream.base_url('gplates') + 'reconstruct')
+
+    if not cache_on:
+        data_map['cache'].update(entries=0, disk=None)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml',
+                                     delete=False) as f:
+        yaml.safe_dump(data_map, f, default_flow_style=False)
+
+    return f.name
+
+
+def build_app():
+    """Return the Flask app with the API mounted, as in swagger_server.app."""
+    import os
+    import logging
+    import connexion
+    from ..elc import taxonomy, timing
+    from ..handlers import mapping
+
+    mapping.load()
+    taxonomy.load()
+
+    logging.getLogger('connexion.operation').setLevel('ERROR')
+    spec_dir = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'swagger')
+
+    app = connexion.App('swagger_server', specification_dir=spec_dir)
+    app.add_api('swagger.yaml')
+    app.app.before_request(timing.request_started)
+    app.app.after_request(timing.request_finished)
+
+    return app.app
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a sorted list."""
+    import math
+
+    if not values:
+        return 0.0
+
+    rank = max(int(math.ceil(pct / 100.0 * len(values))), 1)
+
+    return values[min(rank, len(values)) - 1]
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in MB."""
+    import resource
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == 'darwin':
+        return peak / 1048576.0
+
+    return peak / 1024.0
+
+
+def run_scenario(app, path, n_requests, concurrency):
+    """Issue requests concurrently and return the scenario results."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from time import perf_counter
+
+    local = threading.local()
+
+    def one(n):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        t0 = perf_counter()
+        resp = client.get(path)
+        size = len(resp.get_data())
+        return perf_counter() - t0, resp.status_code, size
+
+    t0 = perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(n_requests)))
+
+    elapsed = perf_counter() - t0
+    latency = sorted(secs for secs, status, size in results)
+
+    return {'requests': n_requests,
+            'errors': sum(1 for secs, status, size in results
+                          if status != 200),
+            'req_per_sec': round(n_requests / elapsed, 2),
+            'p50_ms': round(percentile(latency, 50) * 1000, 1),
+            'p99_ms': round(percentile(latency, 99) * 1000, 1),
+            'mean_bytes': int(sum(size for secs, status, size in results) /
+                              max(n_requests, 1)),
+            'peak_rss_mb': round(peak_rss(), 1)}
+
+
+def main():
+    """Start the stand-in servers, run the scenarios and print a report."""
+    import json
+    import os
+    from ..elc import config
+    from . import payloads, upstream
+
+    args = parse_args()
+
+    store = payloads.Store(size=args.records, fixtures=args.fixtures)
+    server = upstream.Upstream(store, latency=args.latency / 1000.0).start()
+    config_file = bench_config(server, args.cache)
+
+    try:
+        config.reload(config_file)
+        app = build_app()
+
+        refs = ','.join(['pbdb:ref:{0:d}'.format(n) for n in range(1, 51)] +
+                        ['neot:pub:{0:d}'.format(n) for n in range(1, 51)])
+        selected = args.scenario or [name for name, path in SCENARIOS]
+        report = dict()
+
+        print('{0:<12s} {1:>6s} {2:>6s} {3:>8s} {4:>9s} {5:>9s} {6:>10s} '
+              '{7:>8s}'.format('scenario', 'reqs', 'errors', 'req/s',
+                               'p50 ms', 'p99 ms', 'bytes', 'rss MB'))
+
+        for name, path in SCENARIOS:
+            if name not in selected:
+                continue
+            path = path.format(limit=args.records, refs=refs)
+
+            if args.warmup:
+                run_scenario(app, path, args.warmup, 1)
+            result = run_scenario(app, path, args.requests, args.concurrency)
+            report[name] = result
+
+            print('{0:<12s} {requests:>6d} {errors:>6d} {req_per_sec:>8.2f} '
+                  '{p50_ms:>9.1f} {p99_ms:>9.1f} {mean_bytes:>10d} '
+                  '{peak_rss_mb:>8.1f}'.format(name, **result))
+
+        print('\nupstream requests: {0:s}'.format(
+            ', '.join('{0:s}={1:d}'.format(k, v)
+                      for k, v in sorted(server.hits.items()))))
+
+        if args.json_file:
+            report.update(settings=vars(args), upstream=dict(server.hits))
+            with open(args.json_file, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    finally:
+        server.stop()
+        os.remove(config_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""Recorded or synthetic upstream response bodies for the stand-in server."""
+
+import random
+
+# Upstream resource -> (record array path, id parameter)
+RESOURCES = {'pbdb/occs/list.json': (['records'], None),
+             'pbdb/colls/list.json': (['records'], 'coll_id'),
+             'pbdb/taxa/list.json': (['records'], 'taxon_id'),
+             'pbdb/refs/list.json': (['records'], 'ref_id'),
+             'neotoma/occurrence': (['data'], None),
+             'neotoma/datasets': (['data'], 'datasetid'),
+             'neotoma/taxa': (['data'], 'taxonid'),
+             'neotoma/publications': (['data', 'result'], 'pubid')}
+
+TAXA = ['Canis', 'Mammut', 'Quercus', 'Pinus', 'Bison', 'Equus',
+        'Ursus', 'Picea', 'Betula', 'Alnus']
+
+CITATION = 'Stand-in rotation model (benchmark)'
+
+
+def pbdb_occ(i, rng):
+    """Return a PBDB occurrence record (com vocabulary)."""
+    eag = round(rng.uniform(0.01, 66.0), 3)
+    return {'oid': 'occ:{0:d}'.format(i),
+            'cid': 'col:{0:d}'.format(i // 10),
+            'tna': rng.choice(TAXA),
+            'tid': 'txn:{0:d}'.format(rng.randrange(1, 500)),
+            'eag': eag,
+            'lag': round(eag * rng.uniform(0.5, 1.0), 3),
+            'rid': 'ref:{0:d}'.format(rng.randrange(1, 1000)),
+            'lng': round(rng.uniform(-180, 180), 4),
+            'lat': round(rng.uniform(-90, 90), 4),
+            'pln': round(rng.uniform(-180, 180), 4),
+            'pla': round(rng.uniform(-90, 90), 4)}
+
+
+def pbdb_coll(i, rng):
+    """Return a PBDB collection record."""
+    rec = pbdb_occ(i, rng)
+    rec.update(oid='col:{0:d}'.format(i),
+               nam='Stand-in collection {0:d}'.format(i),
+               noc=rng.randrange(1, 200))
+    for field in ['cid', 'tna', 'tid']:
+        rec.pop(field)
+    return rec
+
+
+def pbdb_taxon(i, rng):
+    """Return a PBDB taxon record."""
+    return {'oid': 'txn:{0:d}'.format(i),
+            'nam': '{0:s} sp{1:d}'.format(rng.choice(TAXA), i),
+            'par': 'txn:{0:d}'.format(max(i // 5, 1)),
+            'rnk': rng.choice([3, 5, 9, 13]),
+            'ext': rng.choice(['0', '1']),
+            'rid': 'ref:{0:d}'.format(rng.randrange(1, 1000)),
+            'att': 'Author {0:d}'.format(rng.randrange(1800, 2018)),
+            'noc': rng.randrange(0, 5000),
+            'tei': 'Pleistocene',
+            'tli': 'Holocene',
+            'taxon_name': 'Taxon {0:d}'.format(i),
+            'taxon_rank': rng.choice(['kingdom', 'phylum', 'class', 'order',
+                                      'family', 'genus', 'species'])}
+
+
+def pbdb_ref(i, rng):
+    """Return a PBDB bibliographic reference record."""
+    return {'oid': 'ref:{0:d}'.format(i),
+            'pty': 'journal article',
+            'tit': 'Stand-in reference {0:d}'.format(i),
+            'pby': str(rng.randrange(1850, 2018)),
+            'pbt': 'Journal of Benchmarks',
+            'vol': str(rng.randrange(1, 90)),
+            'vno': str(rng.randrange(1, 12)),
+            'pgf': '1',
+            'pgl': '20',
+            'al1': 'Smith',
+            'ai1': 'J.',
+            'al2': 'Jones',
+            'ai2': 'K.',
+            'oau': 'A. Brown, and C. Green',
+            'ref': 'Smith and Jones {0:d}. Stand-in reference.'.format(i)}
+
+
+def point(rng):
+    """Return a GeoJSON point string at a random location."""
+    return ('{{"type":"Point","coordinates":[{0:.4f},{1:.4f}]}}'
+            .format(rng.uniform(-180, 180), rng.uniform(-90, 90)))
+
+
+def neotoma_occ(i, rng):
+    """Return a Neotoma occurrence record."""
+    age = round(rng.uniform(100, 40000))
+    return {'occid': i,
+            'sampleid': i,
+            'sample': {'taxonname': rng.choice(TAXA),
+                       'taxonid': rng.randrange(1, 500)},
+            'age': {'age': None,
+                    'ageolder': age + 500,
+                    'ageyounger': age},
+            'site': {'altitude': rng.randrange(0, 3000),
+                     'database': 'Neotoma',
+                     'datasettype': 'pollen',
+                     'datasetid': i // 10,
+                     'location': point(rng)}}
+
+
+def neotoma_dataset(i, rng):
+    """Return a Neotoma site record with a single dataset."""
+    age = round(rng.uniform(100, 40000))
+    return {'site': {'siteid': i,
+                     'sitename': 'Stand-in site {0:d}'.format(i),
+                     'altitude': rng.randrange(0, 3000),
+                     'geography': point(rng)},
+            'dataset': [{'datasetid': i,
+                         'doi': None,
+                         'database': 'Neotoma',
+                         'datasettype': 'pollen',
+                         'agerange': {'age': None,
+                                      'ageold': age + 500,
+                                      'ageyoung': age}}]}
+
+
+def neotoma_taxon(i, rng):
+    """Return a Neotoma taxon record."""
+    return {'taxonid': i,
+            'taxonname': '{0:s} sp{1:d}'.format(rng.choice(TAXA), i),
+            'highertaxonid': max(i // 5, 1),
+            'status': 'extant',
+            'publicationid': rng.randrange(1, 1000),
+            'author': 'Author',
+            'ecolgroup': 'TRSH'}
+
+
+def neotoma_pub(i, rng):
+    """Return a Neotoma publication record."""
+    return {'publicationid': i,
+            'title': 'Stand-in publication {0:d}'.format(i),
+            'year': str(rng.randrange(1850, 2018)),
+            'journal': 'Journal of Benchmarks',
+            'doi': None,
+            'citation': 'Stand-in publication {0:d}.'.format(i),
+            'pages': '1-20',
+            'volume': str(rng.randrange(1, 90)),
+            'issue': None}
+
+
+GENERATORS = {'pbdb/occs/list.json': pbdb_occ,
+              'pbdb/colls/list.json': pbdb_coll,
+              'pbdb/taxa/list.json': pbdb_taxon,
+              'pbdb/refs/list.json': pbdb_ref,
+              'neotoma/occurrence': neotoma_occ,
+              'neotoma/datasets': neotoma_dataset,
+              'neotoma/taxa': neotoma_taxon,
+              'neotoma/publications': neotoma_pub}
+
+
+class Store(object):
+    """
+    Record sets served by the stand-in upstream APIs.
+
+    Each resource serves a fixed set of records, generated from a seed or
+    taken from a recorded response. Recorded responses are read from the
+    fixtures directory by resource path (e.g. pbdb/occs/list.json or
+    neotoma/occurrence.json) and their records repeated up to size.
+
+    :arg size: Number of records in each resource
+    :type size: int
+    :arg fixtures: Directory of recorded upstream responses
+    :type fixtures: str
+    :arg seed: Random seed of the synthetic records
+    :type seed: int
+    """
+
+    def __init__(self, size=1000, fixtures=None, seed=0):
+        import threading
+
+        self.size = size
+        self.fixtures = fixtures
+        self.seed = seed
+        self._sets = dict()
+        self._lock = threading.Lock()
+
+    def recorded(self, resource):
+        """Return the records of a recorded response, or None."""
+        import json
+        import os
+
+        if not self.fixtures:
+            return None
+
+        filename = os.path.join(self.fixtures, resource)
+        if not filename.endswith('.json'):
+            filename += '.json'
+        if not os.path.exists(filename):
+            return None
+
+        with open(filename) as f:
+            body = json.load(f)
+
+        for key in RESOURCES[resource][0]:
+            body = body.get(key) or dict()
+
+        return body or None
+
+    def records(self, resource):
+        """Return the full record set of a resource."""
+        with self._lock:
+            if resource not in self._sets:
+                recorded = self.recorded(resource)
+                if recorded:
+                    repeat = -(-self.size // len(recorded))
+                    self._sets[resource] = (recorded * repeat)[:self.size]
+                else:
+                    rng = random.Random(self.seed)
+                    make = GENERATORS[resource]
+                    self._sets[resource] = [make(i, rng)
+                                            for i in range(1, self.size + 1)]
+
+            return self._sets[resource]
+
+    def select(self, resource, query):
+        """Return the records of a resource matching a request query."""
+        records = self.records(resource)
+        id_param = RESOURCES[resource][1]
+
+        # Identifier lists select records by their position in the set
+        if id_param and query.get(id_param):
+            ids = [int(x) for x in query.get(id_param).split(',')
+                   if x.isdigit()]
+            return [records[n - 1] for n in ids if 0 < n <= len(records)]
+
+        offset = int(query.get('offset') or 0)
+        limit = int(query.get('limit') or len(records))
+
+        return records[offset:offset + limit]
+
+    def body(self, resource, query):
+        """
+        Return the response body for a resource request, or None.
+
+        :arg resource: Service and path, e.g. pbdb/occs/list.json
+        :type resource: str
+        :arg query: Request query parameters
+        :type query: dict
+        """
+        if resource in RESOURCES:
+            path = RESOURCES[resource][0]
+            records = self.select(resource, query)
+
+            if resource.startswith('pbdb/'):
+                body = {'elapsed_time': 0.001, 'records': records}
+                if query.get('rowcount'):
+                    # Matches regardless of limit and offset, as PBDB
+                    unpaged = {k: v for k, v in query.items()
+                               if k not in ['limit', 'offset']}
+                    body.update(records_found=len(self.select(resource,
+                                                              unpaged)),
+                                records_returned=len(records))
+                return body
+
+            if len(path) == 2:
+                return {'status': 'success',
+                        'data': {path[1]: records}}
+
+            return {'status': 'success', 'data': records}
+
+        elif resource == 'pbdb/intervals/single.json':
+            return {'records': [{'nam': query.get('name'),
+                                 'eag': 66.0,
+                                 'lag': 23.03,
+                                 'col': '#FD9A52',
+                                 'rid': ['ref:1']}]}
+
+        elif resource == 'pbdb/refs/single.json':
+            return {'records': [{'oid': 'ref:1',
+                                 'ref': 'Stand-in timescale reference.'}]}
+
+        elif resource == 'gplates/reconstruct':
+            return reconstruct(query)
+
+        else:
+            return None
+
+
+def reconstruct(query):
+    """Return a GPlates point reconstruction offset by the age."""
+    lat = float(query.get('lat', 0))
+    lng = float(query.get('lng', 0))
+    age = float(query.get('age', 0))
+
+    paleo_lng = (lng + age * 0.5 + 180) % 360 - 180
+    paleo_lat = max(-90.0, min(90.0, lat - age * 0.1))
+
+    return {'success': {'v': 1},
+            'features': [{'type': 'Feature',
+                          'geometry': {'type': 'Point',
+                                       'coordinates': [round(paleo_lng, 4),
+                                                       round(paleo_lat, 4)]},
+                          'properties': {}}],
+            'properties': {'model': {'citation': CITATION}}}
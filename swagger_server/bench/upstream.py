@@ -0,0 +1,124 @@
+"""Local HTTP stand-in for the PBDB, Neotoma and GPlates APIs."""
+
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# URL prefix of each stand-in service
+PREFIX = {'pbdb': '/pbdb/data1.2/',
+          'neotoma': '/neotoma/v2.0/data/',
+          'gplates': '/gplates/'}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answer GET requests from the upstream record store."""
+
+    # Keep-alive, as the upstream APIs do, so the session pools are used
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """Serve a recorded or generated response after the set latency."""
+        from time import sleep
+        from urllib.parse import urlsplit, parse_qs
+
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        resource = self.server.resource(parts.path)
+
+        if self.server.latency:
+            sleep(self.server.latency)
+
+        body = None
+        if resource:
+            body = self.server.store.body(resource, query)
+
+        if body is None:
+            self.server.count('not_found')
+            self.send_json(404, {'errors': ['Unknown path: ' + parts.path]})
+        else:
+            self.server.count(resource)
+            self.send_json(200, body, cut=self.server.cut)
+
+    def send_json(self, status, body, cut=None):
+        """
+        Write a JSON response with an explicit length.
+
+        With cut set, only that fraction of the body is written before
+        the connection is dropped.
+        """
+        data = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+
+        if cut is None:
+            self.wfile.write(data)
+        else:
+            self.wfile.write(data[:int(len(data) * cut)])
+            self.wfile.flush()
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        """Do not log each request."""
+        pass
+
+
+class Upstream(ThreadingHTTPServer):
+    """
+    Threaded stand-in upstream server.
+
+    :arg store: Record store answering the requests
+    :type store: payloads.Store
+    :arg latency: Seconds added before each response
+    :type latency: float
+    :arg cut: Fraction of each response body sent before the connection
+              is dropped (None sends whole bodies)
+    :type cut: float
+    """
+
+    daemon_threads = True
+
+    def __init__(self, store, latency=0.0, host='127.0.0.1', port=0,
+                 cut=None):
+        ThreadingHTTPServer.__init__(self, (host, port), Handler)
+        self.store = store
+        self.latency = latency
+        self.cut = cut
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count(self, resource):
+        """Count a served request."""
+        with self._lock:
+            self.hits[resource] += 1
+
+    def resource(self, path):
+        """Map a request path to a service/resource name, or None."""
+        for service, prefix in PREFIX.items():
+            if path.startswith(prefix):
+                return service + '/' + path[len(prefix):]
+
+        return None
+
+    def base_url(self, service):
+        """Return the base URL of a stand-in service."""
+        host, port = self.server_address[:2]
+
+        return 'http://{0:s}:{1:d}{2:s}'.format(host, port, PREFIX[service])
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        self.shutdown()
+        self.server_close()
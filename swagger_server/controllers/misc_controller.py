@@ -6,6 +6,9 @@ Endpoint for miscelaneous ELC public functions:
 /misc/timebound    - resolve min and max time bounds for specified geo ages
 /misc/paleocoords  - reproject modern geograpic coordinates into paleo
 /misc/subtaxa      - retrieve lower taxa
+/misc/taxa/suggest - suggest taxon names for a prefix
+/misc/taxa/resolve - resolve many taxon names to taxon ids (POST)
+/metrics           - stage latency and cache metrics (Prometheus)
 
 """
 #  from swagger_server.models.assemblage import Timebound
@@ -15,10 +18,10 @@ Endpoint for miscelaneous ELC public functions:
 #  from six import iteritems
 #  from ..util import deserialize_date, deserialize_datetime
 import connexion
-from ..elc import params, aux, ages, geog, taxa
+from ..elc import params, aux, ages, geog, names, taxa, timing, serial
 from http_status import Status
 from time import time
-from flask import jsonify
+from flask import Response
 
 
 def subtaxa(taxon=None, synonyms=True):
@@ -85,7 +88,148 @@ def subtaxa(taxon=None, synonyms=True):
 
     # Return data structure to client
 
-    return jsonify(metadata=desc_obj, records=lower_taxa)
+    return serial.jsonify(metadata=desc_obj, records=lower_taxa)
+
+
+def suggest(q=None, limit=None):
+    """
+    Suggest taxon names (and synonyms) of all databases for a prefix.
+
+    :param q: start of a taxonomic name
+    :type q: str
+    :param limit: maximum number of suggestions
+    :type limit: int (default set in config.yaml)
+
+    """
+    from ..elc import config
+
+    t0 = time()
+    desc_obj = dict()
+    sub_query = 'Taxon names starting with {0:s}'.format(q)
+
+    # Set runtime options
+
+    try:
+        options = params.set_options(req_args=connexion.request.args,
+                                     endpoint='misc')
+
+    except ValueError as err:
+        return connexion.problem(status=err.args[0],
+                                 title=Status(err.args[0]).name,
+                                 detail=err.args[1],
+                                 type='about:blank')
+
+    # Call parse function to check for parameter errors
+
+    try:
+        params.parse(req_args=connexion.request.args,
+                     options=options,
+                     db='pbdb',
+                     endpoint='suggest')
+
+    except ValueError as err:
+        return connexion.problem(status=err.args[0],
+                                 title=Status(err.args[0]).name,
+                                 detail=err.args[1],
+                                 type='about:blank')
+
+    # Retrieve suggestions from the local name index
+
+    try:
+        suggestions = names.suggest(prefix=q,
+                                    limit=limit or config.get('suggest',
+                                                              'limit'))
+
+    except ValueError as err:
+        return connexion.problem(status=err.args[0],
+                                 title=Status(err.args[0]).name,
+                                 detail=err.args[1],
+                                 type='about:blank')
+
+    # Build returned metadata object
+
+    desc_obj.update(aux.build_meta(options))
+
+    desc_obj.update(aux.build_meta_sub(source=sub_query,
+                                       t0=t0,
+                                       sub_tag='suggest',
+                                       options=options,
+                                       data=suggestions))
+
+    # Return data structure to client
+
+    return serial.jsonify(metadata=desc_obj, records=suggestions)
+
+
+def resolve(body=None):
+    """
+    Resolve a list of taxon names to the taxon ids of all databases.
+
+    :param body: taxonomic names
+    :type body: list (of str)
+
+    """
+    from ..elc import config
+
+    t0 = time()
+    desc_obj = dict()
+    sub_query = 'Taxon ids of {0:d} names'.format(len(body or []))
+
+    # Set runtime options
+
+    try:
+        options = params.set_options(req_args=connexion.request.args,
+                                     endpoint='misc')
+
+    except ValueError as err:
+        return connexion.problem(status=err.args[0],
+                                 title=Status(err.args[0]).name,
+                                 detail=err.args[1],
+                                 type='about:blank')
+
+    # Check the list of names
+
+    if not body:
+        return connexion.problem(status=400,
+                                 title=Status(400).name,
+                                 detail='No taxon names provided',
+                                 type='about:blank')
+
+    if len(body) > config.get('resolve', 'max_names'):
+        msg = 'Too many taxon names, the limit is {0:d}'.format(
+            config.get('resolve', 'max_names'))
+        return connexion.problem(status=400,
+                                 title=Status(400).name,
+                                 detail=msg,
+                                 type='about:blank')
+
+    # Resolve from the local name index, then the databases
+
+    timing.start('resolve', 'all')
+
+    try:
+        return_obj, errors = names.resolve(taxon_names=body)
+
+    finally:
+        timing.stop()
+
+    # Build returned metadata object
+
+    desc_obj.update(aux.build_meta(options))
+
+    desc_obj.update(aux.build_meta_sub(source=sub_query,
+                                       t0=t0,
+                                       sub_tag='resolve',
+                                       options=options,
+                                       count=len(return_obj['matches']) +
+                                       len(return_obj['synonyms'])))
+
+    if errors:
+        desc_obj['resolve'].update(errors=errors)
+
+    # Return data structure to client
+
+    return serial.jsonify(metadata=desc_obj, records=return_obj)
 
 
 def paleocoords(coords=None, age=None, ageunits=None):
@@ -159,7 +303,7 @@ def paleocoords(coords=None, age=None, ageunits=None):
                   'modern_lon': modern[1],
                   'age': age}
 
-    return jsonify(metadata=desc_obj, records=return_obj)
+    return serial.jsonify(metadata=desc_obj, records=return_obj)
 
 
 def timebound(agerange=None, ageunits=None):
@@ -229,4 +373,10 @@ def timebound(agerange=None, ageunits=None):
                   'late_age': late_age,
                   'ics_color': col_hex}
 
-    return jsonify(metadata=desc_obj, records=return_obj)
+    return serial.jsonify(metadata=desc_obj, records=return_obj)
+
+
+def metrics():
+    """Return request stage timings and cache counters of this worker."""
+    return Response(timing.export(),
+                    mimetype='text/plain; version=0.0.4')
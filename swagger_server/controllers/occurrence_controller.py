@@ -12,21 +12,15 @@ Endpoint for queries on taxonomic occurrences in time and space.
 #  from ..util import deserialize_date, deserialize_datetime
 
 import connexion
-import flask_csv
-from ..elc import config, params, aux, subreq, taxa
-from ..handlers import router
+from ..elc import params, aux, taxa, cache, dispatch, writer, serial, columnar
 from http_status import Status
-from time import time
-from flask import jsonify
+from flask import Response
 
 
 def occ(bbox=None, agerange=None, ageuits=None, timerule=None, taxon=None,
         includelower=None, coordtype=None, limit=None, offset=None,
         show=None, output=None, run=None):
     """Paleobiological occurrences in a specific place and time."""
-    return_obj = list()
-    desc_obj = dict()
-
     # Set runtime options
 
     try:
@@ -39,21 +33,20 @@ def occ(bbox=None, agerange=None, ageuits=None, timerule=None, taxon=None,
                                  detail=err.args[1],
                                  type='about:blank')
 
-    run_list = aux.get_run_list(connexion.request.args.get('run'))
-
-    # Cycle through external databases
+    # Client may bypass the upstream response cache
 
-    for db in run_list:
+    options.update(fresh=cache.bypass(connexion.request.headers))
 
-        t0 = time()
+    run_list = aux.get_run_list(connexion.request.args.get('run'))
 
-        # Configure parameter payload for api subquery
+    # Stream large full returns directly from the upstream responses
 
+    if options.get('stream'):
         try:
-            payload = params.parse(req_args=connexion.request.args,
-                                   options=options,
-                                   db=db,
-                                   endpoint='occ')
+            opened = dispatch.open_streams(req_args=connexion.request.args,
+                                           options=options,
+                                           run_list=run_list,
+                                           endpoint='occ')
 
         except ValueError as err:
             return connexion.problem(status=err.args[0],
@@ -61,58 +54,73 @@ def occ(bbox=None, agerange=None, ageuits=None, timerule=None, taxon=None,
                                      detail=err.args[1],
                                      type='about:blank')
 
-        url_path = ''.join([config.get('resource_api', db),
-                            config.get('db_occ_endpt', db)])
+        if options.get('output') == 'ndjson':
+            return writer.ndjson_response(writer.opened_subs(opened),
+                                          options, 'occ')
 
-        # Database API call
+        if options.get('output') in columnar.FORMATS:
+            filename = aux.build_filename(endpoint='occ',
+                                          query=connexion.request.args,
+                                          extension=options.get('output'))
+            fields = writer.record_fields(dbs=run_list, endpoint='occ')
+            return columnar.response(opened, options, filename, fields)
 
-        try:
-            resp_json, api_call = subreq.trigger(url_path, payload, db)
+        if options.get('output') == 'csv':
+            filename = aux.build_filename(endpoint='occ',
+                                          query=connexion.request.args)
+            fields = writer.record_fields(dbs=run_list, endpoint='occ')
+            errors = list()
+            return writer.csv_response(writer.opened_records(opened, errors),
+                                       filename, fields, errors)
 
-        except ValueError as err:
-            return connexion.problem(status=err.args[0],
-                                     title=Status(err.args[0]).name,
-                                     detail=err.args[1],
-                                     type='about:blank')
+        return Response(writer.json_stream(opened, options),
+                        mimetype='application/json')
 
-        # Parse database response
+    # Newline delimited returns are written as each database completes
 
-        return_obj = router.response_decode(resp_json=resp_json,
-                                            return_obj=return_obj,
-                                            options=options,
-                                            db=db,
-                                            endpoint='occ')
+    if options.get('output') == 'ndjson':
+        results = dispatch.each(req_args=connexion.request.args,
+                                options=options,
+                                run_list=run_list,
+                                endpoint='occ')
+        return writer.ndjson_response(writer.dispatched_subs(results),
+                                      options, 'occ')
 
-        # Build returned metadata object
+    # Query the external databases concurrently
 
-        desc_obj.update(aux.build_meta(options))
+    try:
+        return_obj, desc_obj = dispatch.run(req_args=connexion.request.args,
+                                            options=options,
+                                            run_list=run_list,
+                                            endpoint='occ')
 
-        desc_obj.update(aux.build_meta_sub(data=return_obj,
-                                           source=api_call,
-                                           t0=t0,
-                                           sub_tag=db,
-                                           options=options))
+    except ValueError as err:
+        return connexion.problem(status=err.args[0],
+                                 title=Status(err.args[0]).name,
+                                 detail=err.args[1],
+                                 type='about:blank')
 
     # Return composite data structure to client
 
     if options.get('output') == 'json':
         if options.get('show') == 'poll':
-            return jsonify(desc_obj)
+            return serial.jsonify(desc_obj)
         if options.get('show') == 'idx':
-            return jsonify(aux.get_id_numbers(data=return_obj,
-                                              endpoint='occ'))
+            return serial.jsonify(aux.get_id_numbers(data=return_obj,
+                                                     endpoint='occ'))
         else:
-            return jsonify(metadata=desc_obj, records=return_obj)
+            return serial.jsonify(metadata=desc_obj, records=return_obj)
 
     elif options.get('output') == 'csv':
         if return_obj:
-            filename = aux.build_filename(endpoint='occ', data=return_obj)
-            return flask_csv.send_csv(return_obj,
-                                      filename,
-                                      return_obj[0].keys())
+            filename = aux.build_filename(endpoint='occ',
+                                          query=connexion.request.args)
+            fields = writer.record_fields(dbs=run_list, endpoint='occ',
+                                          records=return_obj)
+            return writer.csv_response(return_obj, filename, fields)
         else:
             msg = 'Unable to generate CSV file. Search returned no records.'
-            return jsonify(status=204,
-                           title=Status(204).name,
-                           detail=msg,
-                           type='about:blank')
+            return serial.jsonify(status=204,
+                                  title=Status(204).name,
+                                  detail=msg,
+                                  type='about:blank')
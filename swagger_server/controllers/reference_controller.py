@@ -13,12 +13,8 @@ citations in the subordinate databases.
 #  from ..util import deserialize_date, deserialize_datetime
 
 import connexion
-import flask_csv
-from ..elc import config, params, aux, subreq, formatter
-from ..handlers import router
+from ..elc import params, aux, formatter, cache, dispatch, serial, writer
 from http_status import Status
-from time import time
-from flask import jsonify
 
 
 def ref(idlist=None, show=None, output=None, run=None):
@@ -35,9 +31,6 @@ def ref(idlist=None, show=None, output=None, run=None):
     :type output: str
 
     """
-    return_obj = list()
-    desc_obj = dict()
-
     # Set runtime options
 
     try:
@@ -50,99 +43,70 @@ def ref(idlist=None, show=None, output=None, run=None):
                                  detail=err.args[1],
                                  type='about:blank')
 
-    run_list = aux.get_run_list(connexion.request.args.get('run'))
-
-    # Cycle through external databases
-
-    for db in run_list:
-
-        t0 = time()
-        options.update(skip=False)
-
-        # Configure parameter payload for api subquery
-
-        try:
-            payload = params.parse(req_args=connexion.request.args,
-                                   options=options,
-                                   db=db,
-                                   endpoint='ref')
-
-        except ValueError as err:
-            return connexion.problem(status=err.args[0],
-                                     title=Status(err.args[0]).name,
-                                     detail=err.args[1],
-                                     type='about:blank')
-
-        # skip this database if no ids specified
-
-        if options.get('skip'):
-            continue
+    # Client may bypass the upstream response cache
 
-        # Database API call
+    options.update(fresh=cache.bypass(connexion.request.headers))
 
-        url_path = ''.join([config.get('resource_api', db),
-                            config.get('db_ref_endpt', db)])
+    run_list = aux.get_run_list(connexion.request.args.get('run'))
 
-        try:
-            resp_json, api_call = subreq.trigger(url_path, payload, db)
+    # Newline delimited returns are written as each database completes
 
-        except ValueError as err:
-            return connexion.problem(status=err.args[0],
-                                     title=Status(err.args[0]).name,
-                                     detail=err.args[1],
-                                     type='about:blank')
+    if options.get('output') == 'ndjson':
+        results = dispatch.each(req_args=connexion.request.args,
+                                options=options,
+                                run_list=run_list,
+                                endpoint='ref')
+        return writer.ndjson_response(writer.dispatched_subs(results),
+                                      options, 'ref')
 
-        # Parse database response
+    # Query the external databases concurrently
 
-        return_obj = router.response_decode(resp_json=resp_json,
-                                            return_obj=return_obj,
+    try:
+        return_obj, desc_obj = dispatch.run(req_args=connexion.request.args,
                                             options=options,
-                                            db=db,
+                                            run_list=run_list,
                                             endpoint='ref')
 
-        # Build returned metadata object
-
-        desc_obj.update(aux.build_meta(options))
-
-        desc_obj.update(aux.build_meta_sub(data=return_obj,
-                                           source=api_call,
-                                           t0=t0,
-                                           sub_tag=db,
-                                           options=options))
+    except ValueError as err:
+        return connexion.problem(status=err.args[0],
+                                 title=Status(err.args[0]).name,
+                                 detail=err.args[1],
+                                 type='about:blank')
 
     # Return composite data structure to client
 
     if options.get('output') in ['json', 'bibjson']:
         if options.get('show') == 'poll':
-            return jsonify(desc_obj)
+            return serial.jsonify(desc_obj)
         if options.get('show') == 'idx':
-            return jsonify(aux.get_id_numbers(data=return_obj,
-                                              endpoint='ref'))
+            return serial.jsonify(aux.get_id_numbers(data=return_obj,
+                                                     endpoint='ref'))
         else:
             if options.get('output') == 'bibjson':
-                return jsonify(metadata=desc_obj,
-                               records=formatter.type_bibjson(return_obj))
+                bib_obj = formatter.type_bibjson(return_obj)
+                return serial.jsonify(metadata=desc_obj, records=bib_obj)
             else:
-                return jsonify(metadata=desc_obj, records=return_obj)
+                return serial.jsonify(metadata=desc_obj, records=return_obj)
 
     elif options.get('output') == 'json':
         if options.get('show') == 'poll':
-            return jsonify(desc_obj)
+            return serial.jsonify(desc_obj)
         if options.get('show') == 'idx':
-            return jsonify(aux.get_id_numbers(data=return_obj,
-                                              endpoint='ref'))
+            return serial.jsonify(aux.get_id_numbers(data=return_obj,
+                                                     endpoint='ref'))
         else:
-            return jsonify(metadata=desc_obj, records=return_obj)
+            return serial.jsonify(metadata=desc_obj, records=return_obj)
 
     elif options.get('output') == 'csv':
         if return_obj:
-            filename = aux.build_filename(endpoint='ref', data=return_obj)
-            return flask_csv.send_csv(return_obj,
-                                      filename,
-                                      return_obj[0].keys())
+            filename = aux.build_filename(endpoint='ref',
+                                          query=connexion.request.args)
+            fields = writer.record_fields(dbs=run_list, endpoint='ref',
+                                          records=return_obj)
+            return writer.csv_response(return_obj, filename, fields)
         else:
             msg = 'Unable to generate CSV file. Search returned no records.'
-            return jsonify(status=204,
-                           title=Status(204).name,
-                           detail=msg,
-                           type='about:blank')
+            return serial.jsonify(status=204,
+                                  title=Status(204).name,
+                                  detail=msg,
+                                  type='about:blank')
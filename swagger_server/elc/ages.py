@@ -14,7 +14,13 @@ def set_age_scaler(options, db):
 
 
 def set_age(age_range, options, db):
-    """Return key-val ages for identified database subquery payload."""
+    """
+    Return key-val ages for identified database subquery payload.
+
+    A requested timerule is passed to databases that support one; for the
+    others the rule and bounds (in ELC age units) are set as the age_filter
+    option, applied to the decoded records (see handlers.columns).
+    """
     from ..elc import ages
 
     try:
@@ -25,14 +31,20 @@ def set_age(age_range, options, db):
         raise ValueError(err.args[0], err.args[1])
 
     factor = ages.set_age_scaler(options, db)
+    rule = options.get('timerule')
 
     if db == 'neotoma':
+        if rule:
+            options.update(age_filter=(rule, early_age, late_age))
         return {'ageolder': round((early_age * factor), 4),
                 'ageyounger': round((late_age * factor), 4)}
 
     elif db == 'pbdb':
-        return {'max_ma': round((early_age * factor), 4),
-                'min_ma': round((late_age * factor), 4)}
+        payload = {'max_ma': round((early_age * factor), 4),
+                   'min_ma': round((late_age * factor), 4)}
+        if rule:
+            payload.update(timerule=rule)
+        return payload
 
     # NEW RESOURCE: Add databse specific age vocabulary here
 
@@ -107,17 +119,30 @@ def get_age(age_range, options):
 
 def resolve_age(geologic_age):
     """Query PBDB for find early and late bounds for a geologic age."""
+    from ..elc import coalesce, intervals
+
+    # Answer from the local interval index if possible
+
+    interval = intervals.lookup(geologic_age)
+    if interval and interval.get('eag') is not None:
+        return interval.get('eag'), interval.get('lag')
+
+    return coalesce.run(('resolve_age', intervals.normalize(geologic_age)),
+                        fetch_age, geologic_age)
+
+
+def fetch_age(geologic_age):
+    """Retrieve early and late bounds of a geologic age from PBDB."""
     import requests
-    from ..elc import config
+    from ..elc import config, intervals, pool, timing
 
     url = ''.join([config.get('resource_api', 'pbdb'),
                    'intervals/single.json'])
     payload = {'name': geologic_age}
 
     try:
-        r = requests.get(url=url,
-                         params=payload,
-                         timeout=config.get('default', 'timeout'))
+        with timing.span('age_lookup'):
+            r = pool.get(url, payload, 'pbdb')
         r.raise_for_status()
 
     except requests.exceptions.HTTPError as e:
@@ -126,13 +151,29 @@ def resolve_age(geologic_age):
 
     data = r.json().get('records')[0]
 
+    intervals.add(geologic_age, eag=data.get('eag'), lag=data.get('lag'))
+
     return data.get('eag'), data.get('lag')
 
 
 def get_age_meta(geologic_age):
     """Retrieve ancillary data for geologic ages."""
+    from ..elc import coalesce, intervals
+
+    # Answer from the local interval index if possible
+
+    interval = intervals.lookup(geologic_age)
+    if interval and interval.get('col') and interval.get('ref'):
+        return interval.get('col'), interval.get('ref')
+
+    return coalesce.run(('get_age_meta', intervals.normalize(geologic_age)),
+                        fetch_age_meta, geologic_age)
+
+
+def fetch_age_meta(geologic_age):
+    """Retrieve the color and reference of a geologic age from PBDB."""
     import requests
-    from ..elc import config
+    from ..elc import config, intervals, pool, timing
 
     # Retrieve the color hex and timescale reference number
 
@@ -141,9 +182,8 @@ def get_age_meta(geologic_age):
     payload = {'name': geologic_age, 'extids': False}
 
     try:
-        r = requests.get(url=url,
-                         params=payload,
-                         timeout=config.get('default', 'timeout'))
+        with timing.span('age_lookup'):
+            r = pool.get(url, payload, 'pbdb')
         r.raise_for_status()
 
     except requests.exceptions.HTTPError as e:
@@ -154,13 +194,12 @@ def get_age_meta(geologic_age):
 
     # Retrieve the bibliographic reference using the id number
 
-    url = 'http://paleobiodb.org/data1.2/refs/single.json'
+    url = ''.join([config.get('resource_api', 'pbdb'), 'refs/single.json'])
     payload = {'show': 'both', 'id': data.get('rid')[0]}
 
     try:
-        r = requests.get(url=url,
-                         params=payload,
-                         timeout=config.get('default', 'timeout'))
+        with timing.span('age_lookup'):
+            r = pool.get(url, payload, 'pbdb')
         r.raise_for_status()
 
     except requests.exceptions.HTTPError as e:
@@ -169,4 +208,6 @@ def get_age_meta(geologic_age):
 
     ref_data = r.json().get('records')[0]
 
+    intervals.add(geologic_age, col=data.get('col'), ref=ref_data.get('ref'))
+
     return data.get('col'), ref_data.get('ref')
@@ -23,19 +23,41 @@ def get_checksum(data, full=False):
         return hashlib.md5(pickle.dumps(data)).hexdigest()[0:7]
 
 
-def build_filename(endpoint, data):
-    """Compose a filename for CSV return."""
+def build_filename(endpoint, query, extension='csv'):
+    """
+    Compose a filename for file returns (CSV by default).
+
+    The checksum is taken from the normalised request query, so the name
+    is known before any record has been retrieved.
+
+    :arg query: Client request parameters
+    :type query: dict
+    """
     datatype = {'occ': 'occurrences',
                 'ref': 'references',
                 'tax': 'taxa',
                 'loc': 'locales'}
 
-    return 'elc_{0:s}_{1:s}.csv'.format(datatype.get(endpoint),
-                                        get_checksum(data=data))
+    # Parameter order and value padding do not change the return
+    normal = sorted((k.lower(), ','.join(x.strip() for x in v.split(',')))
+                    for k, v in query.items())
+
+    return 'elc_{0:s}_{1:s}.{2:s}'.format(datatype.get(endpoint),
+                                          get_checksum(data=normal),
+                                          extension)
 
 
-def set_db_special(db, endpoint):
-    """Add custom payload parameters unique to a specific db."""
+def set_db_special(db, endpoint, ids_only=False):
+    """
+    Add custom payload parameters unique to a specific db.
+
+    :arg ids_only: Only the record identifiers are needed (show=idx), so
+                   the smallest upstream field set is requested
+    :type ids_only: bool
+    """
+    if ids_only:
+        return {}
+
     if db == 'pbdb' and endpoint in ['loc', 'occ']:
         return {'show': 'full'}
 
@@ -65,15 +87,28 @@ def get_run_list(run):
         return config.db_list()
 
 
+def id_field(endpoint):
+    """Return the name of an endpoint's primary id field."""
+    # NEW RESOURCE: Add the primary id field of a new endpoint here
+    fields = {'occ': 'occ_id',
+              'loc': 'locale_id',
+              'tax': 'taxon_id',
+              'ref': 'ref_id'}
+
+    return fields.get(endpoint)
+
+
 def get_id_numbers(data, endpoint):
-    """Return a list of the specified endpoint's primary id numbers."""
-    ids = set()
-    id_field = '{0:s}_id'.format(endpoint)
+    """
+    Return a list of the specified endpoint's primary id numbers.
 
-    for rec in data:
-        ids.add(rec.get(id_field))
+    Ids are unique and in the order first returned. Data may be records
+    or, from an identifier only subquery (show=idx), the ids themselves.
+    """
+    key = id_field(endpoint)
 
-    return list(ids)
+    return list(dict.fromkeys(rec if isinstance(rec, str) else rec.get(key)
+                              for rec in data))
 
 
 def build_meta(options):
@@ -88,11 +123,13 @@ def build_meta(options):
             'subtaxa_included': options.get('includelower')}
 
 
-def build_meta_sub(source, t0, sub_tag, options, data=None):
+def build_meta_sub(source, t0, sub_tag, options, data=None, count=None):
     """Generate database specific metadata object for the return."""
     from time import time
 
-    if data and type(data) is list:
+    if count is not None:
+        rec_count = count
+    elif data and type(data) is list:
         rec_count = len(data) - options.get('tot_rec_count')
         options.update(tot_rec_count=len(data))
     else:
@@ -101,6 +138,11 @@ def build_meta_sub(source, t0, sub_tag, options, data=None):
         else:
             rec_count = 1
 
-    return {sub_tag: {'subquery': source,
+    meta = {sub_tag: {'subquery': source,
                       'response_time': round(time()-t0, 3),
                       'record_count': rec_count}}
+
+    if options.get('notice'):
+        meta[sub_tag].update(notice=options.get('notice'))
+
+    return meta
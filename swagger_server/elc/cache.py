@@ -0,0 +1,206 @@
+"""Response cache for upstream subqueries with TTL and LRU eviction."""
+
+import threading
+from collections import OrderedDict, Counter
+
+# In-memory tier: key -> (expiry time, db, value, size in bytes)
+_memory = OrderedDict()
+_lock = threading.Lock()
+
+# Total size of the in-memory tier values (upstream body bytes)
+_bytes = 0
+
+# Hit and miss counters keyed by (db, outcome)
+_stats = Counter()
+
+# Per-thread SQLite connections for the shared on-disk tier
+_local = threading.local()
+
+
+def make_key(url_path, payload):
+    """Return a canonical cache key for an upstream request."""
+    import hashlib
+    import json
+
+    canon = json.dumps([url_path, sorted((str(k), str(v))
+                                         for k, v in payload.items())])
+
+    return hashlib.sha1(canon.encode('utf-8')).hexdigest()
+
+
+def ttl(db):
+    """Return the time-to-live in seconds for cached responses of a db."""
+    from ..elc import config
+
+    try:
+        return config.get('cache_ttl', db)
+    except KeyError:
+        return config.get('cache_ttl', 'default')
+
+
+def count(db, outcome):
+    """Increment a cache counter."""
+    with _lock:
+        _stats[(db, outcome)] += 1
+
+
+def stats():
+    """Return a copy of the cache counters as {db: {outcome: count}}."""
+    summary = dict()
+
+    with _lock:
+        for (db, outcome), n in _stats.items():
+            summary.setdefault(db, dict())[outcome] = n
+        summary.update(entries=len(_memory), bytes=_bytes)
+
+    return summary
+
+
+def get_disk():
+    """Return this thread's connection to the on-disk tier, or None."""
+    import sqlite3
+    from ..elc import config
+
+    path = config.get('cache', 'disk')
+    if not path:
+        return None
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS response '
+                     '(key TEXT PRIMARY KEY, db TEXT, expires REAL, '
+                     'body TEXT)')
+        conn.execute('CREATE INDEX IF NOT EXISTS response_expires '
+                     'ON response (expires)')
+        _local.conn = conn
+
+    return conn
+
+
+def get(key, db):
+    """
+    Return a cached value or None.
+
+    :arg key: Key from make_key
+    :type key: str
+    :arg db: Database name, used for counters
+    :type db: str
+    """
+    import json
+    import sqlite3
+    from time import time
+
+    now = time()
+
+    with _lock:
+        item = _memory.get(key)
+        if item and item[0] > now:
+            _memory.move_to_end(key)
+            _stats[(db, 'memory_hit')] += 1
+            return item[2]
+        elif item:
+            drop(key)
+
+    try:
+        conn = get_disk()
+        if conn:
+            row = conn.execute('SELECT expires, body FROM response '
+                               'WHERE key = ?', (key,)).fetchone()
+            if row and row[0] > now:
+                value = json.loads(row[1])
+                store_memory(key, db, value, row[0], len(row[1]))
+                count(db, 'disk_hit')
+                return value
+    except sqlite3.Error:
+        count(db, 'disk_error')
+
+    count(db, 'miss')
+
+    return None
+
+
+def drop(key):
+    """Remove an in-memory entry (the caller holds the lock)."""
+    global _bytes
+
+    item = _memory.pop(key, None)
+    if item:
+        _bytes -= item[3]
+
+
+def store_memory(key, db, value, expires, size=0):
+    """
+    Insert into the in-memory tier, evicting least recently used.
+
+    Entries are evicted until both the entry count and the total size
+    are within cache: entries and cache: max_bytes.
+
+    :arg size: Size of the raw upstream body in bytes
+    :type size: int
+    """
+    from ..elc import config
+
+    global _bytes
+
+    max_entries = config.get('cache', 'entries')
+    max_bytes = config.get('cache', 'max_bytes')
+
+    with _lock:
+        drop(key)
+        _memory[key] = (expires, db, value, size)
+        _bytes += size
+        while _memory and (len(_memory) > max_entries or
+                           _bytes > max_bytes):
+            drop(next(iter(_memory)))
+
+
+def put(key, db, value, size=0):
+    """
+    Store a value in the cache tiers.
+
+    :arg value: JSON serializable value
+    :arg size: Size of the raw upstream body in bytes
+    :type size: int
+    """
+    import json
+    import sqlite3
+    from time import time
+    from ..elc import config
+
+    if size > config.get('cache', 'max_item_bytes'):
+        count(db, 'too_large')
+        return
+
+    expires = time() + ttl(db)
+
+    store_memory(key, db, value, expires, size)
+
+    try:
+        conn = get_disk()
+        if conn:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO response '
+                             'VALUES (?, ?, ?, ?)',
+                             (key, db, expires, json.dumps(value)))
+                conn.execute('DELETE FROM response WHERE expires < ?',
+                             (time(),))
+    except sqlite3.Error:
+        count(db, 'disk_error')
+
+
+def clear():
+    """Empty the in-memory tier."""
+    global _bytes
+
+    with _lock:
+        _memory.clear()
+        _bytes = 0
+
+
+def bypass(headers):
+    """Return True if the client asked for fresh (uncached) data."""
+    directives = headers.get('Cache-Control', '').lower()
+
+    return 'no-cache' in directives or 'no-store' in directives
@@ -0,0 +1,49 @@
+"""Single-flight coalescing of identical concurrent upstream calls."""
+
+import threading
+
+# In-flight calls: key -> {'done': Event, 'result': ..., 'error': ...}
+_calls = dict()
+_lock = threading.Lock()
+
+
+def run(key, func, *args, **kwargs):
+    """
+    Call func once per key for all threads requesting it concurrently.
+
+    The first thread to ask for a key makes the call. Threads arriving
+    while it is in flight wait and share its result (or its exception).
+
+    :arg key: Hashable identity of the call
+    :arg func: Callable to run
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = {'done': threading.Event(), 'result': None, 'error': None}
+            _calls[key] = call
+
+    if not leader:
+        call['done'].wait()
+        if call['error']:
+            raise call['error']
+        return call['result']
+
+    try:
+        call['result'] = func(*args, **kwargs)
+    except Exception as err:
+        call['error'] = err
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call['done'].set()
+
+    return call['result']
+
+
+def in_flight():
+    """Return the number of calls currently in flight."""
+    with _lock:
+        return len(_calls)
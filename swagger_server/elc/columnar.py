@@ -0,0 +1,196 @@
+"""
+Apache Arrow IPC stream and Parquet returns of columnar decoded records.
+
+Requires pyarrow, which is optional; the arrow and parquet formats are
+refused when it is not installed.
+"""
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ['arrow', 'parquet']
+
+MIMETYPES = {'arrow': 'application/vnd.apache.arrow.stream',
+             'parquet': 'application/vnd.apache.parquet'}
+
+# ELC field types; fields not listed are strings
+FLOAT_FIELDS = ['max_age', 'min_age', 'lat', 'lon', 'elevation']
+INTEGER_FIELDS = ['occurrences_count']
+
+# Repetitive string fields are dictionary encoded
+DICTIONARY_FIELDS = ['taxon', 'source', 'data_type']
+
+
+class Sink(object):
+    """Write-only file object collecting output until it is drained."""
+
+    def __init__(self):
+        self.parts = list()
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        """Return and forget the bytes written so far."""
+        data = b''.join(self.parts)
+        self.parts = list()
+        return data
+
+
+def available():
+    """Return True if the columnar formats can be written."""
+    return pyarrow is not None
+
+
+def field_type(name):
+    """Return the Arrow type of an ELC field."""
+    if name in FLOAT_FIELDS:
+        return pyarrow.float64()
+
+    if name in INTEGER_FIELDS:
+        return pyarrow.int64()
+
+    if name in DICTIONARY_FIELDS:
+        return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+
+    return pyarrow.string()
+
+
+def build_schema(fields, desc_obj):
+    """
+    Return the Arrow schema of a return.
+
+    :arg fields: ELC field names in column order
+    :type fields: list (of str)
+    :arg desc_obj: Composite metadata, kept as JSON in the schema metadata
+    :type desc_obj: dict
+    """
+    from ..elc import serial
+
+    return pyarrow.schema([(name, field_type(name)) for name in fields],
+                          metadata={'metadata': serial.dumps(desc_obj)})
+
+
+def coerce(values, arrow_type):
+    """Return values converted to the Python type of an Arrow type."""
+    if pyarrow.types.is_floating(arrow_type):
+        convert = float
+    elif pyarrow.types.is_integer(arrow_type):
+        convert = int
+    else:
+        convert = str
+
+    def safe(x):
+        try:
+            return convert(x)
+        except (TypeError, ValueError):
+            return None
+
+    return [None if x is None else safe(x) for x in values]
+
+
+def record_batch(cols, schema, n):
+    """
+    Return an Arrow record batch of ELC field columns.
+
+    Fields missing from the columns (e.g. not mapped for the database)
+    are null. Values that do not fit the field type are converted.
+    """
+    arrays = list()
+
+    for field in schema:
+        values = cols.get(field.name) or [None] * n
+        try:
+            arrays.append(pyarrow.array(values, type=field.type))
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            arrays.append(pyarrow.array(coerce(values, field.type),
+                                        type=field.type))
+
+    return pyarrow.record_batch(arrays, schema=schema)
+
+
+def pieces(opened, schema, fmt):
+    """
+    Generate the bytes of an Arrow stream or Parquet file.
+
+    Each column batch decoded from the upstream responses is written as
+    one record batch (Parquet row group) and sent on at once. Subqueries
+    that fail after the schema was sent are reported as JSON {db: message}
+    under the 'errors' key: in the Parquet footer metadata, or in the
+    custom metadata of an empty final Arrow record batch.
+
+    :arg opened: Streamed subqueries yielding column batches
+    :type opened: list (of dicts)
+    """
+    from ..elc import serial, writer
+
+    sink = Sink()
+    errors = dict()
+
+    if fmt == 'parquet':
+        out = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        out = pyarrow.ipc.new_stream(sink, schema)
+
+    try:
+        for sub in opened:
+            try:
+                for cols in sub['records']:
+                    n = len(next(iter(cols.values()), []))
+                    if n:
+                        out.write_batch(record_batch(cols, schema, n))
+                        yield sink.drain()
+
+            except Exception as err:
+                # Headers are already sent; end this database's rows
+                errors[sub['db']] = writer.stream_error(err)
+
+        if errors and fmt == 'parquet':
+            out.add_key_value_metadata({'errors': serial.dumps(errors)})
+        elif errors:
+            empty = record_batch(dict(), schema, 0)
+            out.write_batch(empty, custom_metadata={
+                'errors': serial.dumps(errors)})
+
+        out.close()
+        yield sink.drain()
+
+    finally:
+        for sub in opened:
+            sub['close']()
+
+
+def response(opened, options, filename, fields):
+    """
+    Return a streamed Arrow IPC or Parquet file download.
+
+    :arg opened: Streamed subqueries from dispatch.open_streams
+    :type opened: list (of dicts)
+    :arg options: Runtime options
+    :type options: dict
+    :arg filename: Download file name
+    :type filename: str
+    :arg fields: ELC field names in column order
+    :type fields: list (of str)
+    """
+    from flask import Response
+    from ..elc import aux
+
+    fmt = options.get('output')
+    schema = build_schema(fields, aux.build_meta(options))
+    disposition = 'attachment; filename={0:s}'.format(filename)
+
+    return Response(pieces(opened, schema, fmt),
+                    mimetype=MIMETYPES.get(fmt),
+                    headers={'Content-Disposition': disposition})
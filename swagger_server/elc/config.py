@@ -1,5 +1,28 @@
 """Read settings from config.yaml."""
 
+import threading
+
+CONFIG_FILE = 'config.yaml'
+
+# Seconds between checks of the config file modification time
+CHECK_INTERVAL = 1.0
+
+# Groups and per-database settings which must be present in the file
+REQUIRED = {'groups': ['resource_api', 'service_api', 'native_ageunits',
+                       'default', 'http_pool', 'http_timeout', 'http_retries',
+                       'http_backoff', 'cache', 'cache_ttl', 'stream',
+                       'paging', 'paging_workers', 'taxonomy', 'suggest',
+                       'resolve', 'workers'],
+            'db_groups': ['native_ageunits', 'db_occ_endpt', 'db_loc_endpt',
+                          'db_tax_endpt', 'db_ref_endpt'],
+            'default': ['ageunits', 'coordinates', 'includelower', 'limit',
+                        'license']}
+
+# Per-process snapshot:
+# (parsed settings, file name, file mtime last read, last mtime check)
+_snapshot = (None, CONFIG_FILE, None, 0.0)
+_lock = threading.Lock()
+
 
 def read_file(filename):
     """Local file reader function."""
@@ -9,6 +32,103 @@ def read_file(filename):
         return yaml.safe_load(f)
 
 
+def freeze(data):
+    """Return a read-only copy of a parsed YAML structure."""
+    from types import MappingProxyType
+
+    if isinstance(data, dict):
+        return MappingProxyType({k: freeze(v) for k, v in data.items()})
+    elif isinstance(data, list):
+        return tuple(freeze(x) for x in data)
+    else:
+        return data
+
+
+def validate(data_map):
+    """Check parsed settings for the groups and keys used by the API."""
+    if not isinstance(data_map, dict):
+        msg = 'Config: {0:s} is not a YAML mapping'.format(CONFIG_FILE)
+        raise ValueError(500, msg)
+
+    for group in REQUIRED['groups'] + REQUIRED['db_groups']:
+        if not isinstance(data_map.get(group), dict):
+            msg = 'Config: missing settings group {0:s}'.format(group)
+            raise ValueError(500, msg)
+
+    for db in data_map['resource_api'].keys():
+        for group in REQUIRED['db_groups']:
+            if db not in data_map[group]:
+                msg = 'Config: {0:s} missing for {1:s}'.format(group, db)
+                raise ValueError(500, msg)
+
+    for param in REQUIRED['default']:
+        if param not in data_map['default']:
+            msg = 'Config: default {0:s} not set'.format(param)
+            raise ValueError(500, msg)
+
+
+def reload(filename=CONFIG_FILE):
+    """
+    Parse, validate and install a new settings snapshot.
+
+    The running snapshot is only replaced once the new file has been read
+    and validated, so a broken edit leaves the previous settings in place.
+
+    :arg filename: Path to the YAML configuration file
+    :type filename: str
+    """
+    import os
+    from time import time
+
+    global _snapshot
+
+    with _lock:
+        mtime = os.stat(filename).st_mtime
+        data_map = read_file(filename)
+        validate(data_map)
+        _snapshot = (freeze(data_map), filename, mtime, time())
+
+    return _snapshot[0]
+
+
+def current():
+    """Return the settings snapshot, reloading if the file has changed."""
+    import os
+    from time import time
+
+    global _snapshot
+
+    data_map, filename, mtime, checked = _snapshot
+    now = time()
+
+    if data_map is None:
+        return reload(filename)
+
+    if now - checked < CHECK_INTERVAL:
+        return data_map
+
+    try:
+        new_mtime = os.stat(filename).st_mtime
+    except OSError:
+        return data_map
+
+    if new_mtime != mtime:
+        try:
+            return reload(filename)
+        except Exception as err:
+            # Keep serving the last good settings if the edit is invalid;
+            # the broken file is not read again until it changes
+            import logging
+            logging.getLogger(__name__).warning(
+                'Config: %s not reloaded, keeping previous settings: %s',
+                filename, err)
+            mtime = new_mtime
+
+    _snapshot = (data_map, filename, mtime, now)
+
+    return data_map
+
+
 def get(group, param):
     """
     Return specified configuration parameters.
@@ -18,13 +138,13 @@ def get(group, param):
     :arg param: Setting name
     :type param: str
     """
-    data_map = read_file('config.yaml')
+    data_map = current()
 
     return data_map[group][param]
 
 
 def db_list():
     """Return names of all external queryable database resources."""
-    data_map = read_file('config.yaml')
+    data_map = current()
 
     return data_map['resource_api'].keys()
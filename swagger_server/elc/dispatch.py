@@ -0,0 +1,375 @@
+"""Concurrent dispatch of per-database subqueries for the data endpoints."""
+
+
+def subquery(req_args, options, db, endpoint):
+    """
+    Parse, fetch and decode the subquery for a single database.
+
+    Returns None if the database is skipped (no matching ids), otherwise
+    a tuple of the decoded records and the database metadata block.
+
+    :arg req_args: Client request parameters
+    :type req_args: dict
+    :arg options: Runtime options from params.set_options
+    :type options: dict
+    :arg db: Database name
+    :type db: str
+    :arg endpoint: Route name (occ, loc, ref or tax)
+    :type endpoint: str
+    """
+    from time import time
+    from ..elc import params, aux, taxa, timing
+
+    t0 = time()
+    timing.start(endpoint, db)
+
+    # Mutable per-database state kept apart from the shared options
+    db_options = dict(options)
+    db_options.update(skip=False, tot_rec_count=0)
+
+    try:
+        with timing.span('parse'):
+            payload = params.parse(req_args=req_args,
+                                   options=db_options,
+                                   db=db,
+                                   endpoint=endpoint)
+
+        # Skip this database if no ids specified
+
+        if db_options.get('skip'):
+            return None
+
+        # Statistics only returns count the records without decoding them
+
+        if options.get('count_only'):
+            rec_count, api_call = fetch_count(payload, db_options, db,
+                                              endpoint)
+            records = list()
+        elif options.get('ids_only'):
+            records, api_call = fetch_ids(payload, db_options, db, endpoint)
+            rec_count = None
+        else:
+            records, api_call = fetch_decode(payload, db_options, db,
+                                             endpoint)
+            rec_count = None
+            if options.get('hierarchy'):
+                with timing.span('hierarchy'):
+                    taxa.set_hierarchy(records)
+
+    finally:
+        stages = timing.stop()
+
+    meta = aux.build_meta_sub(data=records,
+                              source=api_call,
+                              t0=t0,
+                              sub_tag=db,
+                              options=db_options,
+                              count=rec_count)
+
+    if options.get('show') == 'timing':
+        meta[db].update(timing=stages)
+
+    return records, meta
+
+
+def fetch_json(url_path, payload, options, db, endpoint):
+    """
+    Fetch the decoded upstream response of a subquery.
+
+    Large occ and loc pulls are paged, and taxon name lists too long for
+    one request are split into batches (see subreq.batched).
+    """
+    from ..elc import subreq, taxa
+
+    fresh = options.get('fresh')
+    paged = endpoint in ['occ', 'loc']
+    key = taxa.name_list_key(db)
+
+    if key and key in payload:
+        return subreq.batched(url_path, payload, db, key, fresh=fresh,
+                              paged=paged)
+
+    if paged:
+        return subreq.paginate(url_path, payload, db, fresh=fresh)
+
+    return subreq.trigger(url_path, payload, db, fresh=fresh)
+
+
+def fetch_decode(payload, options, db, endpoint):
+    """Fetch a database subquery and decode it into ELC records."""
+    from ..elc import config, timing
+    from ..handlers import router
+
+    url_path = ''.join([config.get('resource_api', db),
+                        config.get('db_{0:s}_endpt'.format(endpoint), db)])
+
+    # Large record pulls are split into concurrently fetched pages
+
+    with timing.span('fetch'):
+        resp_json, api_call = fetch_json(url_path, payload, options, db,
+                                         endpoint)
+
+    with timing.span('transform'):
+        records = router.response_decode(resp_json=resp_json,
+                                         return_obj=list(),
+                                         options=options,
+                                         db=db,
+                                         endpoint=endpoint)
+
+    return records, api_call
+
+
+def fetch_ids(payload, options, db, endpoint):
+    """
+    Fetch a subquery and return only the primary ids of its records.
+
+    Routes with a declared field mapping compute the id column alone;
+    others are decoded in full.
+    """
+    from ..elc import aux, config, timing
+    from ..handlers import mapping
+
+    extractor = mapping.get(db, endpoint)
+
+    if extractor is None:
+        records, api_call = fetch_decode(payload, options, db, endpoint)
+        return aux.get_id_numbers(records, endpoint), api_call
+
+    url_path = ''.join([config.get('resource_api', db),
+                        config.get('db_{0:s}_endpt'.format(endpoint), db)])
+
+    with timing.span('fetch'):
+        resp_json, api_call = fetch_json(url_path, payload, options, db,
+                                         endpoint)
+
+    with timing.span('transform'):
+        ids = extractor.identifiers(resp_json, aux.id_field(endpoint),
+                                    options)
+
+    return ids, api_call
+
+
+def fetch_count(payload, options, db, endpoint):
+    """
+    Return the number of ELC records a subquery would return and its URL.
+
+    Databases with a count query (see subreq.count) are asked for the
+    number of matches only. Otherwise the response is fetched (and cached,
+    ready for a following full request) and, for routes with a declared
+    field mapping, its upstream records counted without being decoded.
+    """
+    from ..elc import config, subreq, timing
+    from ..handlers import mapping
+
+    url_path = ''.join([config.get('resource_api', db),
+                        config.get('db_{0:s}_endpt'.format(endpoint), db)])
+
+    extractor = mapping.get(db, endpoint)
+    explode = extractor.explode if extractor else None
+
+    if not explode:
+        with timing.span('fetch'):
+            found, api_call = subreq.count(url_path, payload, db,
+                                           fresh=options.get('fresh'))
+        if found is not None:
+            start = int(payload.get('offset') or 0)
+            limit = payload.get('limit')
+            limit = found if limit is None else int(limit)
+            return min(max(found - start, 0), limit), api_call
+
+    # Records filtered after decoding (see ages.set_age) must be decoded
+    if extractor is None or options.get('age_filter'):
+        records, api_call = fetch_decode(payload, options, db, endpoint)
+        return len(records), api_call
+
+    with timing.span('fetch'):
+        resp_json, api_call = fetch_json(url_path, payload, options, db,
+                                         endpoint)
+
+    records = resp_json.get(extractor.key) or []
+
+    # One ELC record is made per element of an exploded list
+    if explode:
+        return sum(len(rec.get(explode) or []) for rec in records), api_call
+
+    return len(records), api_call
+
+
+def open_stream(req_args, options, db, endpoint):
+    """
+    Parse the subquery for a single database and open a streamed response.
+
+    Returns None if the database is skipped, otherwise a dictionary with
+    the lazily decoded ELC records (column batches for the columnar output
+    formats) and what is needed for its metadata.
+    """
+    from time import time
+    from ..elc import config, params, subreq, columnar, taxa
+    from ..handlers import router
+
+    t0 = time()
+
+    db_options = dict(options)
+    db_options.update(skip=False, tot_rec_count=0)
+
+    payload = params.parse(req_args=req_args,
+                           options=db_options,
+                           db=db,
+                           endpoint=endpoint)
+
+    if db_options.get('skip'):
+        return None
+
+    url_path = ''.join([config.get('resource_api', db),
+                        config.get('db_{0:s}_endpt'.format(endpoint), db)])
+
+    upstream, api_call, close = subreq.stream(url_path, payload, db,
+                                              key=router.records_key(db),
+                                              batch_key=taxa.name_list_key(db),
+                                              fresh=options.get('fresh'))
+
+    if options.get('output') in columnar.FORMATS:
+        decode = router.column_decode
+    else:
+        decode = router.record_decode
+
+    records = decode(records=upstream,
+                     options=db_options,
+                     db=db,
+                     endpoint=endpoint)
+
+    return {'db': db,
+            'records': records,
+            'close': close,
+            'source': api_call,
+            'options': db_options,
+            't0': t0}
+
+
+def open_streams(req_args, options, run_list, endpoint):
+    """
+    Open streamed subqueries to all databases in the run list concurrently.
+
+    Upstream status and content type errors are raised here, before any
+    part of the response has been sent to the client.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import config
+
+    run_list = list(run_list)
+    opened = list()
+
+    if not run_list:
+        return opened
+
+    workers = min(len(run_list), config.get('workers', 'dispatch'))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(open_stream, req_args, options, db,
+                                   endpoint)
+                   for db in run_list]
+
+        failed = None
+        for future in futures:
+            try:
+                sub = future.result()
+            except ValueError as err:
+                failed = failed or err
+                continue
+            if sub:
+                opened.append(sub)
+
+    if failed:
+        for sub in opened:
+            sub['close']()
+        raise ValueError(failed.args[0], failed.args[1])
+
+    return opened
+
+
+def each(req_args, options, run_list, endpoint):
+    """
+    Query all databases in the run list concurrently, one result at a time.
+
+    The subqueries start at once. Returns a generator of (db, records,
+    metadata) in run list order, each yielded as soon as its subquery and
+    those before it are complete, so no merged record list is built. A
+    failed subquery yields its ValueError in place of the records and None
+    for the metadata. Skipped databases are left out.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import config
+
+    run_list = list(run_list)
+
+    if not run_list:
+        return iter(())
+
+    workers = min(len(run_list), config.get('workers', 'dispatch'))
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    futures = [executor.submit(subquery, req_args, options, db, endpoint)
+               for db in run_list]
+
+    # Submitted subqueries still run; the workers exit when they are done
+    executor.shutdown(wait=False)
+
+    def collect():
+        for db, future in zip(run_list, futures):
+            try:
+                result = future.result()
+            except ValueError as err:
+                yield db, err, None
+                continue
+            if result is not None:
+                yield (db,) + result
+
+    return collect()
+
+
+def run(req_args, options, run_list, endpoint):
+    """
+    Query all databases in the run list concurrently.
+
+    Records are merged in run list order regardless of completion order.
+    If any subquery fails, the error of the first failing database (in run
+    list order) is raised as ValueError(status, detail).
+
+    :arg run_list: Database names from aux.get_run_list
+    :type run_list: list (of str)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import config, aux
+
+    return_obj = list()
+    desc_obj = dict()
+    run_list = list(run_list)
+
+    if not run_list:
+        return return_obj, desc_obj
+
+    workers = min(len(run_list), config.get('workers', 'dispatch'))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(subquery, req_args, options, db, endpoint)
+                   for db in run_list]
+
+        results = list()
+        for future in futures:
+            try:
+                results.append(future.result())
+            except ValueError as err:
+                raise ValueError(err.args[0], err.args[1])
+
+    for result in results:
+        if result is None:
+            continue
+
+        records, meta = result
+        return_obj.extend(records)
+
+        # Build returned metadata object
+        desc_obj.update(aux.build_meta(options))
+        desc_obj.update(meta)
+
+    return return_obj, desc_obj
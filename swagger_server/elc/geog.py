@@ -47,30 +47,105 @@ def get_geog(coords, age, options):
 def resolve_geog(lat, lon, mean_age):
     """Query GPlates model (hosted by MacroStrat) for paleocoordinates."""
     import requests
-    from ..elc import config
+    from ..elc import config, pool
 
-    url = 'https://macrostrat.org/gplates/reconstruct'
+    url = config.get('service_api', 'gplates')
     payload = {'lat': lat, 'lng': lon, 'age': mean_age}
 
     try:
-        r = requests.get(url=url,
-                         params=payload,
-                         timeout=config.get('default', 'timeout'))
+        r = pool.get(url, payload, 'gplates')
         r.raise_for_status()
 
     except requests.exceptions.HTTPError as e:
-        msg = '{0:s}'.format(r.json().get('error'))
+        try:
+            msg = '{0}'.format(r.json().get('error'))
+        except (AttributeError, ValueError):
+            msg = 'GPlates request failed: {0:s}'.format(str(e))
         raise ValueError(r.status_code, msg)
 
-    if r.json().get('features')[0]['geometry']:
-        coords = r.json().get('features')[0]['geometry']['coordinates']
-        geog_ref = r.json().get('properties')['model']['citation']
+    # Any other response shape is an upstream error, not a missing point
+    try:
+        body = r.json()
+        geometry = body['features'][0]['geometry']
+        if geometry:
+            lng, lat = geometry['coordinates'][:2]
+            coords = [float(lng), float(lat)]
+            geog_ref = body['properties']['model']['citation']
+
+    except (KeyError, IndexError, TypeError, ValueError):
+        msg = 'Unexpected GPlates response'
+        raise ValueError(502, msg)
+
+    if geometry:
         return coords, geog_ref
     else:
         msg = 'Unavailable point or inalid WGS84 coords'
         raise ValueError(400, msg)
 
 
+def resolve_geog_many(points):
+    """
+    Resolve paleocoordinates for a collection of points concurrently.
+
+    Returns a dictionary mapping each (lat, lon, age) point to its rounded
+    (paleo_lat, paleo_lon) pair, or None where GPlates could not rotate it.
+
+    :arg points: Unique (lat, lon, age in Ma) tuples
+    :type points: set (of tuples)
+    """
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import config
+
+    points = list(points)
+
+    def lookup(point):
+        try:
+            coords, geog_ref = resolve_geog(lat=point[0],
+                                            lon=point[1],
+                                            mean_age=point[2])
+        except (ValueError, requests.exceptions.RequestException):
+            return None
+        return round(coords[1], 4), round(coords[0], 4)
+
+    if not points:
+        return dict()
+
+    workers = min(len(points), config.get('workers', 'paleo'))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(points, executor.map(lookup, points)))
+
+
+def paleo_columns(lat, lon, age):
+    """
+    Return paleocoordinate columns for modern coordinate columns.
+
+    Each distinct point is resolved once for the whole response. Rows
+    without an age, or whose point can not be rotated, keep their modern
+    coordinates.
+
+    :arg lat: Modern latitudes
+    :type lat: list (of floats)
+    :arg lon: Modern longitudes
+    :type lon: list (of floats)
+    :arg age: Age of each row in whole Ma
+    :type age: list (of ints)
+    """
+    from ..elc import timing
+
+    points = [(y, x, a) if y is not None and a is not None else None
+              for y, x, a in zip(lat, lon, age)]
+
+    with timing.span('paleo'):
+        resolved = resolve_geog_many(set(points) - {None})
+
+    rotated = [resolved.get(p) if p else None for p in points]
+
+    return ([r[0] if r else y for r, y in zip(rotated, lat)],
+            [r[1] if r else x for r, x in zip(rotated, lon)])
+
+
 def set_location(wkt, db):
     """Return location constraint payload parameter."""
     if 'POLYGON((' not in wkt:
@@ -0,0 +1,149 @@
+"""Local index of geologic time intervals for offline age resolution."""
+
+import threading
+
+SNAPSHOT = 'swagger_server/lookup/pbdb_intervals.yaml'
+
+# Normalised interval name -> {'eag', 'lag', 'col', 'ref'}
+_index = None
+_lock = threading.Lock()
+
+
+def normalize(name):
+    """Return the lookup key for a geologic age name."""
+    return ' '.join(name.lower().split())
+
+
+def build(snapshot):
+    """
+    Return a name index from a parsed interval snapshot.
+
+    :arg snapshot: Mapping with 'intervals' and 'references' entries
+    :type snapshot: dict
+    """
+    refs = snapshot.get('references') or dict()
+    index = dict()
+
+    for rec in snapshot.get('intervals') or []:
+        index[normalize(rec.get('nam'))] = {'eag': rec.get('eag'),
+                                            'lag': rec.get('lag'),
+                                            'col': rec.get('col'),
+                                            'ref': refs.get(rec.get('rid'))}
+
+    return index
+
+
+def load(filename=SNAPSHOT):
+    """Load the interval index from a bundled snapshot file."""
+    from ..elc import config
+
+    global _index
+
+    snapshot = config.read_file(filename)
+
+    with _lock:
+        _index = build(snapshot)
+
+    return _index
+
+
+def get_index():
+    """
+    Return the interval index, loading the snapshot on first use.
+
+    A snapshot that cannot be read leaves an empty index (until add or
+    refresh), so it is not read again on every lookup.
+    """
+    global _index
+
+    if _index is None:
+        try:
+            return load()
+        except (OSError, ValueError):
+            with _lock:
+                if _index is None:
+                    _index = dict()
+
+    return _index
+
+
+def lookup(name):
+    """
+    Return the interval record for a geologic age name or None.
+
+    :arg name: Geologic age name (case and whitespace insensitive)
+    :type name: str
+    """
+    return get_index().get(normalize(name))
+
+
+def add(name, **fields):
+    """Add or update an index entry (e.g. from a PBDB network lookup)."""
+    global _index
+
+    with _lock:
+        index = dict(_index or dict())
+        entry = dict(index.get(normalize(name), dict()))
+        entry.update(fields)
+        index[normalize(name)] = entry
+        _index = index
+
+
+def fetch():
+    """Download the international timescale intervals from PBDB."""
+    from ..elc import config, pool
+
+    base_url = config.get('resource_api', 'pbdb')
+
+    resp = pool.get(base_url + 'intervals/list.json',
+                    {'scale': 1, 'vocab': 'com'}, 'pbdb')
+    resp.raise_for_status()
+    records = resp.json().get('records', [])
+
+    # Reference ids may be numbers or strings
+    ref_ids = sorted(set(str(rec.get('rid')[0]) for rec in records
+                         if rec.get('rid')))
+
+    resp = pool.get(base_url + 'refs/list.json',
+                    {'id': ','.join(ref_ids), 'show': 'both'}, 'pbdb')
+    resp.raise_for_status()
+
+    refs = {str(rec.get('oid')): rec.get('ref')
+            for rec in resp.json().get('records', [])}
+
+    intervals = [{'nam': rec.get('nam'),
+                  'eag': rec.get('eag'),
+                  'lag': rec.get('lag'),
+                  'col': rec.get('col'),
+                  'rid': str(rec.get('rid')[0]) if rec.get('rid') else None}
+                 for rec in records]
+
+    return {'references': refs, 'intervals': intervals}
+
+
+def refresh(filename=None):
+    """
+    Rebuild the index from PBDB, optionally rewriting the snapshot file.
+
+    :arg filename: Snapshot path to write, or None to only update memory
+    :type filename: str
+    """
+    import yaml
+
+    global _index
+
+    snapshot = fetch()
+    index = build(snapshot)
+
+    if filename:
+        with open(filename, 'w') as f:
+            yaml.safe_dump(snapshot, f, default_flow_style=None)
+
+    with _lock:
+        _index = index
+
+    return index
+
+
+if __name__ == '__main__':
+    refresh(filename=SNAPSHOT)
@@ -0,0 +1,587 @@
+"""
+In-memory taxon name index for prefix suggestions.
+
+Names and synonyms of both databases are kept in one array sorted by
+lookup key, so the names starting with a prefix are a single slice found
+by binary search. PBDB names come from its whole taxa list (all_taxa),
+Neotoma names from its taxa list.
+
+The index is built by a background thread of each worker process on
+first use and rebuilt every suggest: refresh seconds. Both lists are
+downloaded by each worker, or, with a suggest: snapshot file, by one
+worker for all of them (see shared). Only the names of the taxa records
+are kept; a database that cannot be reached keeps its names of the
+index in use. Bulk name resolution (see resolve)
+answers from the index first and caches the upstream answers for the
+other names.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Index in use
+_index = None
+# (process id, loader thread)
+_loader = (None, None)
+# Number of taxa records of each database in the index
+_listed = {'pbdb': 0, 'neotoma': 0}
+# (db, normalised name) -> (ELC taxon ids, accepted name, fetch time),
+# least recently used first
+_resolved = OrderedDict()
+_lock = threading.Lock()
+
+# NEW RESOURCE: Add the ELC taxon id prefix of a database
+ID_PREFIX = {'pbdb': 'pbdb:', 'neotoma': 'neot:'}
+
+# Seconds before a failed or waiting index build is tried again
+RETRY = 30
+
+
+class Names(object):
+    """
+    Immutable sorted arrays of taxon names.
+
+    :arg entries: Taxon name -> (ELC taxon ids, accepted name, rank)
+    :type entries: dict
+    """
+
+    def __init__(self, entries):
+        from array import array
+        from ..elc import taxonomy
+
+        order = sorted(entries, key=lambda name: (taxonomy.normalize(name),
+                                                  name))
+
+        self.keys = [taxonomy.normalize(name) for name in order]
+        self.names = order
+        self.ids = [entries[name][0] for name in order]
+        self.accepted = [entries[name][1] or name for name in order]
+        self.ranks = [entries[name][2] for name in order]
+
+        # Prefix independent ranking: accepted names, then shorter names
+        self.weight = array('l', ((self.accepted[i] != name) << 16 |
+                                  min(len(name), 0xffff)
+                                  for i, name in enumerate(order)))
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, key):
+        """Return the position of a normalised name, or None."""
+        from bisect import bisect_left
+
+        i = bisect_left(self.keys, key)
+
+        return i if i < len(self.keys) and self.keys[i] == key else None
+
+    def prefixed(self, prefix, scan):
+        """Return the positions of up to scan names starting with prefix."""
+        from bisect import bisect_left
+
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\uffff', lo)
+
+        return range(lo, min(hi, lo + scan))
+
+    def suggest(self, prefix, limit, scan):
+        """
+        Return ranked suggestions for a name prefix.
+
+        Exact matches come first, then accepted names before synonyms,
+        then shorter names, then name order. Only the first scan names of
+        the prefix (in name order) are ranked, which bounds the time for
+        short prefixes.
+        """
+        from heapq import nsmallest
+        from ..elc import taxonomy
+
+        prefix = taxonomy.normalize(prefix)
+        found = self.prefixed(prefix, scan)
+
+        # An exact match sorts first among the names of the prefix
+        exact = [i for i in found[:1] if self.keys[i] == prefix]
+
+        found = exact + nsmallest(limit - len(exact), found[len(exact):],
+                                  key=self.weight.__getitem__)
+
+        return [{'taxon': self.names[i],
+                 'taxon_ids': self.ids[i],
+                 'accepted': self.accepted[i],
+                 'rank': self.ranks[i]} for i in found]
+
+
+def pbdb_entries(entries, records):
+    """Add the names of PBDB taxa records (compact vocabulary)."""
+    from ..elc import taxonomy
+    from ..handlers import mapping
+
+    ranks = mapping.read_table('pbdb_taxa_ranks')
+
+    for rec in records:
+        name, _, _, accepted, rank = taxonomy.node(rec, ranks)
+        if not name:
+            continue
+        oid = 'pbdb:{0}'.format(rec.get('oid'))
+        known = entries.setdefault(name, ([], None, None))
+        if oid not in known[0]:
+            known[0].append(oid)
+        entries[name] = (known[0], known[1] or accepted, known[2] or rank)
+
+    return entries
+
+
+def neotoma_entries(entries, records):
+    """Add the names of Neotoma taxa records."""
+    for rec in records:
+        name = rec.get('taxonname')
+        if not name:
+            continue
+        known = entries.setdefault(name, ([], None, None))
+        known[0].append('neot:txn:{0}'.format(rec.get('taxonid')))
+
+    return entries
+
+
+def index_entries(index, db):
+    """
+    Return the names of one database in an earlier name index.
+
+    Accepted names and ranks are those of the database listed first in
+    the ids of a name (as added by build).
+    """
+    prefix = ID_PREFIX[db]
+    entries = dict()
+
+    for i, name in enumerate(index.names):
+        ids = [oid for oid in index.ids[i] if oid.startswith(prefix)]
+        if not ids:
+            continue
+        if index.ids[i][0].startswith(prefix):
+            accepted = index.accepted[i]
+            entries[name] = (ids, accepted if accepted != name else None,
+                             index.ranks[i])
+        else:
+            entries[name] = (ids, None, None)
+
+    return entries
+
+
+def add_entries(entries, more):
+    """Add the name entries of another database."""
+    for name, (ids, accepted, rank) in more.items():
+        known = entries.get(name) or ([], None, None)
+        entries[name] = (known[0] + list(ids), known[1] or accepted,
+                         known[2] or rank)
+
+    return entries
+
+
+def fetch_pbdb():
+    """Retrieve the whole PBDB taxa list (compact vocabulary)."""
+    import requests
+    from ..elc import config, pool
+
+    url = ''.join([config.get('resource_api', 'pbdb'), 'taxa/list.json'])
+    payload = {'all_taxa': 'true', 'vocab': 'com'}
+
+    try:
+        resp = pool.get(url, payload, 'pbdb')
+        resp.raise_for_status()
+        return resp.json().get('records') or []
+
+    except (requests.exceptions.RequestException, ValueError) as err:
+        msg = 'PBDB taxa request failed: {0:s}'.format(str(err))
+        raise ValueError(502, msg)
+
+
+def fetch_neotoma(taxa=None):
+    """
+    Retrieve the Neotoma taxa list, or the taxa of a list of names.
+
+    :arg taxa: Taxonomic names (all taxa if None)
+    :type taxa: list (of str)
+    """
+    import requests
+    from ..elc import config, pool
+
+    url = ''.join([config.get('resource_api', 'neotoma'),
+                   config.get('db_tax_endpt', 'neotoma')])
+    payload = {'limit': config.get('suggest', 'neotoma_limit')}
+    if taxa:
+        payload.update(taxonname=','.join(taxa))
+
+    try:
+        resp = pool.get(url, payload, 'neotoma')
+        resp.raise_for_status()
+        return resp.json().get('data') or []
+
+    except (requests.exceptions.RequestException, ValueError) as err:
+        msg = 'Neotoma taxa request failed: {0:s}'.format(str(err))
+        raise ValueError(502, msg)
+
+
+def fetch_entries():
+    """
+    Retrieve the taxa lists of both databases as name entries.
+
+    Returns the entries and number of taxa records of each database that
+    answered. The records themselves are not kept.
+    """
+    fetched = dict()
+
+    # NEW RESOURCE: Add the taxa list and name entries of a database
+    for db, fetch, add in [('pbdb', fetch_pbdb, pbdb_entries),
+                           ('neotoma', fetch_neotoma, neotoma_entries)]:
+        try:
+            records = fetch()
+        except ValueError:
+            continue
+        fetched[db] = {'listed': len(records),
+                       'entries': add(dict(), records)}
+
+    return fetched
+
+
+def dump(filename):
+    """Write the name entries of both databases to a JSON snapshot file."""
+    import json
+    import os
+
+    fetched = fetch_entries()
+    part = '{0:s}.{1:d}'.format(filename, os.getpid())
+
+    for db in ID_PREFIX:
+        if not fetched.get(db, {}).get('listed'):
+            msg = 'No {0:s} taxa to write'.format(db)
+            raise ValueError(502, msg)
+
+    with open(part, 'w') as f:
+        json.dump(fetched, f, separators=(',', ':'))
+
+    # Readers never see a partly written file
+    os.replace(part, filename)
+
+    return {db: fetched[db]['listed'] for db in fetched}
+
+
+def shared(filename):
+    """
+    Return the name entries of a snapshot file shared by the workers.
+
+    A missing file or one older than suggest: refresh seconds is written
+    again by the first worker to take its lock file; the others read the
+    file as it is (or retry later if there is none yet).
+    """
+    import json
+    import os
+    from time import time
+    from ..elc import config
+
+    refresh = config.get('suggest', 'refresh')
+    lock = filename + '.lock'
+
+    def age(name):
+        try:
+            return time() - os.path.getmtime(name)
+        except OSError:
+            return None
+
+    if age(filename) is None or age(filename) > refresh:
+        # The lock of a worker that died while writing expires
+        if (age(lock) or 0) > refresh:
+            os.remove(lock)
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            fd = None
+        if fd is not None:
+            try:
+                dump(filename)
+            except ValueError:
+                # Keep using the previous file
+                pass
+            finally:
+                os.close(fd)
+                os.remove(lock)
+
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        msg = 'Taxon name snapshot is being written, retry shortly'
+        raise ValueError(503, msg)
+
+
+def build():
+    """
+    Build the name index from both databases and swap it in.
+
+    The names of a database that cannot be reached are those of the index
+    in use.
+    """
+    from ..elc import config
+
+    global _index, _listed
+
+    snapshot = config.get('suggest', 'snapshot')
+    fetched = shared(snapshot) if snapshot else fetch_entries()
+    entries, listed = dict(), dict(_listed)
+
+    for db in ID_PREFIX:
+        if db in fetched:
+            add_entries(entries, fetched[db]['entries'])
+            listed[db] = fetched[db]['listed']
+        elif _index is not None:
+            add_entries(entries, index_entries(_index, db))
+
+    index = Names(entries)
+
+    with _lock:
+        _index = index
+        _listed = listed
+
+    return index
+
+
+def refresh():
+    """Rebuild the name index at the configured interval (thread body)."""
+    from time import sleep
+    from ..elc import config
+
+    while True:
+        try:
+            build()
+        except (ValueError, OSError):
+            sleep(RETRY)
+            continue
+        sleep(config.get('suggest', 'refresh'))
+
+
+def start():
+    """
+    Start the loader thread of this process unless it is running.
+
+    Called on first use, so workers that never suggest or resolve names
+    do not download the taxa lists.
+    """
+    import os
+
+    global _loader
+
+    with _lock:
+        pid, thread = _loader
+        # Threads do not survive a fork into worker processes
+        if pid == os.getpid() and thread.is_alive():
+            return
+        thread = threading.Thread(target=refresh, name='taxon-names',
+                                  daemon=True)
+        _loader = (os.getpid(), thread)
+
+    thread.start()
+
+
+def suggest(prefix, limit):
+    """
+    Return ranked taxon name suggestions for a prefix.
+
+    :arg prefix: Start of a taxon name (case insensitive)
+    :type prefix: str
+    :arg limit: Maximum number of suggestions
+    :type limit: int
+    """
+    from ..elc import config
+
+    start()
+    index = _index
+
+    if index is None:
+        msg = 'Taxon name index is loading, retry shortly'
+        raise ValueError(503, msg)
+
+    return index.suggest(prefix, limit, config.get('suggest', 'scan'))
+
+
+def remember(db, key, ids, accepted):
+    """Cache an upstream name answer, dropping the least recently used."""
+    from time import time
+    from ..elc import config
+
+    with _lock:
+        _resolved[(db, key)] = (ids, accepted, time())
+        _resolved.move_to_end((db, key))
+
+        while len(_resolved) > config.get('resolve', 'cache'):
+            _resolved.popitem(last=False)
+
+
+def recall(db, key):
+    """Return a cached upstream name answer that is still fresh, or None."""
+    from ..elc import taxonomy
+
+    known = _resolved.get((db, key))
+
+    if known is None or taxonomy.expired(known[2]):
+        return None
+
+    return known[:2]
+
+
+def fetch_names(db, taxa):
+    """
+    Return the ELC taxon ids and accepted names of a batch of names.
+
+    Answers are by normalised name; names the database does not know get
+    no ids. The PBDB records are returned too, to be merged into the local
+    taxonomy index.
+
+    :arg db: Database name (pbdb or neotoma)
+    :type db: str
+    :arg taxa: Taxonomic names as sent to the databases (see
+               taxa.canonical)
+    :type taxa: list (of str)
+    """
+    from ..elc import taxonomy
+
+    found = {taxonomy.normalize(taxon): ([], None) for taxon in taxa}
+    records = list()
+
+    if db == 'pbdb':
+        records = taxonomy.fetch(','.join(taxa), 'exact')
+        for rec in records:
+            key = taxonomy.normalize(rec.get('nam') or '')
+            if key in found:
+                found[key][0].append('pbdb:{0}'.format(rec.get('oid')))
+                found[key] = (found[key][0],
+                              rec.get('acn') if rec.get('tdf') else None)
+
+    elif db == 'neotoma':
+        for rec in fetch_neotoma(taxa):
+            key = taxonomy.normalize(rec.get('taxonname') or '')
+            if key in found:
+                found[key][0].append('neot:txn:{0}'.format(rec.get('taxonid')))
+
+    for key, (ids, accepted) in found.items():
+        remember(db, key, ids, accepted)
+
+    return found, records
+
+
+def resolve(taxon_names):
+    """
+    Resolve taxon names to the ELC taxon ids of each database.
+
+    Names are normalised as for taxon queries (see taxa.canonical) and
+    answered from the name index and the cache of earlier answers first.
+    Only the names a database is not known to have or lack are sent to
+    it, in batches of resolve: batch names (concurrently).
+
+    Returns the matched accepted names, the matched synonyms (with their
+    accepted names), the unresolved input names and the errors of the
+    databases that could not be reached.
+
+    :arg taxon_names: Taxonomic names
+    :type taxon_names: list (of str)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import config, pool, taxa, taxonomy, timing
+
+    canonical = dict()
+    for name in taxon_names:
+        try:
+            canonical[name] = taxa.canonical(name)
+        except (AttributeError, ValueError):
+            canonical[name] = None
+
+    keys = {taxonomy.normalize(taxon): taxon
+            for taxon in canonical.values() if taxon}
+    start()
+    index = _index
+    # The index holds the whole Neotoma taxa list unless it was cut short
+    neotoma_listed = (index is not None and
+                      0 < _listed['neotoma'] < config.get(
+                          'suggest', 'neotoma_limit'))
+    known = {key: (list(), None) for key in keys}
+    missing = {db: list() for db in ID_PREFIX}
+
+    with timing.span('local'):
+        for key in keys:
+            i = index.find(key) if index else None
+            if i is not None:
+                known[key] = (list(index.ids[i]),
+                              index.accepted[i]
+                              if index.accepted[i] != index.names[i]
+                              else None)
+
+            for db, prefix in ID_PREFIX.items():
+                ids = known[key][0]
+                if any(oid.startswith(prefix) for oid in ids):
+                    continue
+                if db == 'neotoma' and neotoma_listed:
+                    continue
+                cached = recall(db, key)
+                if cached is None:
+                    missing[db].append(keys[key])
+                else:
+                    known[key] = (ids + cached[0], known[key][1] or cached[1])
+
+    size = config.get('resolve', 'batch')
+    jobs = [(db, names[n:n + size])
+            for db, names in missing.items()
+            for n in range(0, len(names), size)]
+    errors = dict()
+
+    if jobs:
+        recorder = timing.current()
+
+        def one(job):
+            timing.resume(recorder)
+            try:
+                return job[0], fetch_names(*job)
+            except ValueError as err:
+                return job[0], err
+
+        workers = min(len(jobs), pool.setting('paging_workers', 'default'))
+        with timing.span('fetch'):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                answers = list(executor.map(one, jobs))
+
+        merged = list()
+        for db, answer in answers:
+            if isinstance(answer, ValueError):
+                errors[db] = answer.args[-1]
+                continue
+            found, records = answer
+            merged += records
+            for key, (ids, accepted) in found.items():
+                known[key] = (known[key][0] + ids, known[key][1] or accepted)
+
+        # The taxonomy index is rebuilt once for all batches
+        if merged:
+            taxonomy.merge(merged)
+
+    matches, synonyms, unresolved = list(), list(), list()
+
+    for name, taxon in canonical.items():
+        key = taxonomy.normalize(taxon) if taxon else None
+        ids, accepted = known.get(key) or (list(), None)
+        if not ids:
+            unresolved.append(name)
+            continue
+        match = {'name': name,
+                 'taxon': taxon,
+                 'taxon_ids': list(dict.fromkeys(ids))}
+        if accepted and taxonomy.normalize(accepted) != key:
+            match.update(accepted=accepted)
+            synonyms.append(match)
+        else:
+            matches.append(match)
+
+    return {'matches': matches,
+            'synonyms': synonyms,
+            'unresolved': unresolved}, errors
+
+
+if __name__ == '__main__':
+    import sys
+
+    print(dump(sys.argv[1]))
@@ -3,20 +3,21 @@
 
 def set_options(req_args, endpoint):
     """Return a dictionary with runtime options and config."""
-    from ..elc import config
+    from ..elc import config, columnar
     from ast import literal_eval
 
     # NEW RESOURCE: Optional. Add aditional formats and controls below
     # The default parameter is always taken to be param[0]
     spec = dict()
     spec.update(misc=['json'])
-    spec.update(occ=['json', 'csv'])
-    spec.update(loc=['json', 'csv'])
-    spec.update(tax=['json', 'itis', 'csv'])
-    spec.update(ref=['bibjson', 'json', 'csv', 'ris'])
-    spec.update(show=['all', 'poll', 'idx'])
+    spec.update(occ=['json', 'csv', 'ndjson', 'arrow', 'parquet'])
+    spec.update(loc=['json', 'csv', 'ndjson', 'arrow', 'parquet'])
+    spec.update(tax=['json', 'itis', 'csv', 'ndjson'])
+    spec.update(ref=['bibjson', 'json', 'csv', 'ris', 'ndjson'])
+    spec.update(show=['all', 'poll', 'idx', 'timing'])
     spec.update(age=['ma', 'ka', 'ybp'])
     spec.update(geog=['paleo', 'modern'])
+    spec.update(timerule=['contain', 'major', 'overlap'])
 
     # Runtime options
     options = dict()
@@ -31,6 +32,11 @@ def set_options(req_args, endpoint):
     else:
         options.update(output=spec.get(endpoint)[0])
 
+    if options.get('output') in columnar.FORMATS and not columnar.available():
+        msg = 'Format unavailable on this server: {0:s}'.format(
+            options.get('output'))
+        raise ValueError(501, msg)
+
     # Response includes
     if 'show' in req_args.keys():
         if req_args.get('show').lower() in spec.get('show'):
@@ -55,10 +61,21 @@ def set_options(req_args, endpoint):
             msg = 'Config: ageunits not in {0:s}'.format(str(spec.get('age')))
             raise ValueError(500, msg)
 
+    # Age range rule (applied only when requested)
+    if 'timerule' in req_args.keys():
+        if req_args.get('timerule').lower() in spec.get('timerule'):
+            options.update(timerule=req_args.get('timerule').lower())
+        else:
+            msg = 'Allowable time rules: {0:s}'.format(
+                str(spec.get('timerule')))
+            raise ValueError(400, msg)
+    else:
+        options.update(timerule=None)
+
     # Geographic coodinates type
     if 'coordtype' in req_args.keys():
-        if req_args.get('coordinates').lower() in spec.get('geog'):
-            options.update(geog=req_args.get('coordinates').lower())
+        if req_args.get('coordtype').lower() in spec.get('geog'):
+            options.update(geog=req_args.get('coordtype').lower())
         else:
             msg = 'Allowable coordinates: {0:s}'.format(str(spec.get('geog')))
             raise ValueError(400, msg)
@@ -77,11 +94,40 @@ def set_options(req_args, endpoint):
                               str(config.get('default', 'includelower')))
         options.update(includelower=literal_eval(choice.capitalize()))
 
+    # Parent chain enrichment of taxonomy records (not for CSV returns)
+    choice = req_args.get('hierarchy', 'False')
+    options.update(hierarchy=(endpoint == 'tax' and
+                              options.get('output') != 'csv' and
+                              literal_eval(choice.capitalize())))
+
     # Limit records in the query
     choice = req_args.get('limit',
                           int(config.get('default', 'limit')))
     options.update(limit=abs(int(choice)))
 
+    # Stream large full JSON and CSV returns, all full NDJSON returns and
+    # all columnar returns from the upstream responses
+    large = options.get('limit') >= config.get('stream', 'min_limit')
+    full = options.get('show') == 'all'
+    stream = (endpoint in ['occ', 'loc'] and
+              ((large and options.get('output') == 'csv') or
+               (large and full and options.get('output') == 'json') or
+               (full and options.get('output') == 'ndjson') or
+               options.get('output') in columnar.FORMATS))
+    options.update(stream=stream)
+
+    # Statistics only returns count the records instead of decoding them
+    # (show is ignored for CSV returns)
+    count_only = (options.get('show') == 'poll' and
+                  options.get('output') != 'csv')
+    options.update(count_only=count_only)
+
+    # Identifier only returns extract just the primary id of each record
+    ids_only = (options.get('show') == 'idx' and
+                options.get('output') in ['json', 'ndjson'] and
+                endpoint in ['occ', 'loc', 'tax'])
+    options.update(ids_only=ids_only)
+
     # Mutable parameters
     options.update(tot_rec_count=0)
 
@@ -175,10 +221,10 @@ def parse(req_args, options, db, endpoint):
 
     spec = dict()
     spec.update(occ=['bbox', 'agerange', 'ageunits', 'timerule', 'taxon',
-                     'includelower', 'coordinates', 'limit', 'offset',
+                     'includelower', 'coordtype', 'limit', 'offset',
                      'show', 'output', 'run'])
     spec.update(loc=['idlist', 'bbox', 'agerange', 'ageunits', 'timerule',
-                     'coordinates', 'limit', 'offset', 'show', 'output',
+                     'coordtype', 'limit', 'offset', 'show', 'output',
                      'run'])
     spec.update(tax=['taxon', 'idlist', 'includelower', 'hierarchy',
                      'show', 'output', 'run'])
@@ -186,6 +232,7 @@ def parse(req_args, options, db, endpoint):
     spec.update(timebound=['agerange', 'ageunits'])
     spec.update(paleocoords=['coords', 'age', 'ageunits'])
     spec.update(subtaxa=['taxon', 'synonyms'])
+    spec.update(suggest=['q', 'limit'])
 
     # Bad or missing parameter checks
 
@@ -211,11 +258,13 @@ def parse(req_args, options, db, endpoint):
         try:
             payload = taxa.set_taxon(taxon=req_args.get('taxon'),
                                      subtax=options.get('includelower'),
-                                     db=db)
+                                     db=db,
+                                     options=options)
         except ValueError as err:
             raise ValueError(err.args[0], err.args[1])
 
-    payload.update(aux.set_db_special(db, endpoint))
+    payload.update(aux.set_db_special(db, endpoint,
+                                      ids_only=options.get('ids_only')))
 
     payload.update(limit=options.get('limit'))
 
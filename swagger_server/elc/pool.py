@@ -0,0 +1,86 @@
+"""Shared keep-alive HTTP sessions for the upstream resource APIs."""
+
+import threading
+
+# One requests.Session per upstream, reused by all threads in the process
+_sessions = dict()
+_lock = threading.Lock()
+
+
+def setting(group, upstream):
+    """Return an upstream specific http setting or the group default."""
+    from ..elc import config
+
+    try:
+        return config.get(group, upstream)
+    except KeyError:
+        return config.get(group, 'default')
+
+
+def build_session(upstream):
+    """Return a pooled session with the retry policy for an upstream."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=setting('http_retries', upstream),
+                  connect=setting('http_retries', upstream),
+                  read=setting('http_retries', upstream),
+                  status=setting('http_retries', upstream),
+                  backoff_factor=setting('http_backoff', upstream),
+                  status_forcelist=[502, 503, 504],
+                  raise_on_status=False)
+
+    adapter = HTTPAdapter(pool_connections=setting('http_pool', 'hosts'),
+                          pool_maxsize=setting('http_pool', 'maxsize'),
+                          pool_block=False,
+                          max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def get_session(upstream):
+    """Return the shared session for the named upstream."""
+    session = _sessions.get(upstream)
+
+    if session is None:
+        with _lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                session = build_session(upstream)
+                _sessions[upstream] = session
+
+    return session
+
+
+def get(url, params, upstream, stream=False):
+    """
+    Issue a GET request through the pooled session for an upstream.
+
+    :arg url: Full request URL
+    :type url: str
+    :arg params: Query string parameters
+    :type params: dict
+    :arg upstream: Upstream name as listed in the config http groups
+    :type upstream: str
+    :arg stream: Defer reading the body (caller must close the response)
+    :type stream: bool
+    """
+    session = get_session(upstream)
+
+    return session.get(url,
+                       params=params,
+                       timeout=setting('http_timeout', upstream),
+                       stream=stream)
+
+
+def close():
+    """Close all pooled connections (e.g. before a worker exits)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
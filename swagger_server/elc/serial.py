@@ -0,0 +1,154 @@
+"""
+Compact JSON serialisation of endpoint responses.
+
+Uses orjson when it is installed and the standard library json module
+otherwise. Output is compact UTF-8 bytes from either backend.
+"""
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+
+def default(obj):
+    """Return a serialisable form of objects the backends do not know."""
+    from datetime import date
+    from decimal import Decimal
+
+    # Swagger models (see swagger_server.models.base_model_)
+    if hasattr(obj, 'swagger_types') and hasattr(obj, 'to_dict'):
+        return model_dict(obj)
+
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+
+    if isinstance(obj, Decimal):
+        return float(obj)
+
+    if isinstance(obj, date):
+        return obj.isoformat()
+
+    if hasattr(obj, 'keys') and hasattr(obj, '__getitem__'):
+        return dict(obj)
+
+    raise TypeError('Object of type {0:s} is not JSON serializable'
+                    .format(type(obj).__name__))
+
+
+def model_dict(model, include_nulls=False):
+    """Return the JSON keyed properties of a swagger model."""
+    dikt = dict()
+
+    for attr in model.swagger_types.keys():
+        value = getattr(model, attr)
+        if value is None and not include_nulls:
+            continue
+        dikt[model.attribute_map[attr]] = value
+
+    return dikt
+
+
+def dumps(obj):
+    """
+    Serialise an object to compact JSON bytes.
+
+    :arg obj: Response object
+    :type obj: dict, list or scalar
+    """
+    import json
+
+    if orjson:
+        return orjson.dumps(obj, default=default,
+                            option=orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(obj, default=default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def dump_items(records):
+    """Return records serialised as the comma separated body of an array."""
+    return dumps(records)[1:-1]
+
+
+def chunks(obj, batch):
+    """
+    Generate the serialised parts of an object with large record lists.
+
+    Lists longer than batch are written batch by batch, so the complete
+    response body is never held in memory at once.
+
+    :arg obj: Response object
+    :type obj: dict or list
+    :arg batch: Records per serialised part
+    :type batch: int
+    """
+    if isinstance(obj, list):
+        yield from list_chunks(obj, batch)
+        return
+
+    sep = b'{'
+
+    for key, value in obj.items():
+        yield sep + dumps(str(key)) + b':'
+        sep = b','
+
+        if not is_large(value, batch):
+            yield dumps(value)
+            continue
+
+        yield from list_chunks(value, batch)
+
+    yield b'}' if sep == b',' else b'{}'
+
+
+def list_chunks(value, batch):
+    """Generate the serialised parts of a list, batch by batch."""
+    yield b'['
+    for n in range(0, len(value), batch):
+        part = dump_items(value[n:n + batch])
+        yield part if n == 0 else b',' + part
+    yield b']'
+
+
+def is_large(value, batch):
+    """Return True for lists that are written in parts."""
+    return isinstance(value, list) and len(value) > batch
+
+
+def jsonify(*args, **kwargs):
+    """
+    Return a JSON response (called as flask.jsonify).
+
+    Responses holding record lists longer than the configured batch are
+    sent in chunks.
+    """
+    from flask import Response
+    from time import perf_counter
+    from ..elc import config, timing
+
+    if args and kwargs:
+        raise TypeError('jsonify takes either args or kwargs, not both')
+
+    if len(args) == 1:
+        obj = args[0]
+    elif args:
+        obj = list(args)
+    else:
+        obj = kwargs
+
+    batch = config.get('stream', 'chunk_records')
+
+    if is_large(obj, batch) or (isinstance(obj, dict) and
+                                any(is_large(v, batch)
+                                    for v in obj.values())):
+        return Response(chunks(obj, batch), mimetype='application/json')
+
+    t0 = perf_counter()
+    body = dumps(obj)
+    timing.observe(timing.endpoint_name(), 'all', 'serialize',
+                   perf_counter() - t0)
+
+    return Response(body, mimetype='application/json')
@@ -1,18 +1,66 @@
 """Use the Requests HTTP library with pervasive error handling."""
 
 
-def trigger(url_path, payload, db):
-    """Primary safe requester method for external database resources."""
+def trigger(url_path, payload, db, fresh=False):
+    """
+    Primary safe requester method for external database resources.
+
+    Decoded responses are served from and stored in the shared response
+    cache unless fresh is set.
+
+    :arg fresh: Bypass cached responses (the new response is still stored)
+    :type fresh: bool
+    """
+    from ..elc import cache, coalesce
+
+    key = cache.make_key(url_path, payload)
+
+    if fresh:
+        cache.count(db, 'bypass')
+    else:
+        cached = cache.get(key, db)
+        if cached:
+            return cached['json'], cached['url']
+
+    # Identical concurrent requests share a single upstream call
+
+    return coalesce.run(('trigger', key), fetch, url_path, payload, db, key)
+
+
+def fetch(url_path, payload, db, key):
+    """Request, check and decode an upstream response and cache it."""
+    from ..elc import cache, timing
+
+    with timing.span('http'):
+        resp = connect(url_path, payload, db)
+
+    # Check that serialized JSON object is decodable
+
+    try:
+        with timing.span('json_decode'):
+            resp_json = resp.json()
+
+    except ValueError as err:
+        msg = '{0:s} JSON decode error: {1:s}'.format(db, str(err))
+        raise ValueError(500, msg)
+
+    cache.put(key, db, {'json': resp_json, 'url': resp.url},
+              size=len(resp.content))
+
+    return resp_json, resp.url
+
+
+def connect(url_path, payload, db, stream=False):
+    """Issue an upstream request and check its status and content type."""
     import requests
-    from ..elc import config
+    from ..elc import pool
 
     try:
-        resp = requests.get(url_path,
-                            params=payload,
-                            timeout=config.get('default', 'timeout'))
+        resp = pool.get(url_path, payload, db, stream=stream)
         resp.raise_for_status()
 
     except requests.exceptions.HTTPError as err:
+        resp.close()
         raise ValueError(resp.status_code, str(err.args[0]))
 
     except requests.exceptions.SSLError as err:
@@ -27,19 +75,476 @@ def trigger(url_path, payload, db):
     except requests.exceptions.RequestException as err:
         raise ValueError(500, str(err.args[0]))
 
-    # Check the Content-Type of the return and decode the JSON object
+    # Check the Content-Type of the return
 
-    if 'application/json' not in resp.headers.get('content-type'):
+    if 'application/json' not in resp.headers.get('content-type', ''):
+        resp.close()
         msg = '{0:s} response is not of type application/json'.format(db)
         raise ValueError(417, msg)
 
-    # Check that serialized JSON object is decodable
+    return resp
+
+
+def stream(url_path, payload, db, key, batch_key=None, fresh=False):
+    """
+    Open an upstream response and return a lazy iterator of its records.
+
+    The body is read and decoded incrementally, one record of the named
+    top level array at a time, and the response is not cached. Returns
+    the record iterator, the request URL and a function that closes the
+    upstream connection (safe to call more than once).
+
+    Subqueries larger than a page are streamed page by page instead (see
+    stream_pages), so a failed page is retried on its own.
+
+    :arg key: Name of the record array in the upstream response
+    :type key: str
+    :arg batch_key: Payload name list to split into batches (see batched)
+    :type batch_key: str
+    :arg fresh: Bypass cached pages
+    :type fresh: bool
+    """
+    from ..elc import config
+
+    loads = batch_loads(payload, batch_key)
+
+    if len(loads) > 1:
+        return stream_batches(url_path, loads, payload, db, key, fresh)
+
+    loads, counted = page_loads(url_path, payload, db, fresh=fresh)
+
+    if len(loads) > 1:
+        return stream_pages(url_path, loads, db, key, fresh)
+
+    resp = connect(url_path, payload, db, stream=True)
+
+    def records():
+        try:
+            chunks = body_chunks(resp, db, config.get('stream', 'chunk_bytes'))
+            for rec in iter_records(chunks, key, db):
+                yield rec
+        finally:
+            resp.close()
+
+    return records(), resp.url, resp.close
+
+
+def body_chunks(resp, db, size):
+    """
+    Generate the raw body chunks of a streamed upstream response.
+
+    A connection lost or timed out while the body is read is raised as a
+    ValueError, as connect does for the request itself.
+    """
+    import requests
 
     try:
-        resp_json = resp.json()
+        yield from resp.iter_content(size)
 
-    except ValueError as err:
-        msg = '{0:s} JSON decode error: {1:s}'.format(db, err)
+    except requests.exceptions.Timeout as err:
+        msg = '{0:s} response timed out: {1:s}'.format(db, str(err))
+        raise ValueError(504, msg)
+
+    except (requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ConnectionError) as err:
+        msg = '{0:s} response interrupted: {1:s}'.format(db, str(err))
+        raise ValueError(502, msg)
+
+    except requests.exceptions.RequestException as err:
+        msg = '{0:s} response read failed: {1:s}'.format(db, str(err))
         raise ValueError(500, msg)
 
-    return resp_json, resp.url
+
+def stream_batches(url_path, loads, payload, db, key, fresh=False):
+    """
+    Stream the batches of a split subquery one after another.
+
+    The first batch is opened at once, so its errors are raised before
+    any response is sent; the others are opened as the previous one ends.
+    The offset and limit of the whole subquery are applied to the joined
+    records.
+    """
+    from itertools import islice
+
+    first = stream(url_path, loads[0], db, key, fresh=fresh)
+    current = {'close': first[2]}
+    start = int(payload.get('offset') or 0)
+    limit = payload.get('limit')
+
+    def joined():
+        yield from first[0]
+        for load in loads[1:]:
+            records, api_call, close = stream(url_path, load, db, key,
+                                              fresh=fresh)
+            current.update(close=close)
+            yield from records
+
+    def close():
+        current['close']()
+
+    end = start + int(limit) if limit else None
+
+    return islice(joined(), start, end), first[1], close
+
+
+def iter_records(chunks, key, db):
+    """
+    Incrementally decode the elements of a top level JSON array.
+
+    Only one element plus the unread part of the current chunk is held in
+    memory. Other top level members are decoded and discarded.
+
+    :arg chunks: Iterable of raw response body bytes
+    :type chunks: iterable (of bytes)
+    :arg key: Name of the top level member holding the record array
+    :type key: str
+    :arg db: Database name for error messages
+    :type db: str
+    """
+    import codecs
+    import json
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    state = {'buf': '', 'pos': 0, 'eof': False}
+
+    def fail(reason):
+        msg = '{0:s} JSON decode error: {1:s}'.format(db, reason)
+        raise ValueError(500, msg)
+
+    def more():
+        # Append the next chunk, dropping already consumed text
+        if state['eof']:
+            return False
+        try:
+            text = utf8.decode(next(chunks))
+        except StopIteration:
+            text = utf8.decode(b'', final=True)
+            state['eof'] = True
+        state['buf'] = state['buf'][state['pos']:] + text
+        state['pos'] = 0
+        return True
+
+    def peek():
+        # Return the next non-whitespace character without consuming it
+        while True:
+            buf, pos = state['buf'], state['pos']
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            state['pos'] = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ''
+
+    def expect(chars):
+        char = peek()
+        if char not in chars or not char:
+            fail('expected {0:s} at offset {1:d}'.format(chars,
+                                                          state['pos']))
+        state['pos'] += 1
+        return char
+
+    def value():
+        # Decode one complete JSON value, reading more text as needed
+        peek()
+        while True:
+            buf, pos = state['buf'], state['pos']
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                # A number may continue in text not yet read
+                if state['eof'] or (end < len(buf) and
+                                    buf[end] not in '0123456789.eE+-'):
+                    state['pos'] = end
+                    return obj
+            except ValueError:
+                if state['eof']:
+                    fail('invalid or truncated value')
+            more()
+
+    expect('{')
+    if peek() == '}':
+        return
+
+    while True:
+        name = value()
+        expect(':')
+
+        if name == key and peek() == '[':
+            expect('[')
+            if peek() == ']':
+                return
+            while True:
+                yield value()
+                if expect(',]') == ']':
+                    return
+
+        value()
+        if expect(',}') == '}':
+            return
+
+
+def page_loads(url_path, payload, db, fresh=False):
+    """
+    Return the limit/offset page payloads of a subquery.
+
+    A record count pre-flight (where the database supports one) sizes the
+    pages. Also returns whether the count is known; if not, the pages
+    cover the whole limit and those after the first short page are not
+    needed. A subquery that fits in one page is returned alone.
+
+    :arg fresh: Bypass cached responses
+    :type fresh: bool
+    """
+    from ..elc import config, pool
+    from ..handlers import router
+
+    limit = int(payload.get('limit') or 0)
+    start = int(payload.get('offset') or 0)
+    workers = pool.setting('paging_workers', db)
+
+    if not router.records_key(db) or \
+            limit <= config.get('paging', 'max_page'):
+        return [payload], True
+
+    found, api_call = count(url_path, payload, db, fresh=fresh)
+    total = limit if found is None else min(limit, max(found - start, 0))
+
+    page_size = min(config.get('paging', 'max_page'),
+                    max(config.get('paging', 'min_page'),
+                        -(-total // workers)))
+
+    if total <= page_size:
+        return [payload], True
+
+    loads = list()
+
+    for offset in range(0, total, page_size):
+        load = dict(payload)
+        load.update(offset=start + offset,
+                    limit=min(page_size, total - offset))
+        loads.append(load)
+
+    return loads, found is not None
+
+
+def paginate(url_path, payload, db, fresh=False):
+    """
+    Fetch a large subquery as concurrent limit/offset pages.
+
+    Pages are sized by page_loads; without a record count they are
+    requested in waves until a short page is returned. Each page goes
+    through trigger (so it is cached and coalesced) and a failed page is
+    retried on its own. Page records are merged in offset order into a
+    single decoded response.
+
+    :arg fresh: Bypass cached responses
+    :type fresh: bool
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import pool, timing
+    from ..handlers import router
+
+    key = router.records_key(db)
+    workers = pool.setting('paging_workers', db)
+    loads, counted = page_loads(url_path, payload, db, fresh=fresh)
+
+    if len(loads) == 1:
+        return trigger(url_path, loads[0], db, fresh=fresh)
+
+    recorder = timing.current()
+
+    def page(load):
+        timing.resume(recorder)
+        return fetch_page(url_path, load, db, fresh)
+
+    results = list()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if counted:
+            results = list(executor.map(page, loads))
+        else:
+            # Unknown size: fetch a wave at a time until a page is short
+            while len(results) < len(loads):
+                wave = loads[len(results):len(results) + workers]
+                results += executor.map(page, wave)
+                if len(results[-1][0].get(key) or []) < \
+                        int(wave[-1]['limit']):
+                    break
+
+    resp_json = dict(results[0][0])
+    resp_json[key] = [rec for page_json, api_call in results
+                      for rec in page_json.get(key) or []]
+
+    return resp_json, results[0][1]
+
+
+def stream_pages(url_path, loads, db, key, fresh=False):
+    """
+    Stream the pages of a large subquery in offset order.
+
+    Pages are fetched as for paginate (cached, coalesced and retried), up
+    to paging_workers pages ahead of the records sent on, so only a few
+    pages are held at a time. The first page is awaited at once, so its
+    errors are raised before any response is sent. Pages after a short
+    one are not fetched.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import pool, timing
+
+    recorder = timing.current()
+    workers = pool.setting('paging_workers', db)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    todo = iter(loads)
+    pending = deque()
+
+    def page(load):
+        timing.resume(recorder)
+        return fetch_page(url_path, load, db, fresh)
+
+    def submit():
+        for load in todo:
+            pending.append((load, executor.submit(page, load)))
+            return
+
+    def close():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for n in range(workers):
+        submit()
+
+    try:
+        api_call = pending[0][1].result()[1]
+    except ValueError:
+        close()
+        raise
+
+    def records():
+        try:
+            while pending:
+                load, future = pending.popleft()
+                resp_json, page_call = future.result()
+                submit()
+                page_records = resp_json.get(key) or []
+                yield from page_records
+                if len(page_records) < int(load['limit']):
+                    return
+        finally:
+            close()
+
+    return records(), api_call, close
+
+
+def batch_loads(payload, key):
+    """
+    Return the payloads of a subquery split by batches of a name list.
+
+    Each batch asks for offset plus limit records from the start, so the
+    offset and limit can be applied to the joined records. A payload
+    whose list fits in one batch is returned alone and unchanged.
+
+    :arg key: Payload parameter holding a comma separated name list
+    :type key: str
+    """
+    from ..elc import config
+
+    names = str(payload.get(key) or '').split(',') if key else []
+    names = list(dict.fromkeys(names))
+    size = config.get('taxonomy', 'batch')
+
+    if len(names) <= size:
+        return [payload]
+
+    start = int(payload.get('offset') or 0)
+    loads = list()
+
+    for n in range(0, len(names), size):
+        load = dict(payload)
+        load.pop('offset', None)
+        load[key] = ','.join(names[n:n + size])
+        if payload.get('limit'):
+            load.update(limit=start + int(payload.get('limit')))
+        loads.append(load)
+
+    return loads
+
+
+def batched(url_path, payload, db, key, fresh=False, paged=False):
+    """
+    Fetch a subquery with a long name list as concurrent batches.
+
+    Each batch goes through paginate (if paged) or trigger, so it is
+    cached and coalesced on its own. Batch records are joined in batch
+    order and the offset and limit of the whole subquery applied.
+
+    :arg key: Payload parameter holding a comma separated name list
+    :type key: str
+    :arg paged: Page large batches (occ and loc pulls)
+    :type paged: bool
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import pool, timing
+    from ..handlers import router
+
+    loads = batch_loads(payload, key)
+    fetch_one = paginate if paged else trigger
+
+    if len(loads) == 1:
+        return fetch_one(url_path, payload, db, fresh=fresh)
+
+    recorder = timing.current()
+
+    def one(load):
+        timing.resume(recorder)
+        return fetch_one(url_path, load, db, fresh=fresh)
+
+    with ThreadPoolExecutor(max_workers=pool.setting('paging_workers',
+                                                     db)) as executor:
+        results = list(executor.map(one, loads))
+
+    rec_key = router.records_key(db)
+    start = int(payload.get('offset') or 0)
+    limit = payload.get('limit')
+    end = start + int(limit) if limit else None
+
+    resp_json = dict(results[0][0])
+    resp_json[rec_key] = [rec for batch_json, api_call in results
+                          for rec in batch_json.get(rec_key) or []][start:end]
+
+    return resp_json, results[0][1]
+
+
+def fetch_page(url_path, payload, db, fresh):
+    """Fetch one page of a paginated subquery, retrying server errors."""
+    from ..elc import config
+
+    retries = config.get('paging', 'retries')
+
+    for attempt in range(retries + 1):
+        try:
+            return trigger(url_path, payload, db, fresh=fresh)
+        except ValueError as err:
+            if attempt == retries or err.args[0] < 500:
+                raise ValueError(err.args[0], err.args[1])
+
+
+def count(url_path, payload, db, fresh=False):
+    """
+    Return the number of records matched by a subquery and the count URL.
+
+    The count ignores limit and offset. Returns None for both where the
+    database has no count query.
+    """
+    if db == 'pbdb':
+        preflight = dict(payload)
+        preflight.pop('offset', None)
+        preflight.update(limit=0, rowcount='true')
+        resp_json, api_call = trigger(url_path, preflight, db, fresh=fresh)
+        return int(resp_json.get('records_found', 0)), api_call
+
+    # NEW RESOURCE: Add a database specific record count query here
+
+    else:
+        return None, None
@@ -1,7 +1,7 @@
 """Functions related to taxa formatting and hierarchy."""
 
 
-def set_taxon(taxon, subtax, db):
+def set_taxon(taxon, subtax, db, options=None):
     """
     Return a database specific key-val pair for taxon paramaterization.
 
@@ -11,20 +11,26 @@ def set_taxon(taxon, subtax, db):
     :type taxon: str
     :arg subtax: include lower taxonomy switch
     :type subtax: bool
+    :arg options: Subquery options, given a notice if the lower taxa are
+                  left to the database
+    :type options: dict
 
     """
-    taxon = taxon.capitalize()
+    from ..elc import config
 
-    if len(taxon.split()) == 2:
-        genus_species = True
-    elif len(taxon.split()) == 1:
-        genus_species = False
-    else:
-        msg = 'Taxon argument contains too many parameters'
-        raise ValueError(400, msg)
+    taxon = canonical(taxon)
+    genus_species = len(taxon.split()) == 2
 
     if db == 'neotoma':
-        if subtax:
+        if subtax and not genus_species:
+            # Send the lower taxa PBDB would include, as for base_name
+            names = expand(taxon)
+            if names:
+                return {'taxonname': ','.join(names)}
+            if names is None and options is not None:
+                msg = 'Over {0:d} lower taxa, Neotoma lower=true used'
+                options.update(notice=msg.format(
+                    config.get('taxonomy', 'max_expand')))
             return {'taxonname': taxon,
                     'lower': 'true'}
         else:
@@ -42,81 +48,108 @@ def set_taxon(taxon, subtax, db):
         return {}
 
 
-def get_subtaxa(taxon, inc_syn=True):
+def canonical(taxon):
     """
-    Query PBDB for all lower order relatives of a specified taxa.
+    Return a taxon name as sent to the databases (genus capitalised).
 
-    :arg taxon: Taxonmic name to query
+    :arg taxon: user input taxon name (genus or binomial)
     :type taxon: str
-    :arg inc_syn: Include recognized synonyms in the return
-    :type inc_syn: bool
 
     """
-    import requests
-    from ..elc import config
+    taxon = taxon.capitalize()
+
+    if len(taxon.split()) not in [1, 2]:
+        msg = 'Taxon argument contains too many parameters'
+        raise ValueError(400, msg)
+
+    return taxon
 
-    subtaxa = set()
-    url = ''.join([config.get('resource_api', 'pbdb'), 'taxa/list.json'])
-    payload = {'rel': 'all_children', 'name': taxon}
+
+def expand(taxon):
+    """
+    Return a taxon and its lower taxa and synonyms for name list queries.
+
+    Returns an empty list if the taxon is unknown to the taxonomy index
+    or it cannot be reached, and None if it has more than taxonomy:
+    max_expand names, so the caller can fall back to the database
+    expansion.
+    """
+    from ..elc import config, taxonomy
 
     try:
-        r = requests.get(url=url,
-                         params=payload,
-                         timeout=config.get('default', 'timeout'))
-        r.raise_for_status()
+        return taxonomy.subtaxa(taxon, inc_syn=True,
+                                limit=config.get('taxonomy', 'max_expand'))
+    except ValueError as err:
+        return None if err.args[0] == 413 else list()
 
-    except requests.exceptions.HTTPError as e:
-        msg = r.json().get('warnings')
-        raise ValueError(r.status_code, msg)
 
-    data = r.json()
+def name_list_key(db):
+    """Return the payload parameter of a db that takes taxon name lists."""
+    # NEW RESOURCE: Add a taxon name list parameter (see subreq.batched)
+    keys = {'neotoma': 'taxonname'}
 
-    for rec in data['records']:
-        if rec.get('tdf') and not inc_syn:
-            subtaxa.add(rec.get('acn'))
-        else:
-            subtaxa.add(rec.get('nam'))
+    return keys.get(db)
 
-    return list(subtaxa)
+
+def get_subtaxa(taxon, inc_syn=True):
+    """
+    Return all lower order relatives of a specified taxa (PBDB systematics).
+
+    Answered from the local taxonomy index, which fetches the clade from
+    PBDB on first use (see elc.taxonomy).
+
+    :arg taxon: Taxonmic name to query
+    :type taxon: str
+    :arg inc_syn: Include recognized synonyms in the return
+    :type inc_syn: bool
+
+    """
+    from ..elc import taxonomy
+
+    return taxonomy.subtaxa(taxon, inc_syn=inc_syn)
 
 
 def get_parents(taxon):
     """
-    Query PBDB for parent taxonomic groups.
+    Return the parent taxonomic groups of a taxon by rank (PBDB systematics).
 
     :arg taxon: Taxonomic name to query
     :type taxon: str
 
     """
-    import requests
+    from ..elc import taxonomy
+
+    return systematic(taxonomy.parents(taxon))
+
+
+def systematic(chain):
+    """Return the ranks of a parent chain in the PBDB systematics."""
     from collections import OrderedDict
-    from ..elc import config
 
-    parents = dict()
-    base_url = config.get('resource_api', 'pbdb') + 'taxa/list.json'
     tax_sys = ['kingdom', 'phylum', 'class', 'order',
                'family', 'genus', 'species']
 
-    payload = dict()
-    payload.update(vocab='pbdb', rel='all_parents',
-                   order='hierarchy', name=taxon)
+    return OrderedDict((rank, name) for rank, name in chain
+                       if rank in tax_sys)
+
 
-    resp = requests.get(base_url, params=payload, timeout=None)
+def set_hierarchy(records):
+    """
+    Add the parent taxonomic groups by rank to each taxonomy record.
 
-    if resp.status_code == 200:
-        resp_json = resp.json()
+    The distinct taxa of all records are resolved together, so a return
+    costs a few batched PBDB requests at most (see taxonomy.parents_many).
+    Records of taxa unknown to PBDB get an empty hierarchy.
 
-        if 'warnings' in resp_json:
-            raise ValueError(400, 'Bad Request',
-                             str(resp_json['warnings'][0]))
+    :arg records: Decoded ELC taxonomy records
+    :type records: list (of dicts)
+    """
+    from ..elc import taxonomy
 
-        else:
-            for rec in resp_json['records']:
-                for rank in tax_sys:
-                    if rec.get('taxon_rank') == rank:
-                        parents.update({rank: rec.get('taxon_name')})
-            return OrderedDict(parents)
+    names = [rec.get('taxon') for rec in records if rec.get('taxon')]
+    chains = taxonomy.parents_many(names)
 
-    else:
-        raise ValueError(resp.status_code, resp.reason,
-                         'Server error or bad URL')
+    for rec in records:
+        rec.update(hierarchy=systematic(chains.get(rec.get('taxon'), [])))
+
+    return records
@@ -0,0 +1,630 @@
+"""
+Local index of the PBDB taxonomic tree for subtaxa and parent lookups.
+
+The tree is kept in preorder arrays with nested-set intervals: the
+descendants of the taxon at position i are the positions after i up to
+last[i], so all lower taxa are a single slice and the parents a walk up
+the parent array.
+
+Clades are fetched from PBDB the first time they are asked for and
+merged into the index, which is refreshed clade by clade when older than
+the configured ttl. A JSON dump (see dump) may be loaded at startup.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Index in use and the node table it was built from (changed in place)
+_index = None
+_nodes = dict()
+# Normalised clade name -> (root taxon id, fetch time)
+_clades = dict()
+# Normalised clade name -> (limit its lower taxa exceed, fetch time)
+_capped = dict()
+# Normalised name -> (parent chain ids top down, fetch time), least
+# recently used first
+_chains = OrderedDict()
+# (normalised name, inc_syn) -> (index, lower taxa names)
+_expanded = dict()
+_lock = threading.Lock()
+
+
+class Index(object):
+    """
+    Immutable preorder arrays of a taxonomic forest.
+
+    Built from scratch, or from the index the nodes were last built into:
+    then only the subtrees holding added, changed or removed taxa are
+    walked again and the others are copied over as slices.
+
+    :arg nodes: Taxon id -> (name, parent id, accepted id, accepted name,
+                rank)
+    :type nodes: dict
+    :arg base: Previous index of the nodes
+    :type base: Index
+    :arg changed: Ids of the taxa added or changed since base
+    :type changed: list
+    :arg removed: Ids of the taxa of base no longer in the nodes
+    :type removed: list
+    """
+
+    def __init__(self, nodes, base=None, changed=(), removed=()):
+        from array import array
+        from itertools import chain, compress
+        from operator import ne
+
+        # Parent id of a taxon, None for roots
+        def up(oid):
+            par = nodes[oid][1]
+            return par if par and par != oid and par in nodes else None
+
+        # Parent id of a taxon in base, None for roots
+        def base_up(i):
+            return base.ids[base.parent[i]] if base.parent[i] >= 0 else None
+
+        # Siblings in name order so the arrays are stable between builds
+        def by_name(oid):
+            return (nodes[oid][0] or '', oid)
+
+        if base is None:
+            moved = list(nodes)
+        else:
+            moved = [oid for oid in changed if oid in nodes]
+            # Taxa of removed parents become roots
+            for oid in removed:
+                i = base.find(oid)
+                moved += [base.ids[j] for j in base.children(i)
+                          if base.ids[j] in nodes]
+            # Roots whose parent is now known move under it
+            new = {oid for oid in moved if base.find(oid) is None}
+            if new:
+                moved += [base.ids[j] for j in base.children(-1)
+                          if base.ids[j] in nodes and up(base.ids[j]) in new]
+            moved = list(dict.fromkeys(moved))
+
+        # Parent id -> ids moved under it; parents whose children change;
+        # base positions of the subtrees holding a change
+        arrivals = dict()
+        dirty = set()
+        touched = set()
+
+        for oid in moved:
+            arrivals.setdefault(up(oid), list()).append(oid)
+            dirty.add(up(oid))
+
+        if base is not None:
+            for oid in list(moved) + list(removed):
+                i = base.find(oid)
+                if i is not None:
+                    dirty.add(base_up(i))
+
+            for oid in dirty.union(moved):
+                i = base.find(oid) if oid is not None else None
+                while i is not None and i >= 0 and i not in touched:
+                    touched.add(i)
+                    i = base.parent[i]
+
+        moved = set(moved)
+
+        def kids(oid):
+            if base is None:
+                i = None
+            else:
+                i = -1 if oid is None else base.find(oid)
+            if i is None:
+                return sorted(arrivals.get(oid, []), key=by_name)
+            old = [base.ids[j] for j in base.children(i)]
+            if oid not in dirty:
+                return old
+            return sorted(set(arrivals.get(oid, [])).union(
+                x for x in old if x in nodes and up(x) == oid), key=by_name)
+
+        # Accepted ids (heads) and name keys are kept for the next build
+        ids, names, accepted, ranks, heads, keys = ([] for _ in range(6))
+        parent = array('i')
+        last = array('i')
+        stack = list()
+
+        # Subtrees holding a change are walked, the others copied
+        def push(oid, here):
+            for child in reversed(kids(oid)):
+                j = base.find(child) if base is not None else None
+                if j is None or child in moved or j in touched:
+                    stack.append(('node', child, here))
+                else:
+                    stack.append(('copy', j, here))
+
+        push(None, -1)
+        same = 0
+
+        while stack:
+            kind, item, above = stack.pop()
+            here = len(ids)
+
+            # Close the interval once the lower taxa are written
+            if kind == 'close':
+                last[item] = here - 1
+
+            elif kind == 'copy':
+                end = base.last[item] + 1
+                ids += base.ids[item:end]
+                names += base.names[item:end]
+                accepted += base.accepted[item:end]
+                ranks += base.ranks[item:end]
+                heads += base.heads[item:end]
+                keys += base.keys[item:end]
+                parent.append(above)
+                if here == item:
+                    parent.extend(base.parent[item + 1:end])
+                    last.extend(base.last[item:end])
+                    # Positions before the first change stay the same
+                    if same == here:
+                        same = end
+                else:
+                    shift = (here - item).__add__
+                    parent.extend(map(shift, base.parent[item + 1:end]))
+                    last.extend(map(shift, base.last[item:end]))
+
+            else:
+                name, _, acc, acn, rank = nodes[item]
+                ids.append(item)
+                names.append(name)
+                accepted.append(acn or name)
+                ranks.append(rank)
+                heads.append(acc)
+                keys.append(normalize(name or ''))
+                parent.append(above)
+                last.append(here)
+                stack.append(('close', here, None))
+                push(item, here)
+
+        n = len(ids)
+
+        self.ids = ids
+        self.parent = parent
+        self.last = last
+        self.names = names
+        self.accepted = accepted
+        self.ranks = ranks
+        self.heads = heads
+        self.keys = keys
+
+        if base is None:
+            self.position = dict(zip(ids, range(n)))
+        else:
+            self.position = dict(base.position)
+            for oid in removed:
+                self.position.pop(oid, None)
+            self.position.update(zip(ids[same:], range(same, n)))
+
+        # Junior synonyms point at the position of their accepted taxon
+        self.senior = array('i', map(self.position.get, heads, range(n)))
+
+        # Accepted taxa take precedence over synonyms of the same name:
+        # the first accepted position, otherwise the last synonym
+        junior = list(map(ne, self.senior, range(n)))
+        senior = [i for i in range(n - 1, -1, -1) if not junior[i]]
+        self.named = dict(chain(zip(compress(keys, junior),
+                                    compress(range(n), junior)),
+                                zip(map(keys.__getitem__, senior), senior)))
+
+    def find(self, oid):
+        """Return the position of a taxon id, or None."""
+        return self.position.get(oid)
+
+    def within(self, i, root):
+        """Return True if the taxon at i is the root or one of its taxa."""
+        return root <= i <= self.last[root]
+
+    def children(self, i):
+        """Return the positions of the children of i (-1 for the roots)."""
+        found = list()
+        j = i + 1
+        end = self.last[i] if i >= 0 else len(self.ids) - 1
+
+        while j <= end:
+            found.append(j)
+            j = self.last[j] + 1
+
+        return found
+
+    def lower(self, i, inc_syn=True):
+        """Return the names of the taxon at i and all its lower taxa."""
+        names = self.names if inc_syn else self.accepted
+
+        return names[i:self.last[i] + 1]
+
+    def upper(self, i):
+        """Return the positions of the parents of the taxon at i, top down."""
+        chain = list()
+        i = self.parent[i]
+
+        while i >= 0:
+            chain.append(i)
+            i = self.parent[i]
+
+        return chain[::-1]
+
+
+def normalize(name):
+    """Return the lookup key for a taxon name."""
+    return ' '.join(name.lower().split())
+
+
+def node(rec, ranks):
+    """Return the index node of a PBDB taxa/list record (compact vocab)."""
+    return (rec.get('nam'),
+            rec.get('par'),
+            rec.get('acc') or rec.get('oid'),
+            rec.get('acn') if rec.get('tdf') else None,
+            ranks.get(rec.get('rnk'), rec.get('rnk')))
+
+
+def merge(records, clade=None):
+    """
+    Add PBDB taxa records to the index.
+
+    Only the subtrees holding new or changed taxa are rebuilt (see Index);
+    records the index already holds leave it as it is.
+
+    :arg records: taxa/list.json records (compact vocabulary)
+    :type records: list (of dicts)
+    :arg clade: Name the records were fetched as all_children of
+    :type clade: str
+    """
+    from time import time
+    from ..handlers import mapping
+
+    global _index
+
+    ranks = mapping.read_table('pbdb_taxa_ranks')
+    fresh = {rec.get('oid'): node(rec, ranks)
+             for rec in records if rec.get('oid')}
+
+    with _lock:
+        removed = list()
+
+        if clade and records:
+            # Drop the old clade so removed taxa do not linger
+            old = _clades.get(normalize(clade))
+            i = _index.find(old[0]) if old and _index else None
+            if i is not None:
+                removed = [oid for oid in _index.ids[i:_index.last[i] + 1]
+                           if oid not in fresh]
+
+        changed = [oid for oid, known in fresh.items()
+                   if _nodes.get(oid) != known]
+
+        if changed or removed or _index is None:
+            for oid in removed:
+                _nodes.pop(oid, None)
+            _nodes.update((oid, fresh[oid]) for oid in changed)
+            _index = Index(_nodes, _index, changed, removed)
+            _expanded.clear()
+
+        if clade:
+            root = records[0].get('oid') if records else None
+            _clades[normalize(clade)] = (root, time())
+
+        return _index
+
+
+def remember(key, chain):
+    """Store a parent chain, dropping the least recently used ones."""
+    from time import time
+    from ..elc import config
+
+    with _lock:
+        _chains[key] = (chain, time())
+        _chains.move_to_end(key)
+
+        while len(_chains) > config.get('taxonomy', 'chains'):
+            _chains.popitem(last=False)
+
+
+def recall(key):
+    """Return a stored parent chain that is still fresh, or None."""
+    with _lock:
+        known = _chains.get(key)
+        if known is not None:
+            _chains.move_to_end(key)
+
+    if known is None or expired(known[1]):
+        return None
+
+    return known[0]
+
+
+def fetch(taxon, rel, limit=None):
+    """
+    Retrieve the all_children or all_parents records of a taxon from PBDB.
+
+    :arg rel: PBDB taxa relationship (all_children or all_parents)
+    :type rel: str
+    :arg limit: Maximum number of records (all if None)
+    :type limit: int
+    """
+    import requests
+    from ..elc import config, pool
+
+    url = ''.join([config.get('resource_api', 'pbdb'), 'taxa/list.json'])
+    payload = {'rel': rel, 'name': taxon, 'vocab': 'com'}
+    if rel == 'all_parents':
+        payload.update(order='hierarchy')
+    if limit:
+        payload.update(limit=limit)
+
+    try:
+        resp = pool.get(url, payload, 'pbdb')
+        resp.raise_for_status()
+
+    except requests.exceptions.HTTPError:
+        msg = resp.json().get('warnings') or resp.reason
+        raise ValueError(resp.status_code, str(msg))
+
+    except requests.exceptions.Timeout:
+        msg = 'PBDB taxonomy request timed out: {0:s}'.format(taxon)
+        raise ValueError(504, msg)
+
+    except requests.exceptions.RequestException as err:
+        msg = 'PBDB taxonomy request failed: {0:s}'.format(str(err))
+        raise ValueError(502, msg)
+
+    return resp.json().get('records', [])
+
+
+def expired(fetched):
+    """Return True if an entry fetched at this time needs a refresh."""
+    from time import time
+    from ..elc import config
+
+    return time() - fetched > config.get('taxonomy', 'ttl')
+
+
+def local_clade(index, key):
+    """Return the positions of a named taxon and of a fetched clade root."""
+    i = index.named.get(key) if index else None
+
+    if i is None:
+        return None, None
+
+    i = index.senior[i]
+
+    with _lock:
+        clades = list(_clades.values())
+
+    for root, fetched in clades:
+        r = index.find(root)
+        if r is not None and index.within(i, r) and not expired(fetched):
+            return i, r
+
+    return None, None
+
+
+def local_chain(index, key):
+    """
+    Return the parent chain ids of a taxon from the index, or None.
+
+    A taxon in a fetched clade whose root's own parents are known has all
+    its parents in the index.
+    """
+    i, r = local_clade(index, key)
+
+    if i is None:
+        return None
+
+    with _lock:
+        chains = list(_chains.values())
+
+    for chain, fetched in chains:
+        if chain and chain[-1] == index.ids[r] and not expired(fetched):
+            below = [index.ids[x] for x in index.upper(i) if x > r]
+            return chain + below + ([index.ids[i]] if i != r else [])
+
+    return None
+
+
+def too_many(taxon, limit):
+    """Return the error of a clade with more than limit lower taxa."""
+    msg = 'More than {0:d} lower taxa: {1:s}'.format(limit, taxon)
+    return ValueError(413, msg)
+
+
+def clade_root(taxon, limit=None):
+    """
+    Return the index and position of a clade, fetching it if needed.
+
+    With a limit, at most limit + 1 taxa are fetched and larger clades
+    raise ValueError 413 (remembered like a fetched clade).
+    """
+    from time import time
+    from ..elc import coalesce
+
+    key = normalize(taxon)
+    known = _clades.get(key)
+
+    # Lower taxa of a fetched clade are answered without a new request
+    if known is None:
+        index = _index
+        i, r = local_clade(index, key)
+        if i is not None:
+            return index, i
+
+    if known is None or expired(known[1]):
+        capped = _capped.get(key)
+        if limit and capped and capped[0] >= limit and \
+                not expired(capped[1]):
+            raise too_many(taxon, limit)
+
+        records = coalesce.run(('taxonomy', 'all_children', key, limit),
+                               fetch, taxon, 'all_children',
+                               limit + 1 if limit else None)
+
+        if limit and len(records) > limit:
+            with _lock:
+                _capped[key] = (limit, time())
+            raise too_many(taxon, limit)
+
+        merge(records, clade=taxon)
+        known = _clades.get(key)
+
+    index = _index
+    if not known[0] or index is None:
+        return index, None
+
+    return index, index.find(known[0])
+
+
+def subtaxa(taxon, inc_syn=True, limit=None):
+    """
+    Return the names of a taxon and all its lower taxa.
+
+    :arg taxon: Taxonomic name (synonyms resolve to the accepted taxon)
+    :type taxon: str
+    :arg inc_syn: Include junior synonyms (otherwise their accepted names)
+    :type inc_syn: bool
+    :arg limit: Raise ValueError 413 for more names than this
+    :type limit: int
+    """
+    index, i = clade_root(taxon, limit)
+
+    if i is None:
+        return list()
+
+    # Expansions stay valid until the index is rebuilt
+    key = (normalize(taxon), inc_syn)
+    with _lock:
+        known = _expanded.get(key)
+
+    if known is None or known[0] is not index:
+        names = list(dict.fromkeys(index.lower(i, inc_syn=inc_syn)))
+        known = (index, names)
+        with _lock:
+            # Not kept if the index was rebuilt meanwhile
+            if index is _index:
+                _expanded[key] = known
+
+    if limit and len(known[1]) > limit:
+        raise too_many(taxon, limit)
+
+    return list(known[1])
+
+
+def parents(taxon):
+    """
+    Return the (rank, name) pairs of the parents of a taxon, top down.
+
+    The taxon itself is included as the last pair.
+    """
+    return parents_many([taxon]).get(taxon)
+
+
+def parents_many(taxa):
+    """
+    Return the parents of several taxa as for parents, by taxon name.
+
+    Chains not in the cache or the index are fetched from PBDB in batches
+    of taxonomy: batch names (concurrently), merged into the index once,
+    and cached. Taxa unknown to PBDB get an empty chain.
+
+    :arg taxa: Taxonomic names
+    :type taxa: iterable (of str)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from ..elc import coalesce, config, pool, timing
+
+    index = _index
+    chains = dict()
+    missing = list()
+
+    for taxon in dict.fromkeys(taxa):
+        key = normalize(taxon)
+        chain = recall(key)
+        if chain is None:
+            chain = local_chain(index, key)
+        if chain is None:
+            missing.append(taxon)
+        else:
+            chains[taxon] = chain
+
+    if missing:
+        size = config.get('taxonomy', 'batch')
+        batches = [','.join(missing[n:n + size])
+                   for n in range(0, len(missing), size)]
+        recorder = timing.current()
+
+        def one(names):
+            timing.resume(recorder)
+            return coalesce.run(('taxonomy', 'all_parents', names),
+                                fetch, names, 'all_parents')
+
+        workers = min(len(batches), pool.setting('paging_workers', 'pbdb'))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            records = [rec for batch in executor.map(one, batches)
+                       for rec in batch]
+
+        index = merge(records)
+
+        for taxon in missing:
+            i = index.named.get(normalize(taxon))
+            if i is None:
+                chain = list()
+            else:
+                i = index.senior[i]
+                chain = [index.ids[x] for x in index.upper(i) + [i]]
+            remember(normalize(taxon), chain)
+            chains[taxon] = chain
+
+    result = dict()
+    for taxon, chain in chains.items():
+        found = [index.find(oid) for oid in chain]
+        result[taxon] = [(index.ranks[i], index.names[i])
+                         for i in found if i is not None]
+
+    return result
+
+
+def dump(taxon, filename):
+    """
+    Write the all_children records of a taxon to a JSON snapshot file.
+
+    :arg taxon: Clade to dump (e.g. Life for the whole tree)
+    :type taxon: str
+    """
+    import json
+
+    records = fetch(taxon, 'all_children')
+
+    with open(filename, 'w') as f:
+        json.dump({'clade': taxon, 'records': records}, f,
+                  separators=(',', ':'))
+
+    return len(records)
+
+
+def load(filename=None):
+    """
+    Load a JSON snapshot written by dump into the index.
+
+    The loaded clade is refreshed from PBDB like any other once it is
+    older than the ttl. Without a file name the configured snapshot is
+    used, if any.
+    """
+    import json
+    from ..elc import config
+
+    filename = filename or config.get('taxonomy', 'snapshot')
+
+    if not filename:
+        return _index
+
+    with open(filename) as f:
+        snapshot = json.load(f)
+
+    return merge(snapshot.get('records') or [], clade=snapshot.get('clade'))
+
+
+if __name__ == '__main__':
+    import sys
+
+    print(dump(sys.argv[1], sys.argv[2]))
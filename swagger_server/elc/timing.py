@@ -0,0 +1,175 @@
+"""Per-stage timing spans and aggregated latency histograms."""
+
+import threading
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           30.0, 60.0)
+
+# Active span recorder of the current thread
+_local = threading.local()
+
+# (endpoint, db, stage) -> {'buckets': [...], 'sum': float, 'count': int}
+_hist = dict()
+_lock = threading.Lock()
+
+
+def start(endpoint, db):
+    """
+    Begin recording spans for an endpoint and database in this thread.
+
+    Returns the recorder, which may be passed to resume in worker threads
+    so their spans are attributed to the same subquery.
+    """
+    _local.recorder = {'endpoint': endpoint, 'db': db, 'spans': dict()}
+
+    return _local.recorder
+
+
+def current():
+    """Return the recorder of the current thread or None."""
+    return getattr(_local, 'recorder', None)
+
+
+def resume(recorder):
+    """Record this thread's spans into an existing recorder."""
+    _local.recorder = recorder
+
+
+def stop():
+    """Stop recording spans in this thread and return the stage times."""
+    recorder = current()
+    _local.recorder = None
+
+    if recorder is None:
+        return dict()
+
+    return {stage: round(secs, 4)
+            for stage, secs in recorder['spans'].items()}
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a named stage of the current subquery.
+
+    Times for a stage seen more than once are summed. Spans outside a
+    started recorder are not recorded.
+    """
+    from time import perf_counter
+
+    t0 = perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - t0
+        recorder = current()
+        if recorder is not None:
+            with _lock:
+                spans = recorder['spans']
+                spans[stage] = spans.get(stage, 0.0) + elapsed
+            observe(recorder['endpoint'], recorder['db'], stage, elapsed)
+
+
+def observe(endpoint, db, stage, secs):
+    """Add a single stage duration to the aggregated histograms."""
+    from bisect import bisect_left
+
+    key = (endpoint, db, stage)
+
+    with _lock:
+        hist = _hist.get(key)
+        if hist is None:
+            hist = {'buckets': [0] * (len(BUCKETS) + 1),
+                    'sum': 0.0,
+                    'count': 0}
+            _hist[key] = hist
+        hist['buckets'][bisect_left(BUCKETS, secs)] += 1
+        hist['sum'] += secs
+        hist['count'] += 1
+
+
+def request_started():
+    """Flask before_request hook: note the request start time."""
+    from flask import g
+    from time import perf_counter
+
+    g.elc_t0 = perf_counter()
+
+
+def request_finished(response):
+    """Flask after_request hook: record the total request time."""
+    from flask import g
+    from time import perf_counter
+
+    t0 = getattr(g, 'elc_t0', None)
+
+    if t0 is not None:
+        observe(endpoint_name(), 'all', 'total', perf_counter() - t0)
+
+    return response
+
+
+def endpoint_name():
+    """Return the route of the current request (e.g. occ, misc/subtaxa)."""
+    from flask import has_request_context, request
+
+    if not has_request_context() or not request.url_rule:
+        return 'unmatched'
+
+    return request.url_rule.rule.rsplit('/api_v1/', 1)[-1]
+
+
+def export():
+    """
+    Return the metrics of this process in Prometheus text format.
+
+    Each uWSGI worker keeps its own metrics.
+    """
+    from ..elc import cache, coalesce
+
+    def labels(**kwargs):
+        return ','.join('{0:s}="{1:s}"'.format(k, str(v))
+                        for k, v in kwargs.items())
+
+    lines = ['# HELP elc_stage_seconds Time spent in each request stage',
+             '# TYPE elc_stage_seconds histogram']
+
+    with _lock:
+        hists = sorted((k, dict(v, buckets=list(v['buckets'])))
+                       for k, v in _hist.items())
+
+    for (endpoint, db, stage), hist in hists:
+        tags = labels(endpoint=endpoint, db=db, stage=stage)
+        total = 0
+        for bound, n in zip(BUCKETS + ('+Inf',), hist['buckets']):
+            total += n
+            lines.append('elc_stage_seconds_bucket{{{0:s},le="{1:s}"}} {2:d}'
+                         .format(tags, str(bound), total))
+        lines.append('elc_stage_seconds_sum{{{0:s}}} {1:.6f}'
+                     .format(tags, hist['sum']))
+        lines.append('elc_stage_seconds_count{{{0:s}}} {1:d}'
+                     .format(tags, hist['count']))
+
+    stats = cache.stats()
+
+    lines.extend(['# TYPE elc_cache_entries gauge',
+                  'elc_cache_entries {0:d}'.format(stats.pop('entries')),
+                  '# TYPE elc_cache_bytes gauge',
+                  'elc_cache_bytes {0:d}'.format(stats.pop('bytes')),
+                  '# HELP elc_cache_events_total Upstream response cache '
+                  'events',
+                  '# TYPE elc_cache_events_total counter'])
+
+    for db, outcomes in sorted(stats.items()):
+        for outcome, n in sorted(outcomes.items()):
+            lines.append('elc_cache_events_total{{{0:s}}} {1:d}'
+                         .format(labels(db=db, outcome=outcome), n))
+
+    lines.extend(['# TYPE elc_upstream_in_flight gauge',
+                  'elc_upstream_in_flight {0:d}'
+                  .format(coalesce.in_flight())])
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,322 @@
+"""Chunked response body writers for streamed endpoint returns."""
+
+
+def chunked(pieces, size):
+    """
+    Group small body pieces into chunks of roughly the given size.
+
+    :arg pieces: Serialised fragments of the response body
+    :type pieces: iterable (of bytes)
+    :arg size: Target chunk length in bytes
+    :type size: int
+    """
+    buf = list()
+    length = 0
+
+    for piece in pieces:
+        buf.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield b''.join(buf)
+            buf = list()
+            length = 0
+
+    if buf:
+        yield b''.join(buf)
+
+
+def stream_error(err):
+    """
+    Return the message of an error that ended a streamed subquery.
+
+    Once the headers are sent any error (a dropped connection, a record
+    of an unexpected shape) can only be reported in the return itself.
+    """
+    if isinstance(err, ValueError) and len(err.args) == 2 and \
+            isinstance(err.args[0], int):
+        return '{0}'.format(err.args[1])
+
+    return 'Subquery failed: {0:s}: {1:s}'.format(type(err).__name__,
+                                                   str(err))
+
+
+def json_pieces(opened, options):
+    """Generate the fragments of a streamed JSON return."""
+    from ..elc import aux, serial
+
+    desc_obj = dict()
+    sep = b''
+
+    yield b'{"records":['
+
+    try:
+        for sub in opened:
+            rec_count = 0
+            error = None
+
+            try:
+                for data in sub['records']:
+                    yield sep + serial.dumps(data)
+                    sep = b','
+                    rec_count += 1
+
+            except Exception as err:
+                # Headers are already sent, so report in the metadata
+                error = stream_error(err)
+
+            desc_obj.update(aux.build_meta(options))
+
+            meta = aux.build_meta_sub(source=sub['source'],
+                                      t0=sub['t0'],
+                                      sub_tag=sub['db'],
+                                      options=sub['options'],
+                                      count=rec_count)
+            if error:
+                meta[sub['db']].update(error=error)
+
+            desc_obj.update(meta)
+
+    finally:
+        for sub in opened:
+            sub['close']()
+
+    yield b'],"metadata":' + serial.dumps(desc_obj) + b'}'
+
+
+def json_stream(opened, options):
+    """
+    Return a chunked JSON body generator for opened streamed subqueries.
+
+    Records are written as they are decoded, followed by the metadata
+    block, so memory use does not grow with the number of records.
+
+    :arg opened: Streamed subqueries from dispatch.open_streams
+    :type opened: list (of dicts)
+    :arg options: Runtime options
+    :type options: dict
+    """
+    from ..elc import config
+
+    return chunked(json_pieces(opened, options),
+                   config.get('stream', 'chunk_bytes'))
+
+
+def record_fields(dbs, endpoint, records=None):
+    """
+    Return the union of the ELC fields of several databases in order.
+
+    Declared field mappings are used where they exist (so the header is
+    known before any record is decoded); otherwise the fields are
+    collected from the records themselves.
+
+    :arg dbs: Database names
+    :type dbs: list (of str)
+    :arg records: Decoded records (required for unmapped routes)
+    :type records: list (of dicts)
+    """
+    from ..handlers import mapping
+
+    fields = dict()
+
+    for db in dbs:
+        names = mapping.field_names(db, endpoint)
+        if names is None:
+            for rec in records or []:
+                fields.update(dict.fromkeys(rec.keys()))
+            break
+        fields.update(dict.fromkeys(names))
+
+    return list(fields.keys())
+
+
+def opened_records(opened, errors=None):
+    """
+    Generate the records of all opened streamed subqueries in turn.
+
+    :arg errors: List collecting (db, message) of failed subqueries
+    :type errors: list
+    """
+    try:
+        for sub in opened:
+            try:
+                yield from sub['records']
+            except Exception as err:
+                # Headers are already sent; end this database's rows
+                if errors is not None:
+                    errors.append((sub['db'], stream_error(err)))
+    finally:
+        for sub in opened:
+            sub['close']()
+
+
+def csv_pieces(records, fields, size, errors=None):
+    """
+    Generate the encoded chunks of a CSV return.
+
+    Subqueries that failed after the header was sent are reported in
+    trailing comment lines ('# error: <db>: <message>').
+
+    :arg records: ELC records, written as they are produced
+    :type records: iterable (of dicts)
+    :arg fields: Column names of the header row
+    :type fields: list (of str)
+    :arg size: Target chunk length in bytes
+    :type size: int
+    :arg errors: (db, message) of failed subqueries, filled by records
+    :type errors: list
+    """
+    import csv
+    import io
+
+    buf = io.StringIO()
+    out = csv.DictWriter(buf, fieldnames=fields, restval='',
+                         extrasaction='ignore')
+    out.writeheader()
+
+    for rec in records:
+        out.writerow(rec)
+        if buf.tell() >= size:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+
+    for db, msg in errors or []:
+        buf.write('# error: {0:s}: {1:s}\r\n'.format(
+            db, ' '.join(str(msg).split())))
+
+    yield buf.getvalue().encode('utf-8')
+
+
+def csv_response(records, filename, fields, errors=None):
+    """
+    Return a streamed CSV file download.
+
+    Memory use does not grow with the number of records when records is
+    a generator (e.g. opened_records).
+
+    :arg records: ELC records
+    :type records: iterable (of dicts)
+    :arg filename: Download file name
+    :type filename: str
+    :arg fields: Column names of the header row
+    :type fields: list (of str)
+    :arg errors: (db, message) of failed subqueries, filled by records
+    :type errors: list
+    """
+    from flask import Response
+    from ..elc import config
+
+    pieces = csv_pieces(records, fields, config.get('stream', 'chunk_bytes'),
+                        errors)
+    disposition = 'attachment; filename={0:s}'.format(filename)
+
+    return Response(pieces,
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': disposition})
+
+
+def ndjson_pieces(subs, options, endpoint):
+    """
+    Generate the lines of a newline delimited JSON return.
+
+    The first line holds the composite metadata. Each database's records
+    follow one per line (or their ids for show=idx, or none for
+    show=poll), then a line with that database's metadata. Metadata
+    lines are objects with the single key 'metadata'.
+
+    :arg subs: Tuples of database name, records and a function of the
+               record count and error message returning the metadata
+    :type subs: iterable (of tuples)
+    :arg endpoint: Route name, naming the id field for show=idx
+    :type endpoint: str
+    """
+    from ..elc import aux, serial
+
+    show = options.get('show')
+    id_field = aux.id_field(endpoint)
+
+    yield serial.dumps({'metadata': aux.build_meta(options)}) + b'\n'
+
+    for db, records, describe in subs:
+        rec_count = 0
+        error = None
+        seen = set()
+
+        try:
+            for rec in records:
+                rec_count += 1
+                if show == 'poll':
+                    continue
+                if show == 'idx':
+                    # Identifier only subqueries return the ids themselves
+                    if isinstance(rec, dict):
+                        rec = rec.get(id_field)
+                    if rec in seen:
+                        continue
+                    seen.add(rec)
+                yield serial.dumps(rec) + b'\n'
+
+        except Exception as err:
+            # Headers are already sent, so report in the metadata
+            error = stream_error(err)
+
+        yield serial.dumps({'metadata': describe(rec_count, error)}) + b'\n'
+
+
+def opened_subs(opened):
+    """Generate the ndjson_pieces tuples of opened streamed subqueries."""
+    from ..elc import aux
+
+    def describer(sub):
+        def describe(rec_count, error):
+            meta = aux.build_meta_sub(source=sub['source'],
+                                      t0=sub['t0'],
+                                      sub_tag=sub['db'],
+                                      options=sub['options'],
+                                      count=rec_count)
+            if error:
+                meta[sub['db']].update(error=error)
+            return meta
+        return describe
+
+    try:
+        for sub in opened:
+            yield sub['db'], sub['records'], describer(sub)
+    finally:
+        for sub in opened:
+            sub['close']()
+
+
+def dispatched_subs(results):
+    """Generate the ndjson_pieces tuples of dispatch.each results."""
+    def describer(db, meta, error):
+        def describe(rec_count, stream_error):
+            if error is None:
+                return meta
+            return {db: {'record_count': 0, 'error': error}}
+        return describe
+
+    for db, records, meta in results:
+        if isinstance(records, ValueError):
+            yield db, [], describer(db, None, records.args[1])
+        else:
+            yield db, records, describer(db, meta, None)
+
+
+def ndjson_response(subs, options, endpoint):
+    """
+    Return a chunked newline delimited JSON response.
+
+    :arg subs: Output of opened_subs or dispatched_subs
+    :type subs: iterable (of tuples)
+    :arg options: Runtime options
+    :type options: dict
+    :arg endpoint: Route name
+    :type endpoint: str
+    """
+    from flask import Response
+    from ..elc import config
+
+    return Response(chunked(ndjson_pieces(subs, options, endpoint),
+                            config.get('stream', 'chunk_bytes')),
+                    mimetype='application/x-ndjson')
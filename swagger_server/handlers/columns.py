@@ -0,0 +1,133 @@
+"""Column-wise helpers for decoding upstream records in bulk."""
+
+from functools import lru_cache
+
+
+def batches(records, size=None):
+    """
+    Split an iterable of records into lists of up to size records.
+
+    With size None a list is passed through whole and any other iterable
+    is read into a single list.
+    """
+    from itertools import islice
+
+    if not size:
+        yield records if isinstance(records, list) else list(records)
+        return
+
+    records = iter(records)
+
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def column(records, key, default=None):
+    """Return the values of one field of all records."""
+    return [rec.get(key, default) for rec in records]
+
+
+def tagged(values, prefix, default):
+    """Return values prefixed with a database tag (default if empty)."""
+    empty = prefix + str(default)
+
+    return [prefix + str(x) if x else empty for x in values]
+
+
+def tagged_or_none(values, prefix):
+    """Return values prefixed with a database tag, or None if empty."""
+    return [prefix + str(x) if x else None for x in values]
+
+
+def scaled(values, factor, ndigits):
+    """Return numerical values divided by factor and rounded."""
+    if factor == 1:
+        return [round(x, ndigits) if x is not None else None
+                for x in values]
+
+    return [round(x / factor, ndigits) if x is not None else None
+            for x in values]
+
+
+@lru_cache(maxsize=4096)
+def point(geography):
+    """
+    Return the (lat, lon) of a GeoJSON geometry string, or None.
+
+    Points give their coordinates, polygons their first vertex. Sites
+    repeat across records, so parsed geometries are cached.
+    """
+    import json
+
+    if not geography:
+        return None
+
+    loc = json.loads(geography)
+    coords = loc.get('coordinates')
+
+    if loc.get('type').lower() == 'point':
+        return coords[1], coords[0]
+    else:
+        return coords[0][0][1], coords[0][0][0]
+
+
+def nones(n):
+    """Return a column of n empty values."""
+    return [None] * n
+
+
+def rows(columns):
+    """
+    Return an iterator of ELC records, one per row of decoded columns.
+
+    :arg columns: ELC field name to its column of values (in field order)
+    :type columns: dict (of lists)
+    """
+    keys = tuple(columns.keys())
+
+    return (dict(zip(keys, values)) for values in zip(*columns.values()))
+
+
+def age_mask(max_ages, min_ages, rule, early, late):
+    """
+    Return which records satisfy a PBDB style time rule.
+
+    The rule is chosen once and mapped over the age columns. Records
+    without both ages are excluded.
+
+    :arg rule: contain, major or overlap
+    :type rule: str
+    :arg early: Older bound of the query age range
+    :type early: float
+    :arg late: Younger bound of the query age range
+    :type late: float
+    """
+    # Age range wholly within the query range
+    def contain(x, y):
+        return x is not None and y is not None and x <= early and y >= late
+
+    # Age range intersects the query range
+    def overlap(x, y):
+        return x is not None and y is not None and x > late and y < early
+
+    # At least half of the age range lies within the query range
+    def major(x, y):
+        if x is None or y is None:
+            return False
+        if x == y:
+            return late <= x <= early
+        return (min(x, early) - max(y, late)) * 2 >= x - y
+
+    test = {'contain': contain, 'major': major, 'overlap': overlap}[rule]
+
+    return list(map(test, max_ages, min_ages))
+
+
+def compress(cols, mask):
+    """Return the columns keeping only the masked records."""
+    from itertools import compress
+
+    return {name: list(compress(col, mask)) for name, col in cols.items()}
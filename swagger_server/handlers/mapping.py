@@ -0,0 +1,298 @@
+"""Compile declarative field mappings into column extractors."""
+
+import threading
+
+MAP_FILE = 'swagger_server/lookup/field_maps.yaml'
+LOOKUP_DIR = 'swagger_server/lookup/'
+
+# (db, endpoint) -> Extractor, compiled from MAP_FILE on first use
+_extractors = None
+_lock = threading.Lock()
+
+
+class Extractor(object):
+    """
+    Decoder for the records of one database endpoint.
+
+    Each field is compiled into a function producing its whole column, so
+    the choice of upstream key, tagging, scaling and translation is made
+    once per column rather than once per record.
+
+    :arg db: Database name
+    :type db: str
+    :arg spec: Endpoint entry of the field mappings
+    :type spec: dict
+    """
+
+    def __init__(self, db, spec):
+        self.db = db
+        self.key = spec.get('records')
+        self.explode = spec.get('explode')
+        self.rotate = bool(spec.get('rotate'))
+        self.fields = [(name, compile_field(name, field))
+                       for name, field in spec.get('fields').items()]
+
+    def exploded(self, records):
+        """Return one upstream record per element of the exploded list."""
+        if not self.explode:
+            return records
+
+        return [dict(rec, **{self.explode: item})
+                for rec in records
+                for item in rec.get(self.explode) or []]
+
+    def columns(self, records, options):
+        """Return the ELC field columns of a list of upstream records."""
+        from ..elc import ages
+        from ..handlers import columns
+
+        records = self.exploded(records)
+
+        ctx = {'factor': ages.set_age_scaler(options=options, db=self.db),
+               'paleo': options.get('geog') == 'paleo',
+               'n': len(records),
+               'nested': dict()}
+
+        cols = {name: make(records, ctx) for name, make in self.fields}
+
+        # Time rule not applied by the database (dropped before rotation)
+        if options.get('age_filter') and 'max_age' in cols:
+            cols = columns.compress(cols, columns.age_mask(
+                cols['max_age'], cols['min_age'], *options.get('age_filter')))
+
+        if self.rotate and ctx['paleo']:
+            rotate(cols, ctx['factor'])
+
+        return cols
+
+    def decode(self, resp_json, options):
+        """Return an iterator of ELC records from an upstream response."""
+        from ..handlers import columns
+
+        records = resp_json.get(self.key) or []
+
+        return columns.rows(self.columns(records, options))
+
+    def identifiers(self, resp_json, name, options):
+        """Return the column of a single (id) field of an upstream response."""
+        from ..elc import ages
+        from ..handlers import columns
+
+        compiled = dict(self.fields)
+        records = self.exploded(resp_json.get(self.key) or [])
+
+        if name not in compiled:
+            return [None] * len(records)
+
+        ctx = {'factor': ages.set_age_scaler(options=options, db=self.db),
+               'paleo': False,
+               'n': len(records),
+               'nested': dict()}
+
+        ids = compiled[name](records, ctx)
+
+        if options.get('age_filter') and 'max_age' in compiled:
+            mask = columns.age_mask(compiled['max_age'](records, ctx),
+                                    compiled['min_age'](records, ctx),
+                                    *options.get('age_filter'))
+            return columns.compress({name: ids}, mask)[name]
+
+        return ids
+
+    def decode_batches(self, records, options, batch=None):
+        """Generate ELC records from upstream records, batch-wise."""
+        from ..handlers import columns
+
+        for chunk in columns.batches(records, batch):
+            yield from columns.rows(self.columns(chunk, options))
+
+    def column_batches(self, records, options, batch=None):
+        """Generate ELC field columns from upstream records, batch-wise."""
+        from ..handlers import columns
+
+        for chunk in columns.batches(records, batch):
+            yield self.columns(chunk, options)
+
+
+def rotate(cols, factor):
+    """Rotate lat and lon columns to the midpoint of each age range."""
+    from ..elc import geog
+
+    # Utility function: Midpoint of a record age range in whole Ma
+    def mid_age(x, y):
+        bound = [a * factor for a in (x, y) if a is not None]
+        return round(sum(bound) / len(bound) / 1e6) if bound else None
+
+    mid = [mid_age(x, y) for x, y in zip(cols['max_age'], cols['min_age'])]
+
+    cols['lat'], cols['lon'] = geog.paleo_columns(cols['lat'], cols['lon'],
+                                                  mid)
+
+
+def read_table(name):
+    """Return a translation table from the lookup directory."""
+    import yaml
+
+    with open(LOOKUP_DIR + name + '.yaml', encoding='utf-8-sig') as f:
+        return yaml.safe_load(f)
+
+
+def getter(path):
+    """
+    Return a function reading a (nested) key from each record.
+
+    Columns of nested objects are kept in the context, so fields under
+    the same object (e.g. site) only walk the records once.
+    """
+    from types import MappingProxyType
+
+    empty = MappingProxyType(dict())
+    path = (path,) if isinstance(path, str) else tuple(path)
+
+    def get(records, ctx):
+        nested = ctx['nested']
+        for depth in range(1, len(path)):
+            prefix = path[:depth]
+            if prefix not in nested:
+                nested[prefix] = [rec.get(path[depth - 1]) or empty
+                                  for rec in records]
+            records = nested[prefix]
+        return [rec.get(path[-1]) for rec in records]
+
+    return get
+
+
+def first_getter(paths):
+    """Return a function reading the first non-empty of several keys."""
+    getters = [getter(path) for path in paths]
+
+    def get(records, ctx):
+        values = getters[0](records, ctx)
+        for more in getters[1:]:
+            values = [x or y for x, y in zip(values, more(records, ctx))]
+        return values
+
+    return get
+
+
+def compile_field(name, field):
+    """
+    Return a function building one ELC field column.
+
+    The function takes the upstream records and a context with the age
+    scale factor, the coordinate type, the record count and the nested
+    object columns read so far.
+
+    :arg name: ELC field name
+    :type name: str
+    :arg field: Field entry of the mappings (see MAP_FILE)
+    :type field: dict
+    """
+    from ..handlers import columns
+
+    if 'value' in field:
+        value = field.get('value')
+        return lambda records, ctx: [value] * ctx['n']
+
+    if 'from' in field:
+        read = getter(field.get('from'))
+    elif 'first' in field:
+        read = first_getter(field.get('first'))
+    else:
+        msg = 'Field mapping lacks a source: {0:s}'.format(name)
+        raise ValueError(500, msg)
+
+    read_modern = read
+    read_paleo = getter(field.get('paleo')) if 'paleo' in field else read
+
+    steps = list()
+
+    if 'point' in field:
+        index = {'lat': 0, 'lon': 1}[field.get('point')]
+        parsed = ('point', str(field.get('from') or field.get('first')))
+
+        def locate(col, ctx):
+            # Parse each geometry once for both the lat and lon fields
+            if parsed not in ctx['nested']:
+                ctx['nested'][parsed] = list(map(columns.point, col))
+            return [p[index] if p else None for p in ctx['nested'][parsed]]
+
+        steps.append(locate)
+
+    if 'age' in field:
+        digits = field.get('age')
+        steps.append(lambda col, ctx: columns.scaled(
+            [x if x is not None and x >= 0 else None for x in col],
+            ctx['factor'], digits))
+
+    if 'map' in field:
+        table = {str(k): v for k, v in field.get('map').items()}
+        steps.append(lambda col, ctx: [table.get(str(x)) for x in col])
+
+    if 'lookup' in field:
+        table = read_table(field.get('lookup'))
+        steps.append(lambda col, ctx: [table.get(x) for x in col])
+
+    if 'tag' in field:
+        prefix = field.get('tag')
+        if 'default' in field:
+            default = field.get('default')
+            steps.append(lambda col, ctx: columns.tagged(col, prefix,
+                                                         default))
+        else:
+            steps.append(lambda col, ctx: columns.tagged_or_none(col,
+                                                                 prefix))
+
+    elif 'default' in field:
+        default = field.get('default')
+        steps.append(lambda col, ctx: [default if x is None else x
+                                       for x in col])
+
+    def make(records, ctx):
+        if ctx['paleo']:
+            col = read_paleo(records, ctx)
+        else:
+            col = read_modern(records, ctx)
+        for step in steps:
+            col = step(col, ctx)
+        return col
+
+    return make
+
+
+def load(filename=MAP_FILE):
+    """Compile all field mappings, replacing any compiled before."""
+    from ..elc import config
+
+    global _extractors
+
+    maps = config.read_file(filename)
+
+    extractors = {(db, endpoint): Extractor(db, spec)
+                  for db, endpoints in maps.items()
+                  for endpoint, spec in endpoints.items()}
+
+    with _lock:
+        _extractors = extractors
+
+    return extractors
+
+
+def get(db, endpoint):
+    """Return the extractor for a database endpoint, or None if unmapped."""
+    extractors = _extractors
+
+    if extractors is None:
+        extractors = load()
+
+    return extractors.get((db, endpoint))
+
+
+def field_names(db, endpoint):
+    """Return the declared ELC fields of a route in order, or None."""
+    extractor = get(db, endpoint)
+
+    if extractor is None:
+        return None
+
+    return [name for name, make in extractor.fields]
@@ -5,6 +5,9 @@ def response_decode(resp_json, return_obj, options, db, endpoint):
     """
     Extract necessary data from the subquery.
 
+    Routes with a declared field mapping (see handlers.mapping) are decoded
+    by its compiled extractor, others by a custom database handler.
+
     :arg db: Database name
     :type db: str
     :arg resp_json: Database subquery responce object
@@ -14,30 +17,76 @@ def response_decode(resp_json, return_obj, options, db, endpoint):
     :arg endpoint: Route to follow
     :type endpoint: str
     """
-    from ..handlers import neotoma, pbdb
+    from ..handlers import mapping, neotoma, pbdb
+
+    extractor = mapping.get(db, endpoint)
+
+    if extractor:
+        return_obj.extend(extractor.decode(resp_json, options))
+        return return_obj
 
     if db == 'neotoma':
-        if endpoint == 'occ':
-            return neotoma.occurrences(resp_json, return_obj, options)
-        if endpoint == 'loc':
-            return neotoma.locales(resp_json, return_obj, options)
         if endpoint == 'ref':
             return neotoma.references(resp_json, return_obj, options)
-        if endpoint == 'tax':
-            return neotoma.taxonomy(resp_json, return_obj, options)
 
     if db == 'pbdb':
-        if endpoint == 'occ':
-            return pbdb.occurrences(resp_json, return_obj, options)
-        if endpoint == 'loc':
-            return pbdb.locales(resp_json, return_obj, options)
         if endpoint == 'ref':
             return pbdb.references(resp_json, return_obj, options)
-        if endpoint == 'tax':
-            return pbdb.taxonomy(resp_json, return_obj, options)
 
     # NEW RESOURCE: Additional custom database handler calls here
 
-    else:
-        msg = 'Database suport lacking: {0:s}'.format(db)
-        raise ValueError(501, msg)
+    msg = 'Database suport lacking: {0:s}'.format(db)
+    raise ValueError(501, msg)
+
+
+def record_decode(records, options, db, endpoint):
+    """
+    Return a generator of ELC records from an iterable of upstream records.
+
+    Used for streamed responses, where the upstream records arrive one by
+    one (see records_key for the array each database streams). Records
+    are decoded in batches of the configured size.
+
+    :arg records: Upstream records for the database and route
+    :type records: iterable (of dicts)
+    """
+    from ..elc import config
+    from ..handlers import mapping
+
+    extractor = mapping.get(db, endpoint)
+
+    if extractor and endpoint in ['occ', 'loc']:
+        return extractor.decode_batches(records, options,
+                                        config.get('stream', 'paleo_batch'))
+
+    msg = 'Streaming suport lacking: {0:s} {1:s}'.format(db, endpoint)
+    raise ValueError(501, msg)
+
+
+def column_decode(records, options, db, endpoint):
+    """
+    Return a generator of ELC field column batches from upstream records.
+
+    Used for the columnar output formats (see elc.columnar); each batch
+    is a dict of field name to a list of values.
+    """
+    from ..elc import config
+    from ..handlers import mapping
+
+    extractor = mapping.get(db, endpoint)
+
+    if extractor and endpoint in ['occ', 'loc']:
+        return extractor.column_batches(records, options,
+                                        config.get('stream', 'paleo_batch'))
+
+    msg = 'Columnar suport lacking: {0:s} {1:s}'.format(db, endpoint)
+    raise ValueError(501, msg)
+
+
+def records_key(db):
+    """Return the name of the record array in a database response."""
+    # NEW RESOURCE: Add the top level record array name here
+    keys = {'neotoma': 'data',
+            'pbdb': 'records'}
+
+    return keys.get(db)
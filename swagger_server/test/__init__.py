@@ -1,14 +1,35 @@
 from flask_testing import TestCase
-from ..encoder import JSONEncoder
-import connexion
 import logging
 
 
 class BaseTestCase(TestCase):
 
     def create_app(self):
+        import connexion
+        from ..encoder import JSONEncoder
+
         logging.getLogger('connexion.operation').setLevel('ERROR')
         app = connexion.App(__name__, specification_dir='../swagger/')
         app.app.json_encoder = JSONEncoder
         app.add_api('swagger.yaml')
         return app.app
+
+
+def override(settings):
+    """
+    Return a patch of config.get answering some settings from a dict.
+
+    :arg settings: (group, param) -> value
+    :type settings: dict
+    """
+    from unittest import mock
+    from swagger_server.elc import config
+
+    get = config.get
+
+    def patched(group, param):
+        if (group, param) in settings:
+            return settings[(group, param)]
+        return get(group, param)
+
+    return mock.patch.object(config, 'get', patched)
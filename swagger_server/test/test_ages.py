@@ -0,0 +1,45 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+from swagger_server.elc import ages, params
+
+
+class TestTimerule(unittest.TestCase):
+    """ Time rules of age range queries """
+
+    def test_pbdb_passes_rule_on(self):
+        options = {'ageunits': 'ma', 'timerule': 'contain'}
+
+        self.assertEqual(ages.set_age('10,5', options, 'pbdb'),
+                         {'max_ma': 10.0, 'min_ma': 5.0,
+                          'timerule': 'contain'})
+        self.assertNotIn('age_filter', options)
+
+    def test_neotoma_filters_decoded_records(self):
+        options = {'ageunits': 'ma', 'timerule': 'major'}
+
+        self.assertEqual(ages.set_age('10,5', options, 'neotoma'),
+                         {'ageolder': 10000000.0, 'ageyounger': 5000000.0})
+        self.assertEqual(options.get('age_filter'), ('major', 10.0, 5.0))
+
+    def test_no_rule(self):
+        options = {'ageunits': 'ma', 'timerule': None}
+
+        self.assertNotIn('timerule', ages.set_age('10,5', options, 'pbdb'))
+        ages.set_age('10,5', options, 'neotoma')
+        self.assertNotIn('age_filter', options)
+
+    def test_options_validate_rule(self):
+        self.assertEqual(params.set_options({'timerule': 'Major'},
+                                            'occ')['timerule'], 'major')
+        self.assertIsNone(params.set_options({}, 'occ')['timerule'])
+        with self.assertRaises(ValueError) as caught:
+            params.set_options({'timerule': 'within'}, 'occ')
+        self.assertEqual(caught.exception.args[0], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
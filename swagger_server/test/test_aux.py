@@ -0,0 +1,38 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+from swagger_server.elc import aux
+
+
+class TestIdentifiers(unittest.TestCase):
+    """ Primary record identifiers """
+
+    def test_id_field(self):
+        self.assertEqual(aux.id_field('occ'), 'occ_id')
+        self.assertEqual(aux.id_field('loc'), 'locale_id')
+        self.assertEqual(aux.id_field('tax'), 'taxon_id')
+        self.assertEqual(aux.id_field('ref'), 'ref_id')
+        self.assertIsNone(aux.id_field('other'))
+
+    def test_get_id_numbers_unique_in_order(self):
+        records = [{'occ_id': 'b'}, {'occ_id': 'a'}, {'occ_id': 'b'}]
+
+        self.assertEqual(aux.get_id_numbers(records, 'occ'), ['b', 'a'])
+
+    def test_get_id_numbers_of_ids(self):
+        self.assertEqual(aux.get_id_numbers(['x', 'y', 'x'], 'tax'),
+                         ['x', 'y'])
+
+    def test_ids_only_payload(self):
+        self.assertEqual(aux.set_db_special('pbdb', 'occ'),
+                         {'show': 'full'})
+        self.assertEqual(aux.set_db_special('pbdb', 'occ', ids_only=True),
+                         {})
+        self.assertEqual(aux.set_db_special('neotoma', 'occ'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
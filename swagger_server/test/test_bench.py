@@ -0,0 +1,110 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import os
+import tempfile
+import unittest
+
+from swagger_server.bench import payloads, upstream
+from swagger_server.bench.__main__ import percentile
+
+
+class TestStore(unittest.TestCase):
+    """ Stand-in upstream record store """
+
+    def setUp(self):
+        self.store = payloads.Store(size=50)
+
+    def test_records_are_stable(self):
+        other = payloads.Store(size=50)
+
+        self.assertEqual(self.store.records('pbdb/occs/list.json'),
+                         other.records('pbdb/occs/list.json'))
+
+    def test_limit_and_offset(self):
+        records = self.store.records('neotoma/occurrence')
+        body = self.store.body('neotoma/occurrence',
+                               {'limit': '5', 'offset': '10'})
+
+        self.assertEqual(body['data'], records[10:15])
+
+    def test_id_list(self):
+        records = self.store.records('pbdb/refs/list.json')
+        body = self.store.body('pbdb/refs/list.json',
+                               {'ref_id': '3,1,999,x'})
+
+        self.assertEqual(body['records'], [records[2], records[0]])
+
+    def test_rowcount(self):
+        body = self.store.body('pbdb/occs/list.json',
+                               {'limit': '0', 'rowcount': 'true'})
+
+        self.assertEqual(body['records_found'], 50)
+        self.assertEqual(body['records_returned'], 0)
+
+    def test_nested_record_path(self):
+        body = self.store.body('neotoma/publications', {'limit': '2'})
+
+        self.assertEqual(len(body['data']['result']), 2)
+
+    def test_recorded_fixtures_are_repeated(self):
+        with tempfile.TemporaryDirectory() as fixtures:
+            os.makedirs(os.path.join(fixtures, 'pbdb', 'occs'))
+            with open(os.path.join(fixtures, 'pbdb', 'occs',
+                                   'list.json'), 'w') as f:
+                json.dump({'records': [{'oid': 'occ:1'},
+                                       {'oid': 'occ:2'}]}, f)
+
+            store = payloads.Store(size=5, fixtures=fixtures)
+            oids = [rec['oid'] for rec in
+                    store.records('pbdb/occs/list.json')]
+
+        self.assertEqual(oids, ['occ:1', 'occ:2', 'occ:1', 'occ:2',
+                                'occ:1'])
+
+
+class TestUpstream(unittest.TestCase):
+    """ Stand-in upstream HTTP server """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = upstream.Upstream(payloads.Store(size=20)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_serves_and_counts(self):
+        import requests
+
+        url = self.server.base_url('pbdb') + 'occs/list.json'
+        resp = requests.get(url, params={'limit': 3})
+
+        self.assertEqual(len(resp.json()['records']), 3)
+        self.assertGreaterEqual(self.server.hits['pbdb/occs/list.json'], 1)
+
+    def test_unknown_path(self):
+        import requests
+
+        resp = requests.get(self.server.base_url('pbdb') + 'nothing')
+
+        self.assertEqual(resp.status_code, 404)
+
+
+class TestReport(unittest.TestCase):
+    """ Benchmark report statistics """
+
+    def test_percentile(self):
+        values = [float(n) for n in range(1, 101)]
+
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 50), 2.0)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
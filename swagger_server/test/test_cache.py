@@ -0,0 +1,89 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+from swagger_server.elc import cache
+from . import override
+
+
+class TestCache(unittest.TestCase):
+    """ Upstream response cache unit tests """
+
+    def setUp(self):
+        cache.clear()
+        self.settings = override({('cache', 'entries'): 3,
+                                  ('cache', 'max_bytes'): 100,
+                                  ('cache', 'max_item_bytes'): 80,
+                                  ('cache', 'disk'): None,
+                                  ('cache_ttl', 'pbdb'): 60})
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        cache.clear()
+
+    def test_hit_and_miss(self):
+        cache.put('a', 'pbdb', {'n': 1}, size=10)
+
+        self.assertEqual(cache.get('a', 'pbdb'), {'n': 1})
+        self.assertIsNone(cache.get('b', 'pbdb'))
+
+    def test_expired_entry(self):
+        with mock.patch('time.time', return_value=0.0):
+            cache.put('a', 'pbdb', {'n': 1}, size=10)
+
+        with mock.patch('time.time', return_value=61.0):
+            self.assertIsNone(cache.get('a', 'pbdb'))
+
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_evicts_least_recently_used_entry(self):
+        for key in 'abc':
+            cache.put(key, 'pbdb', key, size=1)
+        cache.get('a', 'pbdb')
+        cache.put('d', 'pbdb', 'd', size=1)
+
+        self.assertIsNone(cache.get('b', 'pbdb'))
+        self.assertEqual(cache.get('a', 'pbdb'), 'a')
+        self.assertEqual(cache.stats()['entries'], 3)
+
+    def test_evicts_to_byte_limit(self):
+        cache.put('a', 'pbdb', 'a', size=40)
+        cache.put('b', 'pbdb', 'b', size=40)
+        cache.put('c', 'pbdb', 'c', size=40)
+
+        self.assertIsNone(cache.get('a', 'pbdb'))
+        self.assertEqual(cache.get('c', 'pbdb'), 'c')
+        self.assertEqual(cache.stats()['bytes'], 80)
+
+    def test_replacing_entry_keeps_byte_total(self):
+        cache.put('a', 'pbdb', 'old', size=30)
+        cache.put('a', 'pbdb', 'new', size=20)
+
+        self.assertEqual(cache.get('a', 'pbdb'), 'new')
+        self.assertEqual(cache.stats()['bytes'], 20)
+
+    def test_skips_large_item(self):
+        cache.put('a', 'pbdb', 'a', size=81)
+
+        self.assertIsNone(cache.get('a', 'pbdb'))
+        self.assertEqual(cache.stats()['pbdb']['too_large'], 1)
+
+    def test_key_ignores_payload_order(self):
+        self.assertEqual(cache.make_key('u', {'a': 1, 'b': 2}),
+                         cache.make_key('u', {'b': 2, 'a': 1}))
+        self.assertNotEqual(cache.make_key('u', {'a': 1}),
+                            cache.make_key('u', {'a': 2}))
+
+    def test_bypass_header(self):
+        self.assertTrue(cache.bypass({'Cache-Control': 'no-cache'}))
+        self.assertTrue(cache.bypass({'Cache-Control': 'No-Store'}))
+        self.assertFalse(cache.bypass({'Cache-Control': 'max-age=60'}))
+        self.assertFalse(cache.bypass({}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import threading
+import unittest
+
+from swagger_server.elc import coalesce
+
+
+class TestCoalesce(unittest.TestCase):
+    """ Single-flight coalescing unit tests """
+
+    def concurrent(self, func, n=4):
+        """Call coalesce.run from n threads while func is in flight."""
+        results = [None] * n
+        started = threading.Barrier(n)
+
+        def one(i):
+            started.wait()
+            try:
+                results[i] = coalesce.run('key', func)
+            except ValueError as err:
+                results[i] = err
+
+        threads = [threading.Thread(target=one, args=(i,))
+                   for i in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        return results
+
+    def test_shares_one_call(self):
+        calls = list()
+        release = threading.Event()
+
+        def func():
+            calls.append(1)
+            release.wait(0.2)
+            return 'result'
+
+        results = self.concurrent(func)
+
+        self.assertEqual(results, ['result'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(coalesce.in_flight(), 0)
+
+    def test_shares_error(self):
+        release = threading.Event()
+
+        def func():
+            release.wait(0.2)
+            raise ValueError(502, 'upstream failed')
+
+        results = self.concurrent(func)
+
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+            self.assertEqual(result.args, (502, 'upstream failed'))
+        self.assertEqual(coalesce.in_flight(), 0)
+
+    def test_calls_again_after_completion(self):
+        calls = list()
+
+        def func():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(coalesce.run('key', func), 1)
+        self.assertEqual(coalesce.run('key', func), 2)
+
+    def test_error_is_not_remembered(self):
+        def fail():
+            raise ValueError(504, 'timed out')
+
+        with self.assertRaises(ValueError):
+            coalesce.run('key', fail)
+
+        self.assertEqual(coalesce.run('key', lambda: 'ok'), 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import io
+import unittest
+
+from swagger_server.elc import columnar
+
+pyarrow = columnar.pyarrow
+
+
+def opened(db, batches, closed):
+    """Return a streamed subquery of column batches."""
+    def records():
+        for cols in batches:
+            if isinstance(cols, Exception):
+                raise cols
+            yield cols
+
+    return {'db': db, 'records': records(),
+            'close': lambda: closed.append(db)}
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestColumnar(unittest.TestCase):
+    """ Arrow IPC stream and Parquet returns """
+
+    fields = ['occ_id', 'taxon', 'max_age', 'occurrences_count']
+
+    def schema(self):
+        return columnar.build_schema(self.fields, {'query': 'occ'})
+
+    def test_field_types(self):
+        self.assertEqual(columnar.field_type('lat'), pyarrow.float64())
+        self.assertEqual(columnar.field_type('occurrences_count'),
+                         pyarrow.int64())
+        self.assertTrue(pyarrow.types.is_dictionary(
+            columnar.field_type('taxon')))
+        self.assertEqual(columnar.field_type('occ_id'), pyarrow.string())
+
+    def test_coerce(self):
+        self.assertEqual(columnar.coerce(['1.5', None, 'x', 2],
+                                         pyarrow.float64()),
+                         [1.5, None, None, 2.0])
+        self.assertEqual(columnar.coerce([3, 'a'], pyarrow.string()),
+                         ['3', 'a'])
+
+    def test_record_batch_nulls_and_conversion(self):
+        batch = columnar.record_batch({'occ_id': ['a', 'b'],
+                                       'max_age': ['66.0', 'unknown']},
+                                      self.schema(), 2)
+
+        self.assertEqual(batch.num_rows, 2)
+        self.assertEqual(batch.column('max_age').to_pylist(), [66.0, None])
+        self.assertEqual(batch.column('taxon').to_pylist(), [None, None])
+
+    def test_arrow_stream(self):
+        closed = list()
+        subs = [opened('pbdb', [{'occ_id': ['a'], 'taxon': ['Canis']},
+                                {'occ_id': []}], closed),
+                opened('neotoma', [{'occ_id': ['b'], 'taxon': ['Canis']}],
+                       closed)]
+
+        data = b''.join(columnar.pieces(subs, self.schema(), 'arrow'))
+        table = pyarrow.ipc.open_stream(data).read_all()
+
+        self.assertEqual(table.column('occ_id').to_pylist(), ['a', 'b'])
+        self.assertEqual(table.column('taxon').to_pylist(),
+                         ['Canis', 'Canis'])
+        self.assertIn(b'metadata', table.schema.metadata)
+        self.assertEqual(closed, ['pbdb', 'neotoma'])
+
+    def test_arrow_error_batch(self):
+        subs = [opened('pbdb', [{'occ_id': ['a']},
+                                ValueError(502, 'interrupted')], list())]
+
+        data = b''.join(columnar.pieces(subs, self.schema(), 'arrow'))
+        reader = pyarrow.ipc.open_stream(data)
+        batches = list()
+        while True:
+            try:
+                batches.append(reader.read_next_batch_with_custom_metadata())
+            except StopIteration:
+                break
+
+        self.assertEqual(batches[0].batch.num_rows, 1)
+        self.assertEqual(batches[-1].batch.num_rows, 0)
+        self.assertEqual(batches[-1].custom_metadata[b'errors'],
+                         b'{"pbdb":"interrupted"}')
+
+    def test_parquet_file(self):
+        subs = [opened('pbdb', [{'occ_id': ['a', 'b'],
+                                 'occurrences_count': [1, '2']},
+                                ValueError(504, 'timed out')], list())]
+
+        data = b''.join(columnar.pieces(subs, self.schema(), 'parquet'))
+        parquet = pyarrow.parquet.ParquetFile(io.BytesIO(data))
+        table = parquet.read()
+
+        self.assertEqual(table.column('occurrences_count').to_pylist(),
+                         [1, 2])
+        self.assertEqual(parquet.metadata.metadata[b'errors'],
+                         b'{"pbdb":"timed out"}')
+
+    def test_decode_error_reported(self):
+        subs = [opened('pbdb', [{'occ_id': ['a']}, KeyError('oid')],
+                       list())]
+
+        data = b''.join(columnar.pieces(subs, self.schema(), 'parquet'))
+        parquet = pyarrow.parquet.ParquetFile(io.BytesIO(data))
+
+        self.assertEqual(parquet.read().num_rows, 1)
+        self.assertEqual(parquet.metadata.metadata[b'errors'],
+                         b'{"pbdb":"Subquery failed: KeyError: \'oid\'"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
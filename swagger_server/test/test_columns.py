@@ -0,0 +1,83 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+from swagger_server.handlers import columns
+
+
+class TestColumns(unittest.TestCase):
+    """ Column-wise record decoding helpers """
+
+    def test_batches(self):
+        self.assertEqual(list(columns.batches(iter(range(5)), 2)),
+                         [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(columns.batches(iter(range(3)))), [[0, 1, 2]])
+        self.assertEqual(list(columns.batches([], 2)), [])
+
+    def test_tagged(self):
+        self.assertEqual(columns.tagged(['occ:1', None, ''], 'pbdb:',
+                                        'occ:0'),
+                         ['pbdb:occ:1', 'pbdb:occ:0', 'pbdb:occ:0'])
+        self.assertEqual(columns.tagged_or_none([5, None], 'neot:txn:'),
+                         ['neot:txn:5', None])
+
+    def test_scaled(self):
+        self.assertEqual(columns.scaled([1500000, None, 0], 1e6, 3),
+                         [1.5, None, 0.0])
+        self.assertEqual(columns.scaled([66.04321, None], 1, 2),
+                         [66.04, None])
+
+    def test_point(self):
+        self.assertEqual(columns.point('{"type": "Point", '
+                                       '"coordinates": [-100.5, 45.25]}'),
+                         (45.25, -100.5))
+        polygon = ('{"type": "Polygon", "coordinates": '
+                   '[[[10.0, 20.0], [11.0, 20.0], [11.0, 21.0]]]}')
+        self.assertEqual(columns.point(polygon), (20.0, 10.0))
+        self.assertIsNone(columns.point(None))
+
+    def test_rows(self):
+        cols = {'occ_id': ['a', 'b'], 'lat': [1.0, None]}
+
+        self.assertEqual(list(columns.rows(cols)),
+                         [{'occ_id': 'a', 'lat': 1.0},
+                          {'occ_id': 'b', 'lat': None}])
+        self.assertEqual(list(columns.rows({'occ_id': []})), [])
+
+    def test_rows_field_names_are_data(self):
+        self.assertEqual(list(columns.rows({'bad name); x = (': [1]})),
+                         [{'bad name); x = (': 1}])
+
+
+    def mask(self, rule, ranges):
+        return columns.age_mask([x for x, y in ranges],
+                                [y for x, y in ranges], rule, 10.0, 5.0)
+
+    def test_age_mask_contain(self):
+        self.assertEqual(self.mask('contain', [(10, 5), (10.1, 5), (6, 4.9),
+                                               (8, 8), (None, 5)]),
+                         [True, False, False, True, False])
+
+    def test_age_mask_overlap(self):
+        # Ranges only touching the query range do not overlap it
+        self.assertEqual(self.mask('overlap', [(12, 10), (12, 9.9), (5, 3),
+                                               (5.1, 3), (20, 1), (7, None)]),
+                         [False, True, False, True, True, False])
+
+    def test_age_mask_major(self):
+        # Exactly half inside is enough; point ages must lie inside
+        self.assertEqual(self.mask('major', [(12, 8), (12, 8.1), (7, 3),
+                                             (7, 2.9), (10, 10), (11, 11),
+                                             (None, None)]),
+                         [True, False, True, False, True, False, False])
+
+    def test_compress(self):
+        self.assertEqual(columns.compress({'a': [1, 2, 3], 'b': 'xyz'},
+                                          [True, False, True]),
+                         {'a': [1, 3], 'b': ['x', 'z']})
+
+
+if __name__ == '__main__':
+    unittest.main()
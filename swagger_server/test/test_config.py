@@ -0,0 +1,65 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from swagger_server.elc import config
+
+
+class TestCurrent(unittest.TestCase):
+    """ Settings reloaded when the config file changes """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'config.yaml')
+        shutil.copy(config.CONFIG_FILE, self.filename)
+        os.utime(self.filename, (1000, 1000))
+
+        for patch in [mock.patch.object(config, 'CHECK_INTERVAL', 0),
+                      mock.patch.object(config, '_snapshot',
+                                        config._snapshot)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        config.reload(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def edit(self, text, mtime):
+        with open(self.filename, 'w') as f:
+            f.write(text)
+        os.utime(self.filename, (mtime, mtime))
+
+    def test_broken_edit_read_once(self):
+        limit = config.get('default', 'limit')
+        self.edit('default: [', 2000)
+
+        with mock.patch.object(config, 'read_file',
+                               wraps=config.read_file) as read, \
+                self.assertLogs(config.__name__, 'WARNING') as logged:
+            for n in range(3):
+                self.assertEqual(config.get('default', 'limit'), limit)
+
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(len(logged.output), 1)
+
+    def test_fixed_edit_reloaded(self):
+        with open(config.CONFIG_FILE) as f:
+            good = f.read()
+        self.edit('default: [', 2000)
+        with self.assertLogs(config.__name__, 'WARNING'):
+            config.current()
+
+        self.edit(good.replace('cache: 100000', 'cache: 5'), 3000)
+
+        self.assertEqual(config.get('resolve', 'cache'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
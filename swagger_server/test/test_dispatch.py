@@ -0,0 +1,61 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+from swagger_server.elc import dispatch, subreq
+from swagger_server.handlers import mapping
+
+
+class TestFetchIds(unittest.TestCase):
+    """ Identifier only subqueries """
+
+    def test_mapped_route_extracts_id_column(self):
+        extractor = mock.Mock()
+        extractor.identifiers.return_value = ['pbdb:occ:1']
+
+        with mock.patch.object(mapping, 'get', return_value=extractor), \
+                mock.patch.object(dispatch, 'fetch_json',
+                                  return_value=({'records': []}, 'url')):
+            ids = dispatch.fetch_ids({}, {}, 'pbdb', 'occ')
+
+        self.assertEqual(ids, (['pbdb:occ:1'], 'url'))
+        self.assertEqual(extractor.identifiers.call_args[0][1], 'occ_id')
+
+    def test_other_routes_decode_in_full(self):
+        records = [{'taxon_id': 'a'}, {'taxon_id': 'b'}, {'taxon_id': 'a'}]
+
+        with mock.patch.object(mapping, 'get', return_value=None), \
+                mock.patch.object(dispatch, 'fetch_decode',
+                                  return_value=(records, 'url')):
+            ids = dispatch.fetch_ids({}, {}, 'pbdb', 'tax')
+
+        self.assertEqual(ids, (['a', 'b'], 'url'))
+
+
+class TestFetchCount(unittest.TestCase):
+    """ Record counts from a database count query """
+
+    def count(self, **payload):
+        with mock.patch.object(mapping, 'get', return_value=None), \
+                mock.patch.object(subreq, 'count',
+                                  return_value=(50, 'count url')):
+            return dispatch.fetch_count(payload, {}, 'pbdb', 'occ')
+
+    def test_no_limit_counts_all(self):
+        self.assertEqual(self.count(), (50, 'count url'))
+
+    def test_limit_and_offset(self):
+        self.assertEqual(self.count(limit=20)[0], 20)
+        self.assertEqual(self.count(offset=40, limit=20)[0], 10)
+        self.assertEqual(self.count(offset=60)[0], 0)
+
+    def test_zero_limit_counts_none(self):
+        self.assertEqual(self.count(limit=0)[0], 0)
+        self.assertEqual(self.count(limit='0')[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+from swagger_server.elc import geog, pool
+
+
+ROTATED = {'features': [{'geometry': {'coordinates': [-80.12345, 30.56789]}}],
+           'properties': {'model': {'citation': 'Wright et al. 2013'}}}
+
+
+class Response(object):
+    """Stand-in for a requests response with a JSON body."""
+
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class TestResolveGeog(unittest.TestCase):
+    """ GPlates paleocoordinate lookups """
+
+    def resolve(self, body):
+        with mock.patch.object(pool, 'get', return_value=Response(body)):
+            return geog.resolve_geog(lat=45.0, lon=-100.0, mean_age=66)
+
+    def test_rotated(self):
+        self.assertEqual(self.resolve(ROTATED),
+                         ([-80.12345, 30.56789], 'Wright et al. 2013'))
+
+    def test_unavailable_point(self):
+        with self.assertRaises(ValueError) as caught:
+            self.resolve({'features': [{'geometry': None}]})
+
+        self.assertEqual(caught.exception.args[0], 400)
+
+    def test_malformed_bodies(self):
+        for body in [{}, [], 'text', {'features': []},
+                     {'features': [{'geometry': {'coordinates': [1.0]}}]},
+                     {'features': [{'geometry': {'coordinates': None}}],
+                      'properties': {}},
+                     {'features': [{'geometry': {'coordinates': [1, 2]}}],
+                      'properties': {'model': None}},
+                     ValueError('Expecting value')]:
+            with self.assertRaises(ValueError) as caught:
+                self.resolve(body)
+            self.assertEqual(caught.exception.args[0], 502)
+
+    def test_many_skips_malformed_points(self):
+        bodies = {1: ROTATED, 2: {'features': [{}]}}
+
+        def get(url, payload, db):
+            return Response(bodies[payload['age']])
+
+        with mock.patch.object(pool, 'get', get):
+            found = geog.resolve_geog_many({(45.0, -100.0, 1),
+                                            (45.0, -100.0, 2)})
+
+        self.assertEqual(found, {(45.0, -100.0, 1): (30.5679, -80.1235),
+                                 (45.0, -100.0, 2): None})
+
+
+if __name__ == '__main__':
+    unittest.main()
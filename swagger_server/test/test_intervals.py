@@ -0,0 +1,99 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from swagger_server.elc import intervals, pool
+
+
+INTERVALS = [{'nam': 'Holocene', 'eag': 0.0117, 'lag': 0.0,
+              'col': '#FEF2E0', 'rid': [6930]},
+             {'nam': 'Late  Pleistocene', 'eag': 0.126, 'lag': 0.0117,
+              'col': '#FFF2D3', 'rid': [6930]},
+             {'nam': 'Quaternary', 'eag': 2.588, 'lag': 0.0,
+              'col': '#F9F97F'}]
+REFS = [{'oid': 6930, 'ref': 'The Geologic Time Scale 2012'}]
+
+
+class Response(object):
+    """Stand-in for a requests response."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'records': self.records}
+
+
+class TestRefresh(unittest.TestCase):
+    """ Interval index rebuilt from PBDB """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.calls = list()
+
+        def get(url, payload, db):
+            self.calls.append((url.rsplit('/', 2)[-2], dict(payload)))
+            return Response(REFS if 'refs/' in url else INTERVALS)
+
+        for patch in [mock.patch.object(pool, 'get', get),
+                      mock.patch.object(intervals, '_index', None)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_numeric_reference_ids(self):
+        index = intervals.refresh()
+
+        self.assertEqual(self.calls[1][1]['id'], '6930')
+        self.assertEqual(index['late pleistocene'],
+                         {'eag': 0.126, 'lag': 0.0117, 'col': '#FFF2D3',
+                          'ref': 'The Geologic Time Scale 2012'})
+        self.assertIsNone(index['quaternary']['ref'])
+        self.assertEqual(intervals.lookup('HOLOCENE')['eag'], 0.0117)
+
+    def test_snapshot_written_and_loaded(self):
+        filename = os.path.join(self.folder, 'intervals.yaml')
+
+        index = intervals.refresh(filename=filename)
+
+        with open(filename) as f:
+            self.assertEqual(sorted(yaml.safe_load(f)), ['intervals',
+                                                         'references'])
+        self.assertEqual(intervals.load(filename), index)
+
+
+class TestGetIndex(unittest.TestCase):
+    """ Bundled snapshot loaded on first use """
+
+    def setUp(self):
+        patch = mock.patch.object(intervals, '_index', None)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_failed_load_not_retried(self):
+        with mock.patch.object(intervals, 'load',
+                               side_effect=OSError('missing')) as load:
+            self.assertIsNone(intervals.lookup('Holocene'))
+            self.assertIsNone(intervals.lookup('Holocene'))
+
+        self.assertEqual(load.call_count, 1)
+
+    def test_bundled_snapshot(self):
+        self.assertEqual(intervals.lookup('Phanerozoic')['eag'], 541.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
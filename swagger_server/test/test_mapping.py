@@ -0,0 +1,96 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+from swagger_server.handlers import mapping
+
+
+SPEC = {'records': 'data',
+        'explode': 'samples',
+        'fields': {
+            'occ_id': {'from': ['samples', 'id'], 'tag': 'neot:occ:'},
+            'taxon': {'first': [['samples', 'name'], 'taxon']},
+            'max_age': {'from': ['samples', 'older'], 'age': 2},
+            'status': {'from': 'ext', 'map': {'0': 'extinct',
+                                              '1': 'extant'}},
+            'source': {'from': 'ref', 'tag': 'neot:pub:',
+                       'default': 0},
+            'kind': {'from': 'kind', 'default': 'general'},
+            'lat': {'from': 'geom', 'point': 'lat'},
+            'lon': {'from': 'geom', 'point': 'lon'},
+            'license': {'value': 'CC BY'}}}
+
+RECORDS = [{'taxon': 'Canis', 'ext': 1, 'ref': 7,
+            'geom': '{"type": "Point", "coordinates": [-90.0, 40.0]}',
+            'samples': [{'id': 1, 'name': 'Canis dirus', 'older': 12000},
+                        {'id': 2, 'name': None, 'older': -5}]},
+           {'taxon': 'Bison', 'ext': '0', 'kind': 'pollen', 'geom': None,
+            'samples': []}]
+
+
+class TestExtractor(unittest.TestCase):
+    """ Compiled declarative field mappings """
+
+    def setUp(self):
+        self.extractor = mapping.Extractor('neotoma', SPEC)
+        self.options = {'ageunits': 'ka', 'geog': 'modern'}
+
+    def test_decode(self):
+        records = list(self.extractor.decode({'data': RECORDS},
+                                             self.options))
+
+        self.assertEqual(records, [
+            {'occ_id': 'neot:occ:1', 'taxon': 'Canis dirus',
+             'max_age': 12.0, 'status': 'extant', 'source': 'neot:pub:7',
+             'kind': 'general', 'lat': 40.0, 'lon': -90.0,
+             'license': 'CC BY'},
+            {'occ_id': 'neot:occ:2', 'taxon': 'Canis', 'max_age': None,
+             'status': 'extant', 'source': 'neot:pub:7', 'kind': 'general',
+             'lat': 40.0, 'lon': -90.0, 'license': 'CC BY'}])
+
+    def test_field_order(self):
+        self.assertEqual([name for name, make in self.extractor.fields],
+                         list(SPEC['fields']))
+
+    def test_identifiers(self):
+        self.assertEqual(self.extractor.identifiers({'data': RECORDS},
+                                                    'occ_id', self.options),
+                         ['neot:occ:1', 'neot:occ:2'])
+        self.assertEqual(self.extractor.identifiers({'data': RECORDS},
+                                                    'nothing', self.options),
+                         [None, None])
+
+    def test_batches_match_whole_decode(self):
+        records = [dict(RECORDS[0], ref=n) for n in range(7)]
+        whole = list(self.extractor.decode({'data': records}, self.options))
+        batched = list(self.extractor.decode_batches(records, self.options,
+                                                     batch=3))
+
+        self.assertEqual(batched, whole)
+
+    def test_field_without_source(self):
+        with self.assertRaises(ValueError):
+            mapping.compile_field('bad', {'tag': 'x'})
+
+
+class TestMappingFile(unittest.TestCase):
+    """ Shipped field mappings """
+
+    def test_all_routes_compile(self):
+        extractors = mapping.load()
+
+        for db in ['pbdb', 'neotoma']:
+            for endpoint in ['occ', 'loc', 'tax']:
+                self.assertIn((db, endpoint), extractors)
+
+    def test_routes_share_field_names(self):
+        for endpoint in ['occ', 'loc', 'tax']:
+            self.assertEqual(set(mapping.field_names('pbdb', endpoint)),
+                             set(mapping.field_names('neotoma', endpoint)))
+        self.assertIsNone(mapping.field_names('pbdb', 'nothing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from swagger_server.elc import names, taxonomy
+from . import override
+
+
+PBDB = [{'oid': 1, 'nam': 'Canis', 'rnk': 5},
+        {'oid': 2, 'nam': 'Canis lupus', 'rnk': 3},
+        {'oid': 3, 'nam': 'Canis lupus familiaris', 'rnk': 2},
+        {'oid': 4, 'nam': 'Canidae', 'rnk': 9},
+        {'oid': 5, 'nam': 'Canislupus', 'rnk': 3, 'acc': 2,
+         'acn': 'Canis lupus', 'tdf': 'subjective synonym of'},
+        {'oid': 6, 'nam': 'Thos', 'rnk': 5, 'acc': 1, 'acn': 'Canis',
+         'tdf': 'subjective synonym of'}]
+NEOTOMA = [{'taxonid': 10, 'taxonname': 'Canis'},
+           {'taxonid': 11, 'taxonname': 'Canis dirus'}]
+
+
+def index():
+    """Return the name index of the sample taxa lists."""
+    return names.Names(names.neotoma_entries(
+        names.pbdb_entries(dict(), PBDB), NEOTOMA))
+
+
+class TestSuggest(unittest.TestCase):
+    """ Ranked prefix suggestions """
+
+    def setUp(self):
+        self.index = index()
+
+    def suggest(self, prefix, limit=10, scan=100):
+        return [found['taxon']
+                for found in self.index.suggest(prefix, limit, scan)]
+
+    def test_exact_then_accepted_then_shorter(self):
+        # Names of the same length in name order
+        self.assertEqual(self.suggest('canis'),
+                         ['Canis', 'Canis dirus', 'Canis lupus',
+                          'Canis lupus familiaris', 'Canislupus'])
+
+    def test_case_space_and_limit(self):
+        self.assertEqual(self.suggest(' CANIS  L', limit=1),
+                         ['Canis lupus'])
+        self.assertEqual(self.suggest('can', limit=2), ['Canis', 'Canidae'])
+        self.assertEqual(self.suggest('felis'), [])
+
+    def test_scan_bounds_ranked_names(self):
+        # Only the first names of the prefix in name order are ranked
+        self.assertEqual(self.suggest('canis', scan=2),
+                         ['Canis', 'Canis dirus'])
+
+    def test_ids_of_both_databases(self):
+        found = self.index.suggest('canis', 1, 100)[0]
+
+        self.assertEqual(found['taxon_ids'], ['pbdb:1', 'neot:txn:10'])
+        self.assertEqual(found['rank'], 'genus')
+
+    def test_synonyms(self):
+        found = self.index.suggest('thos', 1, 100)[0]
+
+        self.assertEqual(found['accepted'], 'Canis')
+        self.assertEqual(self.index.accepted[self.index.find('canis')],
+                         'Canis')
+
+    def test_loading(self):
+        with mock.patch.object(names, 'start'), \
+                mock.patch.object(names, '_index', None):
+            with self.assertRaises(ValueError) as caught:
+                names.suggest('canis', 10)
+
+        self.assertEqual(caught.exception.args[0], 503)
+
+
+class TestSnapshot(unittest.TestCase):
+    """ Taxa lists shared by the workers through a file """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'names.json')
+        self.calls = list()
+
+        def fetch():
+            self.calls.append(1)
+            return PBDB
+
+        for patch in [mock.patch.object(names, 'fetch_pbdb', fetch),
+                      mock.patch.object(names, 'fetch_neotoma',
+                                        lambda: NEOTOMA),
+                      mock.patch.object(names, '_index', None),
+                      mock.patch.object(names, '_listed', dict()),
+                      override({('suggest', 'snapshot'): self.filename,
+                                ('suggest', 'refresh'): 60})]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.expected = index()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_written_once_then_read(self):
+        names.build()
+        index = names.build()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(index.names, names.build().names)
+        self.assertEqual(index.ids, names.build().ids)
+        self.assertEqual(index.names, self.expected.names)
+        self.assertEqual(index.ids, self.expected.ids)
+        self.assertEqual(index.accepted, self.expected.accepted)
+        self.assertEqual(os.listdir(self.folder), ['names.json'])
+
+    def test_stale_file_refreshed(self):
+        names.build()
+        os.utime(self.filename, (0, 0))
+
+        names.build()
+
+        self.assertEqual(len(self.calls), 2)
+
+    def test_other_worker_writing(self):
+        open(self.filename + '.lock', 'w').close()
+
+        with self.assertRaises(ValueError) as caught:
+            names.build()
+
+        self.assertEqual(caught.exception.args[0], 503)
+        self.assertEqual(self.calls, [])
+
+    def test_lock_of_dead_worker_expires(self):
+        open(self.filename + '.lock', 'w').close()
+        os.utime(self.filename + '.lock', (0, 0))
+
+        names.build()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertFalse(os.path.exists(self.filename + '.lock'))
+
+
+class TestBuild(unittest.TestCase):
+    """ Name index rebuilds """
+
+    def setUp(self):
+        self.fail = set()
+
+        def fetcher(db, records):
+            def fetch():
+                if db in self.fail:
+                    raise ValueError(502, 'taxa request failed')
+                return records
+            return fetch
+
+        for patch in [mock.patch.object(names, 'fetch_pbdb',
+                                        fetcher('pbdb', PBDB)),
+                      mock.patch.object(names, 'fetch_neotoma',
+                                        fetcher('neotoma', NEOTOMA)),
+                      mock.patch.object(names, '_index', None),
+                      mock.patch.object(names, '_listed',
+                                        {'pbdb': 0, 'neotoma': 0}),
+                      override({('suggest', 'snapshot'): None})]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def assertSameIndex(self, built, expected):
+        for field in ['names', 'ids', 'accepted', 'ranks']:
+            self.assertEqual(getattr(built, field), getattr(expected, field))
+
+    def test_counts_kept_not_records(self):
+        self.assertSameIndex(names.build(), index())
+        self.assertEqual(names._listed, {'pbdb': 6, 'neotoma': 2})
+
+    def test_unreachable_database_keeps_its_names(self):
+        names.build()
+
+        for db in ['neotoma', 'pbdb']:
+            self.fail = {db}
+            self.assertSameIndex(names.build(), index())
+            self.assertEqual(names._listed, {'pbdb': 6, 'neotoma': 2})
+
+    def test_first_build_without_a_database(self):
+        self.fail = {'neotoma'}
+
+        built = names.build()
+
+        self.assertIsNone(built.find('canis dirus'))
+        self.assertEqual(built.ids[built.find('canis')], ['pbdb:1'])
+
+
+class TestResolve(unittest.TestCase):
+    """ Bulk name resolution """
+
+    def setUp(self):
+        self.calls = list()
+        self.merged = list()
+
+        def fetch(taxon, rel):
+            self.calls.append(taxon)
+            if self.fail:
+                raise ValueError(502, 'PBDB taxonomy request failed')
+            return [{'oid': 30, 'nam': 'Vulpes', 'rnk': 5}]
+
+        self.fail = False
+        for patch in [mock.patch.object(names, 'start'),
+                      mock.patch.object(names, '_index', index()),
+                      mock.patch.object(names, '_listed',
+                                        {'pbdb': len(PBDB),
+                                         'neotoma': len(NEOTOMA)}),
+                      mock.patch.object(names, '_resolved', OrderedDict()),
+                      mock.patch.object(taxonomy, 'fetch', fetch),
+                      mock.patch.object(taxonomy, 'merge',
+                                        self.merged.append)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def resolve(self):
+        return names.resolve(['canis', 'Thos', 'felis catus', 'VULPES',
+                              'not a taxon name'])
+
+    def test_matches_synonyms_and_unresolved(self):
+        found, errors = self.resolve()
+
+        self.assertEqual(found['matches'], [
+            {'name': 'canis', 'taxon': 'Canis',
+             'taxon_ids': ['pbdb:1', 'neot:txn:10']},
+            {'name': 'VULPES', 'taxon': 'Vulpes', 'taxon_ids': ['pbdb:30']}])
+        self.assertEqual(found['synonyms'], [
+            {'name': 'Thos', 'taxon': 'Thos', 'taxon_ids': ['pbdb:6'],
+             'accepted': 'Canis'}])
+        self.assertEqual(found['unresolved'], ['felis catus',
+                                               'not a taxon name'])
+        self.assertEqual(errors, dict())
+
+    def test_only_unknown_names_sent_as_given(self):
+        self.resolve()
+
+        # Neotoma's whole list is in the index, so it is not asked
+        self.assertEqual(self.calls, ['Felis catus,Vulpes'])
+        self.assertEqual(len(self.merged), 1)
+
+    def test_answers_cached(self):
+        self.resolve()
+        found, errors = self.resolve()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(found['unresolved'], ['felis catus',
+                                               'not a taxon name'])
+
+    def test_database_errors(self):
+        self.fail = True
+
+        found, errors = self.resolve()
+
+        self.assertEqual(errors, {'pbdb': 'PBDB taxonomy request failed'})
+        self.assertIn('VULPES', found['unresolved'])
+        self.assertEqual(self.merged, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import unittest
+from unittest import mock
+
+from swagger_server.elc import dispatch, writer
+
+
+OPTIONS = {'show': 'all', 'ageunits': 'ma', 'geog': 'modern'}
+
+
+def lines(subs, options=OPTIONS, endpoint='occ'):
+    """Return the decoded lines of an NDJSON return."""
+    body = b''.join(writer.ndjson_pieces(subs, options, endpoint))
+    return [json.loads(line) for line in body.splitlines()]
+
+
+class TestNdjson(unittest.TestCase):
+    """ Newline delimited JSON returns """
+
+    def test_metadata_records_and_database_metadata(self):
+        results = [('pbdb', [{'occ_id': 'pbdb:occ:1'}],
+                    {'pbdb': {'record_count': 1}}),
+                   ('neotoma', ValueError(504, 'timed out'), None)]
+
+        out = lines(writer.dispatched_subs(results))
+
+        self.assertEqual(list(out[0]), ['metadata'])
+        self.assertEqual(out[1], {'occ_id': 'pbdb:occ:1'})
+        self.assertEqual(out[2], {'metadata': {'pbdb': {'record_count': 1}}})
+        self.assertEqual(out[3], {'metadata': {'neotoma': {
+            'record_count': 0, 'error': 'timed out'}}})
+        self.assertEqual(len(out), 4)
+
+    def test_poll_writes_no_records(self):
+        results = [('pbdb', [{'a': 1}, {'a': 2}], {'pbdb': {}})]
+
+        out = lines(writer.dispatched_subs(results),
+                    dict(OPTIONS, show='poll'))
+
+        self.assertEqual([list(line) for line in out],
+                         [['metadata'], ['metadata']])
+
+    def test_idx_writes_unique_ids(self):
+        records = [{'occ_id': 'pbdb:occ:1'}, 'pbdb:occ:2',
+                   {'occ_id': 'pbdb:occ:1'}]
+        results = [('pbdb', records, {'pbdb': {}})]
+
+        out = lines(writer.dispatched_subs(results),
+                    dict(OPTIONS, show='idx'))
+
+        self.assertEqual(out[1:3], ['pbdb:occ:1', 'pbdb:occ:2'])
+        self.assertEqual(len(out), 4)
+
+    def test_stream_error_in_database_metadata(self):
+        def failing():
+            yield {'a': 1}
+            raise ValueError(502, 'interrupted')
+
+        seen = list()
+
+        def describe(rec_count, error):
+            seen.append((rec_count, error))
+            return {'pbdb': {'record_count': rec_count, 'error': error}}
+
+        out = lines([('pbdb', failing(), describe)])
+
+        self.assertEqual(seen, [(1, 'interrupted')])
+        self.assertEqual(out[-1]['metadata']['pbdb']['error'], 'interrupted')
+
+    def test_decode_error_in_database_metadata(self):
+        def failing():
+            yield {'a': 1}
+            raise TypeError("'NoneType' object is not subscriptable")
+
+        def describe(rec_count, error):
+            return {'pbdb': {'record_count': rec_count, 'error': error}}
+
+        out = lines([('pbdb', failing(), describe)])
+
+        self.assertEqual(out[-1]['metadata']['pbdb'], {
+            'record_count': 1,
+            'error': "Subquery failed: TypeError: 'NoneType' object is not "
+                     "subscriptable"})
+
+
+class TestEach(unittest.TestCase):
+    """ Concurrent subqueries yielded one database at a time """
+
+    def test_run_list_order_errors_and_skips(self):
+        from time import sleep
+
+        def subquery(req_args, options, db, endpoint):
+            if db == 'pbdb':
+                sleep(0.05)
+                return [1], {'pbdb': {}}
+            if db == 'neotoma':
+                raise ValueError(502, 'down')
+            return None
+
+        with mock.patch.object(dispatch, 'subquery', subquery):
+            results = list(dispatch.each({}, {}, ['pbdb', 'neotoma',
+                                                  'other'], 'occ'))
+
+        self.assertEqual([db for db, records, meta in results],
+                         ['pbdb', 'neotoma'])
+        self.assertEqual(results[0][1], [1])
+        self.assertIsInstance(results[1][1], ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from swagger_server.elc import serial
+from . import override
+
+
+class TestSerial(unittest.TestCase):
+    """ Compact JSON serialisation """
+
+    def test_dumps_is_compact_utf8(self):
+        self.assertEqual(serial.dumps({'taxon': 'Müller', 'n': [1, 2]}),
+                         '{"taxon":"Müller","n":[1,2]}'.encode('utf-8'))
+
+    def test_dumps_extra_types(self):
+        obj = {'day': date(2020, 1, 2), 'x': Decimal('1.5'),
+               't': (1, 2), 's': frozenset([3])}
+
+        self.assertEqual(json.loads(serial.dumps(obj)),
+                         {'day': '2020-01-02', 'x': 1.5, 't': [1, 2],
+                          's': [3]})
+
+    def test_dumps_unknown_type(self):
+        with self.assertRaises(TypeError):
+            serial.dumps({'x': object()})
+
+    def test_chunks_match_dumps(self):
+        obj = {'metadata': {'a': 1}, 'records': list(range(11)),
+               'empty': [], 'small': [1]}
+
+        for batch in [1, 3, 100]:
+            body = b''.join(serial.chunks(obj, batch))
+            self.assertEqual(json.loads(body), obj)
+
+        self.assertEqual(b''.join(serial.chunks({}, 2)), b'{}')
+        self.assertEqual(json.loads(b''.join(serial.chunks(list(range(5)),
+                                                           2))),
+                         list(range(5)))
+
+    def test_jsonify_chunks_large_lists(self):
+        from flask import Flask
+
+        with Flask(__name__).app_context():
+            with override({('stream', 'chunk_records'): 2}):
+                small = serial.jsonify(records=[1])
+                large = serial.jsonify(records=[1, 2, 3])
+
+                self.assertFalse(small.is_streamed)
+                self.assertTrue(large.is_streamed)
+                self.assertEqual(json.loads(b''.join(large.response)),
+                                 {'records': [1, 2, 3]})
+
+
+if __name__ == '__main__':
+    unittest.main()
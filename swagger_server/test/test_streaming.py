@@ -0,0 +1,129 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import os
+import unittest
+
+from swagger_server.bench import payloads, upstream
+from swagger_server.bench.__main__ import bench_config, build_app
+from swagger_server.elc import columnar, config
+
+
+class TestStreamingInterrupted(unittest.TestCase):
+    """ Streamed returns when the upstream connection drops mid-body """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = upstream.Upstream(payloads.Store(size=300),
+                                       cut=0.5).start()
+        cls.config_file = bench_config(cls.server, cache_on=False)
+        config.reload(cls.config_file)
+        cls.client = build_app().test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        os.remove(cls.config_file)
+        config.reload()
+
+    def get(self, query):
+        resp = self.client.get('/api_v1/occ?taxon=Canis&limit=10000' + query)
+        self.assertEqual(resp.status_code, 200)
+        return resp
+
+    def test_json(self):
+        body = json.loads(self.get('').get_data())
+
+        for db in ['pbdb', 'neotoma']:
+            self.assertIn('interrupted', body['metadata'][db]['error'])
+            self.assertLess(body['metadata'][db]['record_count'], 300)
+
+    def test_ndjson(self):
+        lines = self.get('&output=ndjson').get_data().splitlines()
+        meta = [json.loads(line)['metadata'] for line in lines
+                if line.startswith(b'{"metadata"')]
+
+        self.assertEqual(len(meta), 3)
+        for db_meta in meta[1:]:
+            self.assertIn('interrupted', list(db_meta.values())[0]['error'])
+
+    def test_csv(self):
+        lines = self.get('&output=csv').get_data().decode().splitlines()
+
+        self.assertEqual(lines[0].split(',')[0], 'occ_id')
+        self.assertEqual(sorted(line.split(':')[1].strip()
+                                for line in lines[-2:]),
+                         ['neotoma', 'pbdb'])
+        for line in lines[-2:]:
+            self.assertTrue(line.startswith('# error: '))
+            self.assertIn('interrupted', line)
+
+    @unittest.skipUnless(columnar.available(), 'pyarrow not installed')
+    def test_parquet(self):
+        import io
+        import pyarrow.parquet
+
+        data = self.get('&output=parquet').get_data()
+        meta = pyarrow.parquet.read_metadata(io.BytesIO(data)).metadata
+
+        self.assertEqual(sorted(json.loads(meta[b'errors'])),
+                         ['neotoma', 'pbdb'])
+
+    @unittest.skipUnless(columnar.available(), 'pyarrow not installed')
+    def test_arrow(self):
+        import pyarrow
+
+        data = self.get('&output=arrow').get_data()
+        reader = pyarrow.ipc.open_stream(data)
+        last = None
+        while True:
+            try:
+                last = reader.read_next_batch_with_custom_metadata()
+            except StopIteration:
+                break
+
+        self.assertEqual(sorted(json.loads(last.custom_metadata[b'errors'])),
+                         ['neotoma', 'pbdb'])
+
+
+class TestStreamingPaged(unittest.TestCase):
+    """ Large streamed returns are fetched as pages """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = upstream.Upstream(payloads.Store(size=25000)).start()
+        cls.config_file = bench_config(cls.server, cache_on=False)
+        config.reload(cls.config_file)
+        cls.client = build_app().test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        os.remove(cls.config_file)
+        config.reload()
+
+    def test_default_limit_json(self):
+        resp = self.client.get('/api_v1/occ?taxon=Canis&show=all')
+        self.assertEqual(resp.status_code, 200)
+        body = json.loads(resp.get_data())
+
+        for db in ['pbdb', 'neotoma']:
+            self.assertEqual(body['metadata'][db]['record_count'], 25000)
+            self.assertNotIn('error', body['metadata'][db])
+
+        # Records arrive in upstream order across the pages
+        ids = [rec['occ_id'] for rec in body['records']
+               if rec['occ_id'].startswith('pbdb')]
+        self.assertEqual(ids, ['pbdb:occ:{0:d}'.format(n)
+                               for n in range(1, 25001)])
+
+        # A record count pre-flight and pages for PBDB; Neotoma pages
+        # (fetched a few ahead) until a short one
+        self.assertGreater(self.server.hits['pbdb/occs/list.json'], 3)
+        self.assertGreaterEqual(self.server.hits['neotoma/occurrence'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
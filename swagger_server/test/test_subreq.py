@@ -0,0 +1,291 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import threading
+import unittest
+from unittest import mock
+
+from swagger_server.elc import subreq
+from . import override
+
+
+def split(data, size):
+    """Return bytes cut into chunks of a fixed size."""
+    return [data[n:n + size] for n in range(0, len(data), size)]
+
+
+class TestIterRecords(unittest.TestCase):
+    """ Incremental decoding of streamed upstream records """
+
+    def decode(self, body, size, key='records'):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        return list(subreq.iter_records(split(data, size), key, 'pbdb'))
+
+    def test_records_split_across_chunks(self):
+        records = [{'oid': n, 'nam': 'Canis sp{0:d}'.format(n),
+                    'lat': n / 7.0} for n in range(50)]
+        body = {'elapsed_time': 0.1, 'records': records}
+
+        for size in [1, 2, 3, 7, 64, 4096]:
+            self.assertEqual(self.decode(body, size), records)
+
+    def test_strings_with_brackets_and_escapes(self):
+        records = [{'nam': 'a ] b [ c', 'ref': '{"x": [1, 2]}'},
+                   {'nam': 'quote \\" and ] end', 'ref': '}'},
+                   {'nam': 'Müller ], [ß', 'ref': None}]
+        body = {'warnings': ['[', ']'], 'records': records, 'tail': '['}
+
+        for size in [1, 3, 5, 1024]:
+            self.assertEqual(self.decode(body, size), records)
+
+    def test_numbers_at_chunk_boundary(self):
+        records = [12345678, 0.5, -1e10, 7]
+
+        self.assertEqual(self.decode({'records': records}, 2), records)
+
+    def test_other_members_and_empty_arrays(self):
+        body = {'status': 'success', 'meta': {'records': 1}, 'data': []}
+
+        self.assertEqual(self.decode(body, 4, key='data'), [])
+        self.assertEqual(self.decode({}, 4), [])
+        self.assertEqual(self.decode({'other': [1]}, 4), [])
+
+    def test_truncated_body(self):
+        data = json.dumps({'records': [{'a': 1}, {'b': 2}]}).encode()
+
+        with self.assertRaises(ValueError) as err:
+            list(subreq.iter_records(split(data[:-8], 4), 'records',
+                                     'pbdb'))
+
+        self.assertEqual(err.exception.args[0], 500)
+
+
+class TestBodyChunks(unittest.TestCase):
+    """ Upstream read failures while streaming a body """
+
+    def chunks_of(self, error):
+        class Response(object):
+            def iter_content(self, size):
+                yield b'{"records":['
+                raise error
+
+        return subreq.body_chunks(Response(), 'pbdb', 16)
+
+    def test_dropped_connection(self):
+        import requests
+
+        chunks = self.chunks_of(requests.exceptions.ChunkedEncodingError(
+            'Connection broken'))
+
+        self.assertEqual(next(chunks), b'{"records":[')
+        with self.assertRaises(ValueError) as err:
+            next(chunks)
+        self.assertEqual(err.exception.args[0], 502)
+
+    def test_read_timeout(self):
+        import requests
+
+        chunks = self.chunks_of(requests.exceptions.ReadTimeout('slow'))
+
+        with self.assertRaises(ValueError) as err:
+            list(chunks)
+        self.assertEqual(err.exception.args[0], 504)
+
+
+class Pages(object):
+    """Stand-in for subreq.trigger serving slices of a record list."""
+
+    def __init__(self, records, key='records', fail=None):
+        self.records = records
+        self.key = key
+        self.fail = dict(fail or {})
+        self.calls = list()
+        self.lock = threading.Lock()
+
+    def __call__(self, url_path, payload, db, fresh=False):
+        from time import sleep
+
+        with self.lock:
+            self.calls.append(dict(payload))
+            offset = int(payload.get('offset') or 0)
+            if self.fail.get(offset):
+                self.fail[offset] -= 1
+                raise ValueError(502, 'page failed')
+
+        if payload.get('rowcount'):
+            return {'records_found': len(self.records)}, 'count'
+
+        limit = int(payload.get('limit') or len(self.records))
+        # Later pages finish first
+        sleep(0.001 * max(5 - offset // 10, 0))
+
+        return ({self.key: self.records[offset:offset + limit]},
+                'url?offset={0:d}'.format(offset))
+
+
+class TestPaginate(unittest.TestCase):
+    """ Concurrent limit/offset paging of large subqueries """
+
+    def setUp(self):
+        self.settings = override({('paging', 'max_page'): 10,
+                                  ('paging', 'min_page'): 5,
+                                  ('paging', 'retries'): 1,
+                                  ('paging_workers', 'pbdb'): 3,
+                                  ('paging_workers', 'neotoma'): 2})
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+
+    def paginate(self, pages, payload, db='pbdb'):
+        with mock.patch.object(subreq, 'trigger', pages):
+            return subreq.paginate('url', payload, db)
+
+    def test_pages_merged_in_offset_order(self):
+        pages = Pages(list(range(95)))
+
+        resp_json, api_call = self.paginate(pages, {'limit': 200,
+                                                    'offset': 3})
+
+        self.assertEqual(resp_json['records'], list(range(3, 95)))
+        self.assertEqual(api_call, 'url?offset=3')
+
+        offsets = [call['offset'] for call in pages.calls
+                   if 'rowcount' not in call]
+        self.assertEqual(len(offsets), len(set(offsets)))
+
+    def test_limit_cuts_last_page(self):
+        pages = Pages(list(range(95)))
+
+        resp_json, api_call = self.paginate(pages, {'limit': 42})
+
+        self.assertEqual(resp_json['records'], list(range(42)))
+
+    def test_small_subquery_is_one_request(self):
+        pages = Pages(list(range(95)))
+
+        resp_json, api_call = self.paginate(pages, {'limit': 8})
+
+        self.assertEqual(resp_json['records'], list(range(8)))
+        self.assertEqual(len(pages.calls), 1)
+
+    def test_waves_without_count_stop_at_short_page(self):
+        pages = Pages(list(range(23)), key='data')
+
+        resp_json, api_call = self.paginate(pages, {'limit': 1000},
+                                            db='neotoma')
+
+        self.assertEqual(resp_json['data'], list(range(23)))
+        self.assertLess(len(pages.calls), 1000 // 10)
+
+    def test_failed_page_is_retried(self):
+        pages = Pages(list(range(95)), fail={20: 1})
+
+        resp_json, api_call = self.paginate(pages, {'limit': 200})
+
+        self.assertEqual(resp_json['records'], list(range(95)))
+
+    def test_page_error_after_retries(self):
+        pages = Pages(list(range(95)), fail={20: 2})
+
+        with self.assertRaises(ValueError) as err:
+            self.paginate(pages, {'limit': 200})
+
+        self.assertEqual(err.exception.args[0], 502)
+
+    def stream(self, pages, payload, db='pbdb'):
+        with mock.patch.object(subreq, 'trigger', pages):
+            records, api_call, close = subreq.stream('url', payload, db,
+                                                     key=pages.key)
+            return list(records), api_call
+
+    def test_stream_pages_in_offset_order(self):
+        pages = Pages(list(range(95)))
+
+        records, api_call = self.stream(pages, {'limit': 200, 'offset': 3})
+
+        self.assertEqual(records, list(range(3, 95)))
+        self.assertEqual(api_call, 'url?offset=3')
+
+    def test_stream_without_count_stops_at_short_page(self):
+        pages = Pages(list(range(23)), key='data')
+
+        records, api_call = self.stream(pages, {'limit': 1000},
+                                        db='neotoma')
+
+        self.assertEqual(records, list(range(23)))
+        self.assertLess(len(pages.calls), 1000 // 10)
+
+    def test_stream_first_page_error_is_raised_at_once(self):
+        pages = Pages(list(range(95)), fail={3: 2})
+
+        with mock.patch.object(subreq, 'trigger', pages):
+            with self.assertRaises(ValueError) as err:
+                subreq.stream('url', {'limit': 200, 'offset': 3}, 'pbdb',
+                              key='records')
+
+        self.assertEqual(err.exception.args[0], 502)
+
+
+class TestBatched(unittest.TestCase):
+    """ Long taxon name lists fetched as concurrent batches """
+
+    def setUp(self):
+        self.settings = override({('taxonomy', 'batch'): 3,
+                                  ('paging_workers', 'neotoma'): 2})
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+
+    def batched(self, payload):
+        from time import sleep
+
+        calls = list()
+
+        def trigger(url_path, load, db, fresh=False):
+            calls.append(load)
+            names = load['taxonname'].split(',')
+            # Later batches finish first
+            sleep(0.01 * (5 - len(calls)))
+            return {'data': [{'taxonname': name} for name in names]}, \
+                'url?taxonname={0:s}'.format(load['taxonname'])
+
+        with mock.patch.object(subreq, 'trigger', trigger):
+            resp_json, api_call = subreq.batched('url', payload, 'neotoma',
+                                                 'taxonname')
+
+        return [rec['taxonname'] for rec in resp_json['data']], calls
+
+    def test_batches_joined_in_name_order(self):
+        names, calls = self.batched({'taxonname': 'a,b,c,d,e,f,g'})
+
+        self.assertEqual(names, list('abcdefg'))
+        self.assertEqual(sorted(len(call['taxonname'].split(','))
+                                for call in calls), [1, 3, 3])
+
+    def test_repeated_names_sent_once(self):
+        names, calls = self.batched({'taxonname': 'a,b,a,c,b,d'})
+
+        self.assertEqual(names, list('abcd'))
+        self.assertEqual(len(calls), 2)
+
+    def test_offset_and_limit_of_joined_records(self):
+        names, calls = self.batched({'taxonname': 'a,b,c,d,e,f,g',
+                                     'offset': 2, 'limit': 3})
+
+        self.assertEqual(names, list('cde'))
+        self.assertTrue(all(call['limit'] == 5 and 'offset' not in call
+                            for call in calls))
+
+    def test_short_list_is_one_request(self):
+        names, calls = self.batched({'taxonname': 'a,b'})
+
+        self.assertEqual(names, ['a', 'b'])
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+from swagger_server.elc import aux, taxa, taxonomy
+from . import override
+
+
+class TestSetTaxon(unittest.TestCase):
+    """ Taxon parameters of each database """
+
+    def set_taxon(self, taxon, subtaxa):
+        options = dict(tot_rec_count=0)
+        with mock.patch.object(taxonomy, 'subtaxa', subtaxa), \
+                override({('taxonomy', 'max_expand'): 3}):
+            payload = taxa.set_taxon(taxon, True, 'neotoma', options)
+
+        return payload, options
+
+    def test_pbdb(self):
+        self.assertEqual(taxa.set_taxon('canis', True, 'pbdb'),
+                         {'base_name': 'Canis'})
+        self.assertEqual(taxa.set_taxon('canis lupus', True, 'pbdb'),
+                         {'taxon_name': 'Canis lupus'})
+
+    def test_neotoma_expanded(self):
+        payload, options = self.set_taxon(
+            'canis', lambda taxon, inc_syn, limit: ['Canis', 'Canis lupus'])
+
+        self.assertEqual(payload, {'taxonname': 'Canis,Canis lupus'})
+        self.assertNotIn('notice', options)
+
+    def test_neotoma_over_limit(self):
+        def subtaxa(taxon, inc_syn, limit):
+            self.assertEqual(limit, 3)
+            raise taxonomy.too_many(taxon, limit)
+
+        payload, options = self.set_taxon('canidae', subtaxa)
+        meta = aux.build_meta_sub('url', 0, 'neotoma', options, count=0)
+
+        self.assertEqual(payload, {'taxonname': 'Canidae', 'lower': 'true'})
+        self.assertIn('lower=true', meta['neotoma']['notice'])
+
+    def test_neotoma_unknown(self):
+        def subtaxa(taxon, inc_syn, limit):
+            raise ValueError(502, 'PBDB taxonomy request failed')
+
+        payload, options = self.set_taxon('canidae', subtaxa)
+
+        self.assertEqual(payload, {'taxonname': 'Canidae', 'lower': 'true'})
+        self.assertNotIn('notice', options)
+
+    def test_binomial_not_expanded(self):
+        payload, options = self.set_taxon('canis lupus', None)
+
+        self.assertEqual(payload, {'taxonname': 'Canis lupus'})
+
+
+class TestHierarchy(unittest.TestCase):
+    """ Parent groups of taxonomy records """
+
+    def test_records_by_rank(self):
+        chains = {'Canis': [('kingdom', 'Animalia'), ('class', 'Mammalia'),
+                            ('subclass', 'Theria'), ('genus', 'Canis')]}
+        records = [{'taxon': 'Canis'}, {'taxon': 'Nomen nudum'}, {}]
+
+        with mock.patch.object(taxonomy, 'parents_many',
+                               lambda names: chains):
+            taxa.set_hierarchy(records)
+
+        self.assertEqual(list(records[0]['hierarchy'].items()),
+                         [('kingdom', 'Animalia'), ('class', 'Mammalia'),
+                          ('genus', 'Canis')])
+        self.assertEqual(records[1]['hierarchy'], {})
+        self.assertEqual(records[2]['hierarchy'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+from swagger_server.elc import taxonomy
+
+
+def rec(oid, name, par, rank=5, acc=None, acn=None):
+    """Return a PBDB taxa/list record (compact vocabulary)."""
+    found = {'oid': oid, 'nam': name, 'par': par, 'rnk': rank}
+    if acc:
+        found.update(acc=acc, acn=acn, tdf='subjective synonym of')
+    return found
+
+
+# Canidae > (Vulpes > Vulpes vulpes, Canis > Canis lupus, Thos (= Canis))
+CANIDAE = [rec(10, 'Canidae', 1, 9),
+           rec(20, 'Canis', 10),
+           rec(21, 'Canis lupus', 20, 3),
+           rec(22, 'Thos', 10, 5, 20, 'Canis'),
+           rec(30, 'Vulpes', 10),
+           rec(31, 'Vulpes vulpes', 30, 3)]
+
+
+class TaxonomyCase(unittest.TestCase):
+
+    def setUp(self):
+        patches = [mock.patch.object(taxonomy, '_index', None),
+                   mock.patch.object(taxonomy, '_nodes', dict()),
+                   mock.patch.object(taxonomy, '_clades', dict()),
+                   mock.patch.object(taxonomy, '_capped', dict()),
+                   mock.patch.object(taxonomy, '_chains', OrderedDict()),
+                   mock.patch.object(taxonomy, '_expanded', dict())]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class TestIndex(TaxonomyCase):
+    """ Preorder arrays with nested-set intervals """
+
+    def setUp(self):
+        super(TestIndex, self).setUp()
+        self.index = taxonomy.merge(CANIDAE, clade='Canidae')
+
+    def position(self, name):
+        return self.index.named[taxonomy.normalize(name)]
+
+    def test_preorder_in_name_order(self):
+        self.assertEqual(self.index.names,
+                         ['Canidae', 'Canis', 'Canis lupus', 'Thos',
+                          'Vulpes', 'Vulpes vulpes'])
+        self.assertEqual(list(self.index.last), [5, 2, 2, 3, 5, 5])
+
+    def test_lower_and_within(self):
+        i = self.position('Canis')
+
+        self.assertEqual(self.index.lower(i), ['Canis', 'Canis lupus'])
+        self.assertTrue(self.index.within(self.position('Canis lupus'), i))
+        self.assertFalse(self.index.within(self.position('Vulpes'), i))
+        self.assertEqual(self.index.lower(0, inc_syn=False)[3], 'Canis')
+
+    def test_upper_and_children(self):
+        i = self.position('Vulpes vulpes')
+
+        self.assertEqual([self.index.names[x] for x in self.index.upper(i)],
+                         ['Canidae', 'Vulpes'])
+        self.assertEqual(self.index.children(0), [1, 3, 4])
+        self.assertEqual(self.index.children(-1), [0])
+
+    def test_synonyms_point_at_accepted(self):
+        i = self.position('Thos')
+
+        self.assertEqual(self.index.senior[i], self.position('Canis'))
+        self.assertEqual(self.index.accepted[i], 'Canis')
+        self.assertEqual(self.index.ranks[0], 'family')
+
+
+class TestMerge(TaxonomyCase):
+    """ Merging fetched taxa into the index """
+
+    def test_unchanged_records_keep_the_index(self):
+        index = taxonomy.merge(CANIDAE, clade='Canidae')
+        taxonomy._expanded['kept'] = None
+
+        self.assertIs(taxonomy.merge(CANIDAE[1:3]), index)
+        self.assertIn('kept', taxonomy._expanded)
+
+    def test_clade_replaced(self):
+        taxonomy.merge(CANIDAE, clade='Canidae')
+        taxonomy._expanded['stale'] = None
+        fresh = [r for r in CANIDAE if r['oid'] != 21] + \
+            [rec(23, 'Canis dirus', 20, 3)]
+
+        index = taxonomy.merge(fresh, clade='Canidae')
+
+        self.assertEqual(index.lower(index.named['canis']),
+                         ['Canis', 'Canis dirus'])
+        self.assertIsNone(index.find(21))
+        self.assertNotIn(21, taxonomy._nodes)
+        self.assertEqual(taxonomy._expanded, dict())
+
+    def test_parents_adopt_clade(self):
+        taxonomy.merge(CANIDAE, clade='Canidae')
+        chain = [rec(1, 'Carnivora', 0, 13), rec(2, 'Felidae', 1, 9)]
+
+        index = taxonomy.merge(chain)
+
+        self.assertEqual(index.names[:2], ['Carnivora', 'Canidae'])
+        self.assertEqual(index.children(-1), [0])
+        self.assertEqual(index.last[0], 7)
+
+    def test_splice_matches_full_build(self):
+        taxonomy.merge(CANIDAE, clade='Canidae')
+        taxonomy.merge([rec(1, 'Carnivora', 0, 13), rec(40, 'Felis', 2),
+                        rec(2, 'Felidae', 1, 9)])
+        index = taxonomy.merge([rec(30, 'Alopex', 10), rec(41, 'Felis catus',
+                                                           40, 3)])
+        whole = taxonomy.Index(taxonomy._nodes)
+
+        for name in ['ids', 'names', 'accepted', 'ranks', 'named',
+                     'position']:
+            self.assertEqual(getattr(index, name), getattr(whole, name))
+        for name in ['parent', 'last', 'senior']:
+            self.assertEqual(list(getattr(index, name)),
+                             list(getattr(whole, name)))
+
+
+class TestChains(TaxonomyCase):
+    """ Cached parent chains """
+
+    def test_least_recently_used_dropped(self):
+        from swagger_server.test import override
+
+        with override({('taxonomy', 'chains'): 2}):
+            taxonomy.remember('a', [1])
+            taxonomy.remember('b', [2])
+            self.assertEqual(taxonomy.recall('a'), [1])
+            taxonomy.remember('c', [3])
+
+        self.assertIsNone(taxonomy.recall('b'))
+        self.assertEqual(taxonomy.recall('a'), [1])
+        self.assertEqual(taxonomy.recall('c'), [3])
+
+
+class TestSubtaxa(TaxonomyCase):
+    """ Lower taxa of a clade """
+
+    def fetch(self, records):
+        calls = list()
+
+        def fetch(taxon, rel, limit=None):
+            calls.append(limit)
+            return records[:limit]
+
+        patch = mock.patch.object(taxonomy, 'fetch', fetch)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        return calls
+
+    def test_fetched_once(self):
+        calls = self.fetch(CANIDAE)
+
+        self.assertEqual(taxonomy.subtaxa('Canidae'), [
+            'Canidae', 'Canis', 'Canis lupus', 'Thos', 'Vulpes',
+            'Vulpes vulpes'])
+        self.assertEqual(taxonomy.subtaxa('canis', inc_syn=False),
+                         ['Canis', 'Canis lupus'])
+        self.assertEqual(calls, [None])
+
+    def test_limit_of_fetched_clade(self):
+        calls = self.fetch(CANIDAE)
+
+        for n in range(2):
+            with self.assertRaises(ValueError) as caught:
+                taxonomy.subtaxa('Canidae', limit=4)
+            self.assertEqual(caught.exception.args[0], 413)
+
+        # Only limit + 1 taxa are fetched, and only once
+        self.assertEqual(calls, [5])
+        self.assertIsNone(taxonomy._index)
+        self.assertEqual(len(taxonomy.subtaxa('Canidae', limit=6)), 6)
+
+    def test_limit_of_local_clade(self):
+        self.fetch(CANIDAE)
+        taxonomy.subtaxa('Canidae')
+
+        self.assertEqual(len(taxonomy.subtaxa('Vulpes', limit=2)), 2)
+        with self.assertRaises(ValueError):
+            taxonomy.subtaxa('Canidae', limit=5)
+
+
+# Parent chains top down: Animalia > Chordata > Mammalia > Carnivora
+UPPER = [rec(1, 'Animalia', 0, 23), rec(2, 'Chordata', 1, 20),
+         rec(3, 'Mammalia', 2, 17), rec(4, 'Carnivora', 3, 13)]
+CHAINS = {'Canidae': UPPER + [rec(10, 'Canidae', 4, 9)],
+          'Canis lupus': UPPER + [rec(10, 'Canidae', 4, 9),
+                                  rec(20, 'Canis', 10),
+                                  rec(21, 'Canis lupus', 20, 3)],
+          'Felis': UPPER + [rec(40, 'Felidae', 4, 9), rec(41, 'Felis', 40)],
+          'Ursus': UPPER + [rec(50, 'Ursidae', 4, 9), rec(51, 'Ursus', 50)]}
+
+
+class TestParents(TaxonomyCase):
+    """ Batched parent lookups """
+
+    def setUp(self):
+        super(TestParents, self).setUp()
+        self.calls = list()
+
+        def fetch(taxon, rel, limit=None):
+            self.calls.append((taxon, rel))
+            found = dict()
+            for name in taxon.split(','):
+                for r in CHAINS.get(name, []):
+                    found[r['oid']] = r
+            return list(found.values())
+
+        from swagger_server.test import override
+
+        for patch in [mock.patch.object(taxonomy, 'fetch', fetch),
+                      override({('taxonomy', 'batch'): 2})]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_batches_of_names(self):
+        chains = taxonomy.parents_many(['Felis', 'Canis lupus', 'Ursus',
+                                        'Felis', 'Nomen nudum'])
+
+        self.assertEqual(sorted(len(names.split(','))
+                                for names, rel in self.calls), [2, 2])
+        self.assertEqual(chains['Felis'][-2:], [('family', 'Felidae'),
+                                                ('genus', 'Felis')])
+        self.assertEqual(chains['Canis lupus'][0], ('kingdom', 'Animalia'))
+        self.assertEqual(chains['Nomen nudum'], [])
+
+    def test_chains_cached(self):
+        taxonomy.parents_many(['Felis', 'Nomen nudum'])
+        self.calls.clear()
+
+        chains = taxonomy.parents_many(['Felis', 'Nomen nudum'])
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(len(chains['Felis']), 6)
+        self.assertEqual(chains['Nomen nudum'], [])
+
+    def test_chain_below_clade_root(self):
+        # The parents of a fetched clade's root cover all its lower taxa
+        taxonomy.merge(CANIDAE, clade='Canidae')
+        taxonomy.parents('Canidae')
+        self.calls.clear()
+
+        chain = taxonomy.parents('Canis lupus')
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual([name for rank, name in chain],
+                         ['Animalia', 'Chordata', 'Mammalia', 'Carnivora',
+                          'Canidae', 'Canis', 'Canis lupus'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import csv
+import io
+import unittest
+
+from swagger_server.elc import aux, writer
+
+
+class TestCsv(unittest.TestCase):
+    """ Streamed CSV returns """
+
+    def test_csv_pieces(self):
+        records = ({'occ_id': 'pbdb:occ:{0:d}'.format(n),
+                    'taxon': 'Canis, "dirus"', 'extra': 1}
+                   for n in range(20))
+
+        pieces = list(writer.csv_pieces(records, ['occ_id', 'taxon', 'lat'],
+                                        64))
+        rows = list(csv.reader(io.StringIO(b''.join(pieces).decode())))
+
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(rows[0], ['occ_id', 'taxon', 'lat'])
+        self.assertEqual(rows[1], ['pbdb:occ:0', 'Canis, "dirus"', ''])
+        self.assertEqual(len(rows), 21)
+
+    def test_csv_without_records(self):
+        body = b''.join(writer.csv_pieces([], ['a', 'b'], 64))
+
+        self.assertEqual(body, b'a,b\r\n')
+
+    def test_opened_records_collect_errors(self):
+        def failing():
+            yield {'a': 1}
+            raise ValueError(502, 'pbdb response interrupted')
+
+        closed = list()
+        opened = [{'db': 'pbdb', 'records': failing(),
+                   'close': lambda: closed.append('pbdb')},
+                  {'db': 'neotoma', 'records': iter([{'a': 2}]),
+                   'close': lambda: closed.append('neotoma')}]
+        errors = list()
+
+        body = b''.join(writer.csv_pieces(writer.opened_records(opened,
+                                                                errors),
+                                          ['a'], 64, errors))
+
+        self.assertEqual(body.decode().splitlines(),
+                         ['a', '1', '2',
+                          '# error: pbdb: pbdb response interrupted'])
+        self.assertEqual(closed, ['pbdb', 'neotoma'])
+
+    def test_opened_records_report_any_error(self):
+        import requests
+
+        def failing(err):
+            yield {'a': 1}
+            raise err
+
+        opened = [{'db': 'pbdb', 'close': lambda: None,
+                   'records': failing(KeyError('nam'))},
+                  {'db': 'neotoma', 'close': lambda: None,
+                   'records': failing(requests.exceptions.ChunkedEncodingError(
+                       'Connection broken'))}]
+        errors = list()
+
+        body = b''.join(writer.csv_pieces(writer.opened_records(opened,
+                                                                errors),
+                                          ['a'], 64, errors))
+
+        self.assertEqual(body.decode().splitlines(), [
+            'a', '1', '1',
+            "# error: pbdb: Subquery failed: KeyError: 'nam'",
+            '# error: neotoma: Subquery failed: ChunkedEncodingError: '
+            'Connection broken'])
+
+    def test_json_pieces_report_any_error(self):
+        import json
+        from time import time
+
+        def failing():
+            yield {'a': 1}
+            yield {'a': object()}
+
+        opened = [{'db': 'pbdb', 'records': failing(), 'close': lambda: None,
+                   'source': 'url', 't0': time(), 'options': dict()}]
+
+        body = json.loads(b''.join(writer.json_pieces(opened, dict())))
+
+        self.assertEqual(body['records'], [{'a': 1}])
+        self.assertTrue(body['metadata']['pbdb']['error'].startswith(
+            'Subquery failed: TypeError: '))
+        self.assertEqual(body['metadata']['pbdb']['record_count'], 1)
+
+    def test_record_fields(self):
+        fields = writer.record_fields(['pbdb', 'neotoma'], 'occ')
+
+        self.assertEqual(fields[:2], ['occ_id', 'taxon'])
+        self.assertEqual(len(fields), len(set(fields)))
+
+        records = [{'a': 1}, {'b': 2, 'a': 3}]
+        self.assertEqual(writer.record_fields(['pbdb'], 'ref', records),
+                         ['a', 'b'])
+
+    def test_chunked(self):
+        pieces = [b'ab', b'c', b'defg', b'h']
+
+        self.assertEqual(list(writer.chunked(pieces, 3)),
+                         [b'abc', b'defg', b'h'])
+
+
+class TestFilename(unittest.TestCase):
+    """ File names of file returns """
+
+    def test_same_query_same_name(self):
+        one = aux.build_filename('occ', {'taxon': 'Canis',
+                                         'bbox': '-100, 40,-90,50'})
+        two = aux.build_filename('occ', {'bbox': '-100,40,-90,50',
+                                         'taxon': 'Canis'})
+
+        self.assertEqual(one, two)
+        self.assertTrue(one.startswith('elc_occurrences_'))
+        self.assertTrue(one.endswith('.csv'))
+
+    def test_different_query_different_name(self):
+        self.assertNotEqual(aux.build_filename('occ', {'bbox': '1,2,3,4'}),
+                            aux.build_filename('occ', {'bbox': '3,4,1,2'}))
+
+    def test_extension(self):
+        name = aux.build_filename('loc', {'idlist': 'pbdb:col:1'},
+                                  extension='parquet')
+
+        self.assertTrue(name.startswith('elc_locales_'))
+        self.assertTrue(name.endswith('.parquet'))
+
+
+if __name__ == '__main__':
+    unittest.main()